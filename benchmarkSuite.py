@@ -0,0 +1,259 @@
+# Offline micro-benchmarks of the parsing, text cleaning and database write paths
+# Runs against the recorded pages in benchmarks/fixtures (quote/, screener/, article/) and a temporary SQLite file.
+# The shipped fixtures are synthetic pages with the markup and size of live ones; record adds real Finviz pages.
+# Usage:
+#   python benchmarkSuite.py run [--output results.json] [--repeats N]   run and store results as JSON
+#   python benchmarkSuite.py compare base.json new.json [--threshold 0.1] exit 1 if a benchmark regressed
+#   python benchmarkSuite.py record [count]                              copy Finviz pages from the snapshot store into the fixtures
+
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from typing import Callable, Dict, List
+from urllib.parse import parse_qs, urlparse
+from bs4 import BeautifulSoup
+import utils.utils as ut
+import utils.migrations as mg
+import utils.htmlParser as hp
+import utils.newsDetailsSingleLink as nd
+from utils.snapshotCache import SnapshotStore
+
+FIXTURES_DIR = os.path.join('benchmarks', 'fixtures')
+RESULTS_DIR = os.path.join('benchmarks', 'results')
+
+# Number of timed runs per benchmark; the median run is reported
+REPEATS = 5
+
+# Rows inserted per run of the insert benchmark, written page by page like the crawl does
+INSERT_ROWS = 20000
+INSERT_ROWS_PER_PAGE = 100
+
+# Relative slowdown reported as a regression by compare
+REGRESSION_THRESHOLD = 0.10
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'run'
+
+    if command == 'run':
+        results = run_all(repeats=int(option('--repeats', REPEATS)))
+        path = option('--output', None) or default_output_path()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print_results(results)
+        print(f"\nResults written to {path}")
+
+    elif command == 'compare':
+        regressions = compare(sys.argv[2], sys.argv[3], threshold=float(option('--threshold', REGRESSION_THRESHOLD)))
+        sys.exit(1 if regressions else 0)
+
+    elif command == 'record':
+        count = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+        print(f"Recorded {record_fixtures(count)} pages into {FIXTURES_DIR}")
+
+    else:
+        print(f"Unknown command '{command}', expected run, compare or record")
+        sys.exit(2)
+
+
+
+# Value of a command line option, e.g. --repeats 3
+def option(name: str, default):
+    if name in sys.argv:
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
+# Raw pages of a fixture category
+def fixtures(category: str) -> List[tuple]:
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, category, '*.html'))):
+        with open(path, 'rb') as f:
+            pages.append((os.path.splitext(os.path.basename(path))[0], f.read()))
+    return pages
+
+# Median seconds of one call of run over all items
+def time_per_item(run: Callable, items: list, repeats: int) -> List[float]:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for item in items:
+            run(item)
+        samples.append((time.perf_counter() - start) / len(items))
+    return samples
+
+# Result entry of a benchmark
+def result(value: float, unit: str, higher_is_better: bool, samples: List[float]) -> Dict:
+    return {'value': value, 'unit': unit, 'higher_is_better': higher_is_better, 'samples': samples}
+
+# µs per page of a page parser
+def bench_parser(run: Callable, pages: list, repeats: int) -> Dict:
+    samples = [seconds * 1e6 for seconds in time_per_item(run, pages, repeats)]
+    return result(statistics.median(samples), 'us/page', False, samples)
+
+# MB/s of clean_text over the paragraph text of the article fixtures
+def bench_clean_text(articles: list, repeats: int) -> Dict:
+    texts = [' '.join(p.text for p in BeautifulSoup(html, 'html.parser').find_all('p')) for _, html in articles]
+    megabytes = sum(len(text.encode('utf-8')) for text in texts) / 1e6
+
+    samples = [megabytes / (seconds * len(texts)) for seconds in time_per_item(nd.clean_text, texts, repeats)]
+    return result(statistics.median(samples), 'MB/s', True, samples)
+
+# rows/s of finviz_table_populate into a fresh temporary database
+def bench_finviz_insert(repeats: int) -> Dict:
+    tickers = [f'T{number:04d}' for number in range(INSERT_ROWS // INSERT_ROWS_PER_PAGE)]
+    pages = [[{'ticker': ticker,
+               'date': f'Oct-{1 + row % 28:02d}-24 09:{row % 60:02d}AM',
+               'title': f'{ticker} headline {row} about quarterly results and guidance',
+               'link': f'https://news.example.com/{ticker}/{row}'}
+              for row in range(INSERT_ROWS_PER_PAGE)]
+             for ticker in tickers]
+
+    samples = []
+    for _ in range(repeats):
+        with tempfile.TemporaryDirectory() as directory:
+            db_path = os.path.join(directory, 'benchmark.db')
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                mg.migrate(db_path)
+            con = ut.get_connection(db_path).con
+            with con:
+                con.executemany("INSERT INTO companyDetails (ticker) VALUES (?)", [(ticker,) for ticker in tickers])
+
+            start = time.perf_counter()
+            for page in pages:
+                ut.finviz_table_populate(db_path=db_path, data=page)
+            samples.append(INSERT_ROWS / (time.perf_counter() - start))
+
+            ut.close_connections()
+
+    return result(statistics.median(samples), 'rows/s', True, samples)
+
+# Run every benchmark
+def run_all(repeats: int = REPEATS) -> Dict:
+    """
+    Runs all benchmarks against the fixtures.
+
+    Args:
+        repeats: Number of timed runs per benchmark (default=REPEATS)
+
+    Returns:
+        Dictionary: {'created_at', 'commit', 'python', 'platform', 'results': {'name': {'value', 'unit', 'higher_is_better', 'samples'}}}
+    """
+    quotes = fixtures('quote')
+    screeners = fixtures('screener')
+    articles = fixtures('article')
+    results = {}
+
+    backends = [backend for backend in hp.BACKENDS if backend != 'lxml' or hp.lxml is not None]
+
+    for backend in backends:
+        results[f'quote_parse_{backend}'] = bench_parser(
+            lambda page: hp.parse_quote_page(page[1], page[0], backend=backend), quotes, repeats)
+        results[f'screener_parse_{backend}'] = bench_parser(
+            lambda page: hp.parse_screener_page(page[1], backend=backend), screeners, repeats)
+
+    results['article_parse'] = bench_parser(
+        lambda page: nd.tp_news_data(BeautifulSoup(page[1], 'html.parser')), articles, repeats)
+    results['clean_text'] = bench_clean_text(articles, repeats)
+    results['finviz_insert'] = bench_finviz_insert(repeats)
+
+    return {'created_at': time.time(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': results}
+
+# Current git commit, if any
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+# Results file named after the commit and time of the run
+def default_output_path() -> str:
+    return os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{git_commit()}.json")
+
+def print_results(results: Dict) -> None:
+    print(f"Commit {results['commit']}, Python {results['python']}")
+    for name, entry in results['results'].items():
+        print(f"{name:<24}{entry['value']:>14.1f} {entry['unit']}")
+
+# Compare two result files
+def compare(base_path: str, new_path: str, threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    """
+    Prints the change of every benchmark between two result files.
+
+    Args:
+        base_path: Results of the baseline commit
+        new_path: Results of the commit under test
+        threshold: Relative slowdown counted as a regression (default=REGRESSION_THRESHOLD)
+
+    Returns:
+        Names of the regressed benchmarks
+    """
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    print(f"{base['commit']} -> {new['commit']}")
+    regressions = []
+
+    for name, entry in new['results'].items():
+        if name not in base['results']:
+            print(f"{name:<24}{entry['value']:>14.1f} {entry['unit']} (new)")
+            continue
+
+        before = base['results'][name]['value']
+        # Positive speedup means faster, whichever direction the unit goes
+        speedup = entry['value'] / before - 1 if entry['higher_is_better'] else before / entry['value'] - 1
+
+        flag = ''
+        if speedup < -threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+
+        print(f"{name:<24}{before:>14.1f} -> {entry['value']:>12.1f} {entry['unit']:<8}{speedup:+.1%}{flag}")
+
+    return regressions
+
+# Copy Finviz pages from the snapshot store into the fixtures
+def record_fixtures(count: int) -> int:
+    store = SnapshotStore()
+    recorded = 0
+
+    for ref in store.refs():
+        if recorded >= count:
+            break
+
+        html = store.get(ref['url'], max_age=float('inf'))
+        if html is None:
+            continue
+
+        query = parse_qs(urlparse(ref['url']).query)
+        if 'quote.ashx' in ref['url'] and 't' in query:
+            path = os.path.join(FIXTURES_DIR, 'quote', f"{query['t'][0]}.html")
+        elif 'screener.ashx' in ref['url']:
+            path = os.path.join(FIXTURES_DIR, 'screener', f"r{query.get('r', ['1'])[0]}.html")
+        else:
+            continue
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(html)
+        recorded += 1
+
+    return recorded
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+# Creates the database schema or upgrades an existing database in place to the latest version
+
+import sys
+import utils.migrations as mg
+
+DB = 'prospectleap.db'
+
+
+def main():
+    db_path = sys.argv[1] if len(sys.argv) > 1 else DB
+
+    print(f"Schema version of '{db_path}': {mg.schema_version(db_path)}")
+
+    applied = mg.migrate(db_path)
+
+    if applied:
+        print(f"Database upgraded to version {applied[-1]}")
+    else:
+        print("Database is up to date")
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Checks that the DuckDB read backend returns the same tables as SQLite on a database with compressed newsDetails.fullText
+# Builds a temporary database with synthetic articles, compresses them the way newsDetailsCompress.py does,
+# and compares get_table(..., backend='duckdb') against get_table(..., backend='sqlite')
+# Usage: python duckdbReadCheck.py [articles]
+
+import os
+import sys
+import tempfile
+from contextlib import redirect_stdout
+import utils.utils as ut
+import utils.migrations as mg
+import utils.textCompression as tc
+
+# Articles stored before the dictionary is trained; training needs at least 100
+ARTICLES = 200
+
+# Articles stored after the dictionary exists, compressed on write
+LATE_ARTICLES = 20
+
+TABLES = ['newsDetails', 'finviz']
+
+WORDS = ['shares', 'quarterly', 'results', 'guidance', 'analysts', 'revenue', 'growth', 'reported', 'update', 'pipeline']
+
+
+# Headline and article of a number; the text has non-ASCII characters like real articles
+def article(number: int) -> dict:
+    text = ' '.join(WORDS[(number + index) % len(WORDS)] for index in range(120))
+    return {'link': f'https://news.example.com/{number}', 'exact_date': '2024-10-29T13:00:00.000Z',
+            'full_text': f"“{text}” — article {number}", 'minhash': None, 'status': 'completed'}
+
+# Store articles through the same path as the news crawl
+def store_articles(db_path: str, numbers: range) -> None:
+    con = ut.get_connection(db_path).con
+    with con:
+        con.executemany("INSERT INTO finviz (ticker, date, title, link) VALUES (?, ?, ?, ?)",
+                        [('TEST', 'Oct-29-24 09:00AM', f'Headline {number}', article(number)['link']) for number in numbers])
+    ut.news_details_commit_batch(db_path, [article(number) for number in numbers])
+
+# Compress every uncompressed fullText, as newsDetailsCompress.py does
+def compress_all(db_path: str) -> None:
+    con = ut.get_connection(db_path).con
+    rows = con.execute("SELECT rowid, fullText FROM newsDetails WHERE typeof(fullText) = 'text'").fetchall()
+    with con:
+        con.executemany("UPDATE newsDetails SET fullText = ? WHERE rowid = ?", [(tc.compress_text(con, text), rowid) for rowid, text in rows])
+
+
+def main():
+    articles = int(sys.argv[1]) if len(sys.argv) > 1 else ARTICLES
+    mismatches = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, 'duckdbcheck.db')
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            mg.migrate(db_path)
+
+        store_articles(db_path, range(articles))
+        tc.train_dictionary(ut.get_connection(db_path).con)
+        compress_all(db_path)
+        store_articles(db_path, range(articles, articles + LATE_ARTICLES))
+
+        con = ut.get_connection(db_path).con
+        compressed = con.execute("SELECT COUNT(*) FROM newsDetails WHERE typeof(fullText) = 'blob'").fetchone()[0]
+        print(f"{compressed} of {articles + LATE_ARTICLES} articles compressed")
+
+        for table_name in TABLES:
+            expected = ut.get_table(db_path, table_name, backend='sqlite')
+            actual = ut.get_table(db_path, table_name, backend='duckdb')
+
+            # Row order is not guaranteed across backends
+            key = list(expected.columns)
+            expected = expected.sort_values(key).reset_index(drop=True)
+            actual = actual.sort_values(key).reset_index(drop=True)
+
+            same = list(actual.columns) == list(expected.columns) and actual.astype(str).equals(expected.astype(str))
+            print(f"{table_name}: {len(actual)} rows, {'same' if same else 'MISMATCH'}")
+            if not same:
+                mismatches.append(table_name)
+
+        ut.close_connections()
+
+    sys.exit(1 if mismatches else 0)
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# End-to-end load test of the screener crawl and the Finviz news crawl against the local stand-in (finvizStandIn.py)
+# Starts the stand-in, crawls its screener into a temporary database, crawls every tracked ticker
+# and reports throughput, errors and peak memory. Nothing touches the real site or prospectleap.db.
+# Usage: python finvizLoadTest.py [--tickers 10000] [--requests-per-second 50] [--max-requests-per-second 1000] [--max-in-flight 32]
+#                                 [--output result.json]
+#                                 [--latency 0.05] [--jitter 0.05] [--rate-429 0.0] [--rate-5xx 0.0] [--headlines 100] [--page-kb 0]
+
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from typing import Dict
+import utils.utils as ut
+import utils.migrations as mg
+import utils.metrics as metrics
+import utils.rateControl as rc
+import utils.finvizSingleTickerNews as fst
+from utils.snapshotCache import SnapshotStore
+import stocksTotalPopulation as stp
+import finvizTable
+from finvizStandIn import option
+
+# Load test settings: size of the universe, starting and highest request rate and number of requests in flight
+TICKERS = 10000
+REQUESTS_PER_SECOND = 50
+MAX_REQUESTS_PER_SECOND = 1000
+MAX_IN_FLIGHT = 32
+
+# Stand-in options passed through unchanged
+STAND_IN_OPTIONS = ['--latency', '--jitter', '--rate-429', '--rate-5xx', '--headlines', '--page-kb']
+
+# Number of times an incomplete screener crawl is resumed
+SCREENER_ATTEMPTS = 5
+
+# Seconds to wait for the stand-in to accept connections
+STARTUP_TIMEOUT = 10
+
+
+def main():
+    tickers = int(option('--tickers', TICKERS))
+    passthrough = [value for name in STAND_IN_OPTIONS if name in sys.argv for value in (name, option(name, None))]
+
+    with tempfile.TemporaryDirectory() as directory:
+        server, base_url = start_stand_in(tickers, passthrough)
+        try:
+            report = load_test(base_url,
+                               directory,
+                               requests_per_second=float(option('--requests-per-second', REQUESTS_PER_SECOND)),
+                               max_in_flight=int(option('--max-in-flight', MAX_IN_FLIGHT)),
+                               max_requests_per_second=float(option('--max-requests-per-second', MAX_REQUESTS_PER_SECOND)))
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(metrics.registry.summary())
+    print_report(report)
+
+    path = option('--output', None)
+    if path:
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {path}")
+
+
+
+# Free local port for the stand-in
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+# Run the stand-in in its own process, so its memory is not counted as the crawler's
+def start_stand_in(tickers: int, options: list) -> tuple:
+    port = free_port()
+    server = subprocess.Popen([sys.executable, 'finvizStandIn.py', '--port', str(port), '--tickers', str(tickers), *options],
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              stdout=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            break
+        except OSError:
+            if server.poll() is not None or time.monotonic() > deadline:
+                server.kill()
+                raise RuntimeError("Finviz stand-in did not start")
+            time.sleep(0.1)
+
+    return server, f'http://127.0.0.1:{port}'
+
+# Peak resident set size of this process in MB
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+# Crawl the stand-in end to end
+def load_test(base_url: str,
+              directory: str,
+              requests_per_second: float = REQUESTS_PER_SECOND,
+              max_in_flight: int = MAX_IN_FLIGHT,
+              max_requests_per_second: float = MAX_REQUESTS_PER_SECOND
+              ) -> Dict:
+    """
+    Crawls the screener of the stand-in into a fresh database, then the quote page of every tracked ticker.
+    Snapshots go to a temporary store, so every page is downloaded.
+
+    Args:
+        base_url: Root URL of the stand-in
+        directory: Directory for the temporary database and snapshot store
+        requests_per_second: Starting request rate of both crawls (default=REQUESTS_PER_SECOND)
+        max_in_flight: Maximum number of pages fetched at the same time (default=MAX_IN_FLIGHT)
+        max_requests_per_second: Highest request rate the adaptive controller may reach (default=MAX_REQUESTS_PER_SECOND)
+
+    Returns:
+        Dictionary: {'screener': {...}, 'finviz': {...}, 'peak_rss_mb': float, 'settings': {...}}
+    """
+    db_path = os.path.join(directory, 'loadtest.db')
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        mg.migrate(db_path)
+
+    fst.FINVIZ_BASE_URL = base_url
+    fst.snapshots = SnapshotStore(root=os.path.join(directory, 'snapshots'))
+
+    # Throttled pages are retried by the fetch layer; pages failed by injected 500 and 502 errors are fetched again by resuming the crawl
+    start = time.perf_counter()
+    companies = 0
+    missing_pages = None
+    for _ in range(SCREENER_ATTEMPTS):
+        try:
+            summary = stp.crawl_stock_population(db_path, requests_per_second=requests_per_second, max_in_flight=max_in_flight,
+                                                 max_requests_per_second=max_requests_per_second)
+        except Exception as e:
+            # The first page, which starts a crawl, failed
+            print(f"Error starting screener crawl: {str(e)}")
+            continue
+        companies += summary['new']
+        missing_pages = summary['missing_pages']
+        if not missing_pages:
+            break
+    screener_seconds = time.perf_counter() - start
+
+    con = ut.get_connection(db_path).con
+    pages = con.execute("SELECT COUNT(*) FROM screenerPage").fetchone()[0]
+    todo = con.execute("SELECT COUNT(*) FROM trackerFinviz WHERE finvizStatus = 'TODO'").fetchone()[0]
+
+    start = time.perf_counter()
+    finvizTable.progress_bar(todo, requests_per_second=requests_per_second, max_in_flight=max_in_flight,
+                             worker_id='loadtest', db_path=db_path, max_requests_per_second=max_requests_per_second)
+    finviz_seconds = time.perf_counter() - start
+
+    statuses = dict(con.execute("SELECT finvizStatus, COUNT(*) FROM trackerFinviz GROUP BY finvizStatus").fetchall())
+    headlines = con.execute("SELECT COUNT(*) FROM finviz").fetchone()[0]
+    ut.close_connections()
+
+    return {'screener': {'pages': pages, 'seconds': screener_seconds, 'pages_per_second': pages / screener_seconds,
+                         'companies': companies, 'missing_pages': missing_pages},
+            'finviz': {'tickers': todo, 'seconds': finviz_seconds, 'tickers_per_second': todo / finviz_seconds if todo else 0.0,
+                       'statuses': statuses, 'headlines': headlines},
+            'final_requests_per_second': rc.controller_for(base_url).rate,
+            'peak_rss_mb': peak_rss_mb(),
+            'settings': {'requests_per_second': requests_per_second, 'max_requests_per_second': max_requests_per_second,
+                         'max_in_flight': max_in_flight}}
+
+def print_report(report: Dict) -> None:
+    screener = report['screener']
+    finviz = report['finviz']
+    print(f"\nScreener: {screener['pages']} pages, {screener['companies']} companies in {screener['seconds']:.1f}s "
+          f"({screener['pages_per_second']:.1f} pages/s), {screener['missing_pages']} pages missing")
+    if screener['missing_pages'] is None:
+        print("The screener crawl never started; raise SCREENER_ATTEMPTS or lower the error rates")
+    print(f"Finviz: {finviz['tickers']} tickers in {finviz['seconds']:.1f}s ({finviz['tickers_per_second']:.1f} tickers/s), "
+          f"{finviz['headlines']} headlines, statuses {finviz['statuses']}")
+    print(f"Request rate at the end: {report['final_requests_per_second']:.1f}/s")
+    print(f"Peak RSS: {report['peak_rss_mb']:.0f} MB")
+
+
+
+if __name__ == "__main__":
+    main()
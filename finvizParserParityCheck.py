@@ -0,0 +1,83 @@
+# Checks that the fast html parser backend returns exactly the same data as the BeautifulSoup reference backend
+# Usage: python finvizParserParityCheck.py [saved_page.html ...]
+# Without arguments the quote and screener fixtures in benchmarks/fixtures and every page in the snapshot store are checked;
+# the fixtures include pages with non-ASCII headlines and company names and no meta charset
+
+import glob
+import os
+import sys
+import time
+from urllib.parse import parse_qs, urlparse
+import utils.htmlParser as hp
+from utils.snapshotCache import SnapshotStore
+
+FAST_BACKEND = 'lxml'
+
+FIXTURES_DIR = os.path.join('benchmarks', 'fixtures')
+
+
+# Saved pages as (name, ticker, html); ticker is None for screener pages
+def saved_pages(paths: list) -> list:
+    pages = []
+
+    # Without arguments the recorded fixtures are checked along with the snapshot store
+    from_store = not paths
+    if from_store:
+        paths = sorted(glob.glob(os.path.join(FIXTURES_DIR, 'quote', '*.html')) + glob.glob(os.path.join(FIXTURES_DIR, 'screener', '*.html')))
+
+    for path in paths:
+        with open(path, 'rb') as f:
+            html = f.read()
+        # Quote fixtures are named after their ticker, e.g. 'ACAD.html'
+        ticker = os.path.splitext(os.path.basename(path))[0]
+        pages.append((path, ticker, html))
+
+    if not from_store:
+        return pages
+
+    store = SnapshotStore()
+    for ref in store.refs():
+        html = store.get(ref['url'], max_age=float('inf'))
+        if html is None:
+            continue
+        ticker = parse_qs(urlparse(ref['url']).query).get('t', [None])[0]
+        pages.append((ref['url'], ticker, html))
+
+    return pages
+
+# Parse one page with a backend
+def parse(html: bytes, ticker: str, backend: str):
+    if b'styled-table-new' in html and b'fullview-news-outer' not in html:
+        return hp.parse_screener_page(html, backend=backend)
+    return hp.parse_quote_page(html, ticker, backend=backend)
+
+
+def main():
+    pages = saved_pages(sys.argv[1:])
+    mismatches = []
+    timings = {'bs4': 0.0, FAST_BACKEND: 0.0}
+
+    for name, ticker, html in pages:
+        results = {}
+        for backend in timings:
+            start_time = time.perf_counter()
+            results[backend] = parse(html, ticker, backend)
+            timings[backend] += time.perf_counter() - start_time
+
+        if results['bs4'] != results[FAST_BACKEND]:
+            mismatches.append(name)
+
+    print(f"Checked {len(pages)} pages, {len(mismatches)} mismatches")
+    for name in mismatches:
+        print(f"- {name}")
+
+    if pages:
+        for backend, total_time in timings.items():
+            print(f"{backend}: {total_time / len(pages) * 1e6:.0f} µs per page")
+
+    sys.exit(1 if mismatches else 0)
+
+
+
+if __name__ == "__main__":
+    main()
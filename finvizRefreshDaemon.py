@@ -0,0 +1,105 @@
+# Headless service that keeps re-polling the Finviz universe
+# Tickers whose headlines arrive often are polled more often than dormant ones (see utils.refreshScheduler)
+# Stop with Ctrl+C or SIGTERM; the current round is finished and written before exiting
+# Set PROSPECTLEAP_METRICS_FILE (e.g. /var/lib/node_exporter/prospectleap.prom) to publish metrics after every round
+
+import signal
+import time
+import utils.utils as ut
+import utils.finvizSingleTickerNews as fst
+import utils.migrations as mg
+import utils.refreshScheduler as rs
+import utils.metrics as metrics
+import utils.rateControl as rc
+from utils.concurrentCrawl import crawl
+
+DB = 'prospectleap.db'
+
+# Crawl settings: starting and highest Finviz request rate, adapted in between to Finviz's responses by utils.rateControl,
+# and maximum number of tickers in flight
+REQUESTS_PER_SECOND = 0.5
+MAX_REQUESTS_PER_SECOND = 5
+MAX_IN_FLIGHT = 4
+
+# Length of one polling round; each round polls as many due tickers as the current request rate allows in ROUND_SECONDS
+ROUND_SECONDS = 60
+
+# Seconds between checks for new tickers in 'companyDetails'
+SEED_EVERY = 60 * 60
+
+# Set by the signal handler to finish the current round and exit
+stop_requested = False
+
+
+def main():
+    global stop_requested
+
+    # Finish the current round on Ctrl+C or SIGTERM
+    def request_stop(signum, frame):
+        global stop_requested
+        stop_requested = True
+        print("Stop requested, finishing current round...", flush=True)
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    # Make sure the schedule table exists
+    mg.migrate(DB)
+
+    # Finviz requests are paced by the adaptive controller of its host
+    controller = rc.configure_host(fst.FINVIZ_BASE_URL, initial_rate=REQUESTS_PER_SECOND, max_rate=MAX_REQUESTS_PER_SECOND)
+
+    last_seed = 0.0
+
+    while not stop_requested:
+        # Pick up tickers added to the universe
+        if time.time() - last_seed >= SEED_EVERY:
+            added = rs.seed_schedule(DB)
+            if added:
+                print(f"Scheduled {added} new tickers", flush=True)
+            last_seed = time.time()
+
+        tickers = rs.due_tickers(DB, max(1, int(controller.rate * ROUND_SECONDS)))
+
+        if not tickers:
+            # Sleep until the next ticker is due, waking up regularly to honour stop requests
+            sleep_until = time.time() + min(rs.seconds_until_next_poll(DB), ROUND_SECONDS)
+            while not stop_requested and time.time() < sleep_until:
+                time.sleep(1)
+            continue
+
+        poll_round(tickers)
+
+    print("Refresh daemon stopped", flush=True)
+
+# Poll one round of due tickers and reschedule them
+def poll_round(tickers: list) -> None:
+    start_time = time.time()
+
+    # Always download, the snapshot store would serve pages up to a day old
+    results = crawl(items=tickers,
+                    worker=lambda ticker: fst.finviz_ticker_result(ticker, use_cache=False),
+                    requests_per_second=None,
+                    max_in_flight=MAX_IN_FLIGHT)
+
+    completed = [result for result in results.values() if result is not None]
+    failed = [ticker for ticker in tickers if results.get(ticker) is None or results[ticker]['status'] != 'completed']
+
+    try:
+        new_headlines = ut.finviz_commit_batch(db_path=DB, results=completed)
+    except Exception as e:
+        print(f"Error committing round: {str(e)}", flush=True)
+        new_headlines = {}
+        failed = tickers
+
+    rs.record_polls(DB, new_headlines=new_headlines, failed=failed)
+
+    metrics.write_metrics_file()
+
+    duration = time.time() - start_time
+    print(f"Polled {len(tickers)} tickers in {duration:.1f}s: {sum(new_headlines.values())} new headlines, {len(failed)} errors", flush=True)
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+# Local stand-in for Finviz serving synthetic quote, screener and article pages in Finviz's markup
+# Lets finvizTable.py, stocksTotalPopulation.py and newsDetailsTable.py be load-tested without touching the real site;
+# point them at it with PROSPECTLEAP_FINVIZ_URL=http://127.0.0.1:8765
+# Pages are deterministic per ticker and row, so repeated runs crawl the same universe; they carry an ETag
+# and are gzip-compressed when the client accepts it.
+# Usage: python finvizStandIn.py [--port 8765] [--tickers 10000] [--latency 0.05] [--jitter 0.05]
+#                                [--rate-429 0.0] [--rate-5xx 0.0] [--headlines 100] [--page-kb 0]
+
+import gzip
+import random
+import string
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+from urllib.parse import parse_qs, urlparse
+
+# Default port of the stand-in
+PORT = 8765
+
+# Number of tickers in the screener universe
+TICKERS = 10000
+
+# Companies per screener page, as on Finviz
+PAGE_SIZE = 20
+
+# Headlines per quote page; Finviz shows up to 100
+HEADLINES = 100
+
+# Seconds added to every response: fixed latency plus a uniformly drawn jitter
+LATENCY = 0.05
+JITTER = 0.05
+
+# Seconds a 429 response asks the client to wait
+RETRY_AFTER = 1
+
+# Reference date of the newest headline on every page
+NEWEST_HEADLINE = datetime(2024, 10, 29, 16, 0)
+
+SECTORS = [('Healthcare', 'Biotechnology'), ('Technology', 'Software - Application'), ('Energy', 'Oil & Gas E&P'),
+           ('Financial', 'Banks - Regional'), ('Industrials', 'Aerospace & Defense'), ('Consumer Cyclical', 'Auto Parts')]
+
+WORDS = ['shares', 'quarterly', 'results', 'guidance', 'analysts', 'revenue', 'growth', 'reported', 'update', 'pipeline',
+         'investors', 'rose', 'fell', 'outlook', 'earnings', 'trial', 'approval', 'contract', 'offering', 'merger']
+
+# Value of a command line option, e.g. --port 8765
+def option(name: str, default):
+    if name in sys.argv:
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
+# Ticker of a position in the universe: A..Z, AA..ZZ, AAA... like a spreadsheet column
+def ticker_name(index: int) -> str:
+    name = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        name = string.ascii_uppercase[remainder] + name
+    return name
+
+# Random generator seeded by a page key, so a page is the same on every request
+def page_random(key: str) -> random.Random:
+    return random.Random(zlib.crc32(key.encode('utf-8')))
+
+# Script block of about kilobytes in size, standing in for the bulk of a real page
+def padding(kilobytes: int) -> str:
+    if kilobytes <= 0:
+        return ''
+    line = 'var x=function(a){return a*2};'
+    return '<script>' + line * (kilobytes * 1024 // len(line)) + '</script>'
+
+# Sentence of random words
+def sentence(rng: random.Random, words: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+# Quote page of a ticker: snapshot table with 'Shs Float' and the news table
+def quote_page(ticker: str, base_url: str, headlines: int = HEADLINES, page_kb: int = 0) -> str:
+    rng = page_random(f'quote:{ticker}')
+
+    labels = [('Market Cap', f'{rng.uniform(10, 900):.2f}M'), ('Shs Float', f'{rng.uniform(1, 300):.2f}M'),
+              ('Short Float', f'{rng.uniform(0, 30):.2f}%'), ('Avg Volume', f'{rng.uniform(0.1, 20):.2f}M')]
+    snapshot = ''.join(f'<td class="snapshot-td2 cursor-pointer w-[7%]" align="left">{label}</td>'
+                       f'<td class="snapshot-td2 w-[8%]" align="left"><b>{value}</b></td>' for label, value in labels)
+
+    # Newest first; the day is printed only on the first headline of each day, as on Finviz
+    rows = []
+    published = NEWEST_HEADLINE
+    previous_day = None
+    for number in range(headlines):
+        published -= timedelta(minutes=rng.randint(20, 600))
+        day = published.strftime('%b-%d-%y')
+        cell = published.strftime('%I:%M%p') if day == previous_day else f"{day} {published.strftime('%I:%M%p')}"
+        previous_day = day
+        rows.append(f'<tr class="cursor-pointer has-label"><td width="130" align="right">{cell}&nbsp;&nbsp;</td>'
+                    f'<td align="left"><div class="news-link-container"><div class="news-link-left">'
+                    f'<a class="tab-link-news" href="{base_url}/news/{ticker}/{number}.html" target="_blank" rel="nofollow">'
+                    f'{ticker} {sentence(rng, 8)}</a></div><div class="news-link-right"><span>(Example Wire)</span></div></div></td></tr>')
+
+    return (f'<!DOCTYPE html><html><head><title>{ticker} Stock Quote</title>{padding(page_kb)}</head><body>'
+            f'<table class="js-snapshot-table snapshot-table2"><tr class="table-dark-row">{snapshot}</tr></table>'
+            f'<table width="100%" id="news-table" class="fullview-news-outer news-table">{"".join(rows)}</table>'
+            f'</body></html>')
+
+# Screener page starting at a row, with the page links Finviz puts under the table
+def screener_page(row: int, tickers: int = TICKERS, page_kb: int = 0) -> str:
+    last_page = max(1, -(-tickers // PAGE_SIZE))
+    rows = []
+
+    for number in range(row, min(row + PAGE_SIZE, tickers + 1)):
+        ticker = ticker_name(number - 1)
+        rng = page_random(f'company:{ticker}')
+        sector, industry = rng.choice(SECTORS)
+        cells = [str(number), f'<a href="quote.ashx?t={ticker}" class="tab-link">{ticker}</a>',
+                 f'<a class="tab-link">{ticker.capitalize()} {rng.choice(WORDS).capitalize()} Inc</a>',
+                 sector, industry, 'USA', f'{rng.uniform(10, 900):.2f}M', '-',
+                 f'<span class="color-text is-positive">{20 - 20 * number / (tickers + 1):.2f}</span>',
+                 f'{rng.uniform(-5, 5):.2f}%', str(rng.randint(1000, 5000000))]
+        rows.append('<tr class="styled-row is-hoverable is-bordered is-rounded is-striped has-color-text" valign="top">'
+                    + ''.join(f'<td>{cell}</td>' for cell in cells) + '</tr>')
+
+    pages = [1, 2, last_page] if last_page > 2 else list(range(1, last_page + 1))
+    links = ''.join(f'<a class="screener-pages" href="?r={1 + PAGE_SIZE * (page - 1)}">{page}</a>' for page in pages)
+
+    return (f'<!DOCTYPE html><html><head><title>Stock Screener</title>{padding(page_kb)}</head><body>'
+            f'<div><table class="styled-table-new is-rounded is-tabular-nums w-full screener_table"><tbody>{"".join(rows)}</tbody></table></div>'
+            f'{links}<a class="screener-pages is-next">next</a></body></html>')
+
+# Article page behind a headline link
+def article_page(ticker: str, number: str) -> str:
+    rng = page_random(f'article:{ticker}:{number}')
+    paragraphs = ''.join(f'<p>{" ".join(sentence(rng, rng.randint(8, 20)) for _ in range(4))}</p>' for _ in range(8))
+
+    return (f'<!DOCTYPE html><html><head><title>{ticker} news {number}</title></head><body>'
+            f'<div class="caas-title-wrapper"><h1>{ticker} {sentence(rng, 6)}</h1></div>'
+            f'<div class="caas-attr-time-style"><time datetime="2024-10-29T13:00:00.000Z">Tue, Oct 29, 2024, 9:00 AM</time></div>'
+            f'<div class="caas-body">{paragraphs}</div></body></html>')
+
+# Request handler; the settings live on the server
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self) -> None:
+        settings = self.server.settings
+        time.sleep(settings['latency'] + random.uniform(0, settings['jitter']))
+
+        # Injected failures, drawn independently for every request
+        draw = random.random()
+        if draw < settings['rate_429']:
+            self._send(429, b'Too Many Requests', {'Retry-After': str(RETRY_AFTER)})
+            return
+        if draw < settings['rate_429'] + settings['rate_5xx']:
+            self._send(random.choice([500, 502, 503]), b'Server Error')
+            return
+
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if url.path == '/quote.ashx' and 't' in query:
+            body = quote_page(query['t'][0], settings['base_url'], settings['headlines'], settings['page_kb'])
+        elif url.path == '/screener.ashx':
+            row = int(query.get('r', ['1'])[0])
+            body = screener_page(row, settings['tickers'], settings['page_kb'])
+        elif url.path.startswith('/news/') and url.path.count('/') == 3:
+            _, _, ticker, name = url.path.split('/')
+            body = article_page(ticker, name.split('.')[0])
+        else:
+            self._send(404, b'Not Found')
+            return
+
+        # Pages never change, so a client revalidating its copy always gets a 304
+        content = body.encode('utf-8')
+        etag = f'"{zlib.crc32(content):08x}"'
+        if self.headers.get('If-None-Match') == etag:
+            self._send(304, b'', {'ETag': etag})
+            return
+
+        headers = {'Content-Type': 'text/html; charset=utf-8', 'ETag': etag}
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            content = gzip.compress(content, compresslevel=1)
+            headers['Content-Encoding'] = 'gzip'
+
+        self._send(200, content, headers)
+
+    def _send(self, status: int, body: bytes, headers: Dict[str, str] = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Keep the console quiet under load
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+# Create the stand-in server
+def make_server(port: int = PORT,
+                tickers: int = TICKERS,
+                latency: float = LATENCY,
+                jitter: float = JITTER,
+                rate_429: float = 0.0,
+                rate_5xx: float = 0.0,
+                headlines: int = HEADLINES,
+                page_kb: int = 0
+                ) -> ThreadingHTTPServer:
+    """
+    Creates the stand-in HTTP server on 127.0.0.1; call serve_forever() to run it.
+
+    Args:
+        port: Port to listen on (default=PORT)
+        tickers: Number of tickers in the screener universe (default=TICKERS)
+        latency: Seconds added to every response (default=LATENCY)
+        jitter: Maximum random seconds added on top of latency (default=JITTER)
+        rate_429: Share of requests answered with 429 and a Retry-After header (default=0.0)
+        rate_5xx: Share of requests answered with a 500, 502 or 503 (default=0.0)
+        headlines: Number of headlines per quote page (default=HEADLINES)
+        page_kb: Kilobytes of padding added to quote and screener pages (default=0)
+
+    Returns:
+        Server with its settings in server.settings
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), StandInHandler)
+    server.daemon_threads = True
+    server.settings = {'base_url': f'http://127.0.0.1:{server.server_address[1]}', 'tickers': tickers,
+                       'latency': latency, 'jitter': jitter, 'rate_429': rate_429, 'rate_5xx': rate_5xx,
+                       'headlines': headlines, 'page_kb': page_kb}
+
+    return server
+
+
+def main():
+    server = make_server(port=int(option('--port', PORT)),
+                         tickers=int(option('--tickers', TICKERS)),
+                         latency=float(option('--latency', LATENCY)),
+                         jitter=float(option('--jitter', JITTER)),
+                         rate_429=float(option('--rate-429', 0.0)),
+                         rate_5xx=float(option('--rate-5xx', 0.0)),
+                         headlines=int(option('--headlines', HEADLINES)),
+                         page_kb=int(option('--page-kb', 0)))
+
+    print(f"Finviz stand-in serving {server.settings['tickers']} tickers on {server.settings['base_url']}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+
+if __name__ == "__main__":
+    main()
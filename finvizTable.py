@@ -1,36 +1,60 @@
-import ibis
-import pandas as pd
 import time
 import sys
-from tqdm import tqdm
+from typing import TYPE_CHECKING, Dict, Union
 import utils.utils as ut
 import utils.finvizSingleTickerNews as fst
+import utils.migrations as mg
+import utils.trackerQueue as tq
+import utils.metrics as metrics
+from utils.concurrentCrawl import crawl
+import utils.rateControl as rc
+from utils.rateControl import estimated_crawl_time
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 DB = 'prospectleap.db'
 DBsb = '/home/nurlan/projects/prospect_leap/dev/prospectleap_sandbox.db'
 
+# Crawl settings: starting and highest Finviz request rate, adapted in between to Finviz's responses by utils.rateControl,
+# and maximum number of tickers in flight
+REQUESTS_PER_SECOND = 0.5
+MAX_REQUESTS_PER_SECOND = 5
+MAX_IN_FLIGHT = 4
+
+# Number of processed tickers written per database transaction
+COMMIT_BATCH_SIZE = 25
+
+# Number of tickers leased from 'trackerFinviz' at a time; other worker processes claim the rest
+CLAIM_SIZE = 50
+
+# Share of the lease a claim should take at the current request rate; leases of tickers still in flight
+# are renewed once this share of the lease has passed, so a rate cut mid-claim does not let other workers take them
+LEASE_SHARE = 0.5
+
+# Id of this worker in 'trackerFinviz' leases
+WORKER_ID = tq.default_worker_id()
+
 
 def main():
 
+    # Make sure the tracker has lease columns
+    mg.migrate(DB)
+
     # Get number of tickers to process
     number_of_tickers = get_ticker_count()
     
-    # Get the list of tickers to process
-    tickers = ticker_list(number_of_tickers)
-    print('The below tickers will be proccessed: ')
-    print(tickers)
-    
      # Actual time start
     start_time = time.time()
 
     # Calculate and display total expected time
-    total_time = number_of_tickers * 6
-    print(f"\nTotal estimated time: {total_time} seconds")
+    total_time = estimated_crawl_time(number_of_tickers, REQUESTS_PER_SECOND)
+    print(f"\nTotal estimated time: {total_time:.0f} seconds")
     print(f"Processing tickers...\n")
 
    
     # Execute main function
-    progress_bar(tickers)
+    progress_bar(number_of_tickers)
     
     # Actual end time
     end_time = time.time()
@@ -40,16 +64,20 @@ def main():
 
     print(f"\n{number_of_tickers} tickers completed in {duration:.2f} seconds!")
 
+    # Where the time went
+    print(metrics.registry.summary())
+    metrics.write_metrics_file()
+
 
 
 # Get the 'finvizTracker' table
-def tracker() -> pd.DataFrame:
+def tracker() -> 'pd.DataFrame':
     table = ut.get_table(db_path=DB, table_name='trackerFinviz')
     
     return table
 
 # Get the 'finvizTracker' table filtered by 'TODO'
-def tracker_filtered_todo(table: pd.DataFrame) -> pd.DataFrame:
+def tracker_filtered_todo(table: 'pd.DataFrame') -> 'pd.DataFrame':
     filtered_table = ut.filter_table(df=table, column_name='finvizStatus', filter_values='TODO')
     
     return filtered_table
@@ -73,77 +101,116 @@ def get_ticker_count() -> int:
     number_of_tickers = -1
     
     while number_of_tickers < 0 or number_of_tickers > todo_count:
-        number_of_tickers = int(input(f"There are {todo_count} TODO tickers. Enter # of tickers to process (6s per ticker). To exit enter '0': "))
+        number_of_tickers = int(input(f"There are {todo_count} TODO tickers. Enter # of tickers to process ({1 / REQUESTS_PER_SECOND:.1f}s per ticker). To exit enter '0': "))
         if number_of_tickers == 0:
             sys.exit(0)
 
     return number_of_tickers
 
-# Get the list of tickers to be processed
-def ticker_list(count: int) -> list:
-    # Get trackerFinviz Table
-    finvizTracker = tracker()
-
-    # trackerFinviz table filtered by 'TODO'
-    todo_table = tracker_filtered_todo(finvizTracker)
-
-    # Compile the list
-    tickers_list = []
-
-    for i in range(count):
-        tickers_list.append(todo_table['ticker'].iloc[i])
-
-    return tickers_list
-
 # Progress bar animation
-def progress_bar(tickers: list) -> None:
-    num_times = len(tickers)
+def progress_bar(number_of_tickers: int,
+                 requests_per_second: float = REQUESTS_PER_SECOND,
+                 max_in_flight: int = MAX_IN_FLIGHT,
+                 worker_id: str = WORKER_ID,
+                 db_path: str = None,
+                 max_requests_per_second: float = MAX_REQUESTS_PER_SECOND
+                 ) -> None:
+    db_path = db_path or DB
+
+    # Finviz requests are paced by the adaptive controller of its host, starting at requests_per_second
+    controller = rc.configure_host(fst.FINVIZ_BASE_URL, initial_rate=requests_per_second, max_rate=max_requests_per_second)
+    num_times = number_of_tickers
     ticker_errors = []
-
-    for i in range(num_times):
-        current_ticker = tickers[i]
-
-        # Check if ticker status is 'TODO' in 'trackerFinviz'
-        status_check = ut.check_dbvalue(db_path=DB,
-                                        table_name='trackerFinviz',
-                                        filter_column='ticker',
-                                        filter_value=current_ticker,
-                                        check_column='finvizStatus',
-                                        check_value='TODO')
-
-        # if status_check is True - proceed with fst.process_finviz_single_ticker() else continue
-        if status_check:
-            fst.process_finviz_single_ticker(db=DB, ticker=current_ticker)
-        else:
+    pending_results = []
+    completed = 0
+    throughput = metrics.Throughput()
+
+    # Tickers of the current claim not finished yet and when their leases were last set
+    in_flight = set()
+    leased_at = time.time()
+
+    # Renew the leases of unfinished tickers before they expire
+    def renew_in_flight_leases() -> None:
+        nonlocal leased_at
+        if in_flight and time.time() - leased_at > tq.LEASE_SECONDS * LEASE_SHARE:
+            tq.renew_leases(db_path=db_path, worker_id=worker_id, tickers=list(in_flight))
+            leased_at = time.time()
+
+    # Write pending results of many tickers in one transaction
+    def commit_pending() -> None:
+        try:
+            ut.finviz_commit_batch(db_path=db_path, results=pending_results)
+        except Exception as e:
+            print(f"\nError committing batch: {str(e)}")
+            ticker_errors.extend(result['ticker'] for result in pending_results)
+        pending_results.clear()
+        metrics.write_metrics_file()
+
+    # Queue the result and update the progress bar every time a ticker finishes
+    def on_result(current_ticker: str, result: Union[Dict, None], error: Exception) -> None:
+        nonlocal completed
+        completed += 1
+        throughput.tick()
+        in_flight.discard(current_ticker)
+        renew_in_flight_leases()
+
+        if error or result['status'] != 'completed':
             ticker_errors.append(current_ticker)
-            continue
+        metrics.inc('items_total', crawl='finviz', status='error' if error else result['status'])
+        if error:
+            # Put the ticker back in the queue
+            tq.release_tickers(db_path=db_path, worker_id=worker_id, tickers=[current_ticker])
+        else:
+            pending_results.append(result)
+        if len(pending_results) >= COMMIT_BATCH_SIZE:
+            commit_pending()
 
         # Calculate progress percentage
-        progress = (i + 1) / num_times
+        progress = completed / num_times
         bar_length = 20
         filled_length = int(bar_length * progress)
-        
+
         # Create the progress bar
         bar = '█' * filled_length + '-' * (bar_length - filled_length)
-        
-        # Calculate remaining time
-        remaining_time = (num_times - (i + 1)) * 6
-        
+
+        # Calculate remaining time from the measured throughput, the current request rate until it is measured
+        remaining_time = throughput.eta(num_times - completed, fallback_rate=controller.rate)
+        rate = throughput.rate()
+        rate_text = f"{rate:.2f}/s" if rate else "measuring"
+
         # Create the status message
-        message = f"\rTicker {i+1} - {current_ticker} | Progress: |{bar}| {progress:.1%} | Time remaining: {remaining_time}s"
-        
+        message = f"\rTicker {completed} - {current_ticker} | Progress: |{bar}| {progress:.1%} | {rate_text} | Time remaining: {remaining_time:.0f}s"
+
         # Print and flush to ensure single line update
         sys.stdout.write(message)
         sys.stdout.flush()
-        
-        # Wait for 5 seconds unless it's the last iteration
-        if i < num_times - 1:
-            time.sleep(5)
-    
+
+    while completed < num_times:
+        # Lease the next TODO tickers, tickers leased by other workers are skipped; at a low request rate
+        # fewer tickers are claimed, so the claim is crawled well within its lease
+        claim_size = max(1, min(CLAIM_SIZE, int(controller.rate * tq.LEASE_SECONDS * LEASE_SHARE)))
+        tickers = tq.claim_tickers(db_path=db_path, worker_id=worker_id, count=min(claim_size, num_times - completed))
+        if not tickers:
+            break
+        in_flight = set(tickers)
+        leased_at = time.time()
+
+        # Crawl tickers concurrently, paced by the Finviz rate controller
+        crawl(items=tickers,
+              worker=fst.finviz_ticker_result,
+              requests_per_second=None,
+              max_in_flight=max_in_flight,
+              on_result=on_result)
+
+        # Write the last partial batch before claiming more tickers
+        commit_pending()
+
     # Print newline at the end
     sys.stdout.write('\n')
     sys.stdout.flush()
 
+    if ticker_errors:
+        print(f"Skipped or failed tickers: {ticker_errors}")
 
 
 if __name__ == "__main__":
@@ -8,7 +8,8 @@ ticker = 'ACAD'
 ticker_details = fst.finviz_ticker_details(ticker=ticker)
 news = ticker_details['news_details']
 
-ut.finviz_table_populate(db_path=DB, data=news)
+new_rows = ut.finviz_table_populate(db_path=DB, data=news)
+print(f"{new_rows} new headlines out of {len(news)}")
 
 # print(fst.finviz_ticker_details(ticker))
 
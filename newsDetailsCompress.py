@@ -0,0 +1,70 @@
+# One-shot conversion of newsDetails.fullText to zstd-compressed blobs
+# Trains a dictionary on the stored articles (unless one exists), compresses every uncompressed row in batches
+# and enables compression for all text written afterwards. Reads through utils.utils decompress transparently.
+# Usage: python newsDetailsCompress.py [--retrain]
+
+import sys
+import time
+import utils.utils as ut
+import utils.migrations as mg
+import utils.textCompression as tc
+
+DB = 'prospectleap.db'
+
+# Number of rows compressed per transaction
+BATCH_SIZE = 1000
+
+
+def main():
+    # Make sure the dictionary table exists
+    mg.migrate(DB)
+
+    con = ut.get_connection(DB).con
+
+    # Train a dictionary on the current corpus
+    if '--retrain' in sys.argv or tc.latest_dictionary_id(con) is None:
+        dictionary_id = tc.train_dictionary(con)
+        print(f"Trained dictionary {dictionary_id}")
+
+    size_before = text_size(con)
+    start_time = time.time()
+    compressed_rows = 0
+    last_rowid = 0
+
+    while True:
+        rows = con.execute("""
+            SELECT rowid, fullText
+            FROM newsDetails
+            WHERE rowid > ? AND typeof(fullText) = 'text'
+            ORDER BY rowid
+            LIMIT ?
+        """, (last_rowid, BATCH_SIZE)).fetchall()
+
+        if not rows:
+            break
+
+        with con:
+            con.executemany("UPDATE newsDetails SET fullText = ? WHERE rowid = ?",
+                            [(tc.compress_text(con, text), rowid) for rowid, text in rows])
+
+        compressed_rows += len(rows)
+        last_rowid = rows[-1][0]
+
+        sys.stdout.write(f"\rCompressed {compressed_rows} rows")
+        sys.stdout.flush()
+
+    size_after = text_size(con)
+    duration = time.time() - start_time
+
+    print(f"\nCompressed {compressed_rows} rows in {duration:.2f} seconds")
+    print(f"fullText size: {size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB ({size_before / max(size_after, 1):.1f}x)")
+    print("Run VACUUM to return the freed pages to the file system, then utils.search_index_rebuild()")
+
+# Total stored size of newsDetails.fullText in bytes
+def text_size(con) -> int:
+    return con.execute("SELECT COALESCE(SUM(LENGTH(CAST(fullText AS BLOB))), 0) FROM newsDetails").fetchone()[0]
+
+
+
+if __name__ == "__main__":
+    main()
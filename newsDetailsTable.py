@@ -1,134 +1,166 @@
-import ibis
-import pandas as pd
 import time
 import sys
-from tqdm import tqdm
+from typing import Dict, Union
+from urllib.parse import urlparse
 import utils.utils as ut
-import utils.finvizSingleTickerNews as fst
+import utils.newsDetailsSingleLink as nd
+import utils.migrations as mg
+from utils.concurrentCrawl import crawl
+from utils.rateControl import estimated_crawl_time
+import utils.metrics as metrics
 
 DB = 'prospectleap.db'
 DBsb = '/home/nurlan/projects/prospect_leap/dev/prospectleap_sandbox.db'
 
+# Crawl settings: global request budget across all news sites and maximum number of links in flight;
+# within it, every site is paced by its own adaptive controller (see utils.rateControl)
+REQUESTS_PER_SECOND = 20
+MAX_IN_FLIGHT = 32
+
+# Maximum number of links in flight per news site
+MAX_IN_FLIGHT_PER_DOMAIN = 2
+
+# Number of links selected from 'finviz' at a time
+CHUNK_SIZE = 500
+
+# Number of fetched articles written per database transaction
+COMMIT_BATCH_SIZE = 100
+
 
 def main():
 
-    # Get number of tickers to process
-    number_of_tickers = get_ticker_count()
-    
-    # Get the list of tickers to process
-    tickers = ticker_list(number_of_tickers)
-    print('The below tickers will be proccessed: ')
-    print(tickers)
-    
+    # Make sure 'newsDetails' has its canonical article tables
+    mg.migrate(DB)
+
+    # Get number of links to process
+    number_of_links = get_link_count()
+
      # Actual time start
     start_time = time.time()
 
     # Calculate and display total expected time
-    total_time = number_of_tickers * 6
-    print(f"\nTotal estimated time: {total_time} seconds")
-    print(f"Processing tickers...\n")
+    total_time = estimated_crawl_time(number_of_links, REQUESTS_PER_SECOND)
+    print(f"\nTotal estimated time: {total_time:.0f} seconds")
+    print(f"Processing links...\n")
+
 
-   
     # Execute main function
-    progress_bar(tickers)
-    
+    progress_bar(number_of_links)
+
     # Actual end time
     end_time = time.time()
 
     # Duration
     duration = end_time - start_time
 
-    print(f"\n{number_of_tickers} tickers completed in {duration:.2f} seconds!")
+    print(f"\n{number_of_links} links completed in {duration:.2f} seconds!")
 
+    # Where the time went
+    print(metrics.registry.summary())
+    metrics.write_metrics_file()
 
 
-# Get the 'finvizTracker' table
-def tracker() -> pd.DataFrame:
-    table = ut.get_table(db_path=DB, table_name='trackerFinviz')
-    
-    return table
 
-# Get the 'finvizTracker' table filtered by 'TODO'
-def tracker_filtered_todo(table: pd.DataFrame) -> pd.DataFrame:
-    filtered_table = ut.filter_table(df=table, column_name='finvizStatus', filter_values='TODO')
-    
-    return filtered_table
+# News site of a link, used to limit concurrent requests per site
+def link_domain(link: str) -> str:
+    domain = urlparse(link).netloc.lower()
 
-# Get the number of tickers to process
-def get_ticker_count() -> int:
-    # Get trackerFinviz Table
-    finvizTracker = tracker()
+    return domain[4:] if domain.startswith('www.') else domain
 
-    # Print trackerFinviz status
-    print(ut.table_info(
-        df = finvizTracker,
-        column_name = 'finvizStatus',
-        ))
+# Get the number of links to process
+def get_link_count() -> int:
+    pending_count = ut.news_details_pending_count(db_path=DB)
 
-    # trackerFinviz table filtered by 'TODO'
-    todo_table = tracker_filtered_todo(finvizTracker)
-    todo_count = len(todo_table)
+    number_of_links = -1
 
-    flag = False
-    number_of_tickers = -1
-    
-    while number_of_tickers < 0 or number_of_tickers > todo_count:
-        number_of_tickers = int(input(f"There are {todo_count} TODO tickers. Enter # of tickers to process (6s per ticker). To exit enter '0': "))
-        if number_of_tickers == 0:
+    while number_of_links < 0 or number_of_links > pending_count:
+        number_of_links = int(input(f"There are {pending_count} links not in newsDetails. Enter # of links to process. To exit enter '0': "))
+        if number_of_links == 0:
             sys.exit(0)
 
-    return number_of_tickers
-
-# Get the list of tickers to be processed
-def ticker_list(count: int) -> list:
-    # Get trackerFinviz Table
-    finvizTracker = tracker()
-
-    # trackerFinviz table filtered by 'TODO'
-    todo_table = tracker_filtered_todo(finvizTracker)
-
-    # Compile the list
-    tickers_list = []
-
-    for i in range(count):
-        tickers_list.append(todo_table['ticker'].iloc[i])
-
-    return tickers_list
+    return number_of_links
 
 # Progress bar animation
-def progress_bar(tickers: list) -> None:
-    num_times = len(tickers)
-    ticker_errors = []
-
-    for i in range(num_times):
-        current_ticker = tickers[i]
+def progress_bar(number_of_links: int,
+                 requests_per_second: float = REQUESTS_PER_SECOND,
+                 max_in_flight: int = MAX_IN_FLIGHT,
+                 max_in_flight_per_domain: int = MAX_IN_FLIGHT_PER_DOMAIN
+                 ) -> None:
+    num_times = number_of_links
+    link_errors = []
+    pending_articles = []
+    completed = 0
+    throughput = metrics.Throughput()
+
+    # Write pending articles in one transaction
+    def commit_pending() -> None:
+        try:
+            ut.news_details_commit_batch(db_path=DB, articles=pending_articles)
+        except Exception as e:
+            print(f"\nError committing batch: {str(e)}")
+            link_errors.extend(article['link'] for article in pending_articles)
+        pending_articles.clear()
+        metrics.write_metrics_file()
+
+    # Queue the article and update the progress bar every time a link finishes
+    def on_result(current_link: str, article: Union[Dict, None], error: Exception) -> None:
+        nonlocal completed
+        completed += 1
+        throughput.tick()
+
+        if error or article['status'] == 'error':
+            link_errors.append(current_link)
+        metrics.inc('items_total', crawl='newsDetails', status='error' if error else article['status'])
+        if not error:
+            pending_articles.append(article)
+        if len(pending_articles) >= COMMIT_BATCH_SIZE:
+            commit_pending()
 
         # Calculate progress percentage
-        progress = (i + 1) / num_times
+        progress = completed / num_times
         bar_length = 20
         filled_length = int(bar_length * progress)
-        
+
         # Create the progress bar
         bar = '█' * filled_length + '-' * (bar_length - filled_length)
-        
-        # Calculate remaining time
-        remaining_time = (num_times - (i + 1)) * 6
-        
+
+        # Calculate remaining time from the measured throughput, the configured request rate until it is measured
+        remaining_time = throughput.eta(num_times - completed, fallback_rate=requests_per_second)
+        rate = throughput.rate()
+        rate_text = f"{rate:.2f}/s" if rate else "measuring"
+
         # Create the status message
-        message = f"\rTicker {i+1} - {current_ticker} | Progress: |{bar}| {progress:.1%} | Time remaining: {remaining_time}s"
-        
+        message = f"\rLink {completed} | Progress: |{bar}| {progress:.1%} | {rate_text} | Errors: {len(link_errors)} | Time remaining: {remaining_time:.0f}s"
+
         # Print and flush to ensure single line update
         sys.stdout.write(message)
         sys.stdout.flush()
-        
-        # Wait for 5 seconds unless it's the last iteration
-        if i < num_times - 1:
-            time.sleep(5)
-    
+
+    while completed < num_times:
+        # Links are flagged in 'finviz' once committed, so every chunk selects new links
+        links = ut.news_details_pending_links(db_path=DB, count=min(CHUNK_SIZE, num_times - completed))
+        if not links:
+            break
+
+        # Fetch articles concurrently within the request budget and per-site limits
+        crawl(items=links,
+              worker=lambda link: nd.news_details_for_link(link, db_path=DB),
+              requests_per_second=requests_per_second,
+              max_in_flight=max_in_flight,
+              on_result=on_result,
+              key=link_domain,
+              max_in_flight_per_key=max_in_flight_per_domain)
+
+        # Write the last partial batch before selecting more links
+        commit_pending()
+
     # Print newline at the end
     sys.stdout.write('\n')
     sys.stdout.flush()
 
+    if link_errors:
+        print(f"{len(link_errors)} links failed")
+
 
 
 if __name__ == "__main__":
@@ -0,0 +1,36 @@
+# Incremental Parquet export of finviz, newsDetails and companyDetails for analytics
+# finviz and newsDetails are appended to hive-partitioned datasets (exports/<table>/date=YYYY-MM-DD/*.parquet) with the
+# rows added since the last export; companyDetails is rewritten. The datasets can be queried with predicate pushdown, e.g.
+#   pyarrow.dataset.dataset('exports/finviz', partitioning='hive').to_table(filter=(ds.field('date') >= '2024-10-01'))
+#   duckdb: SELECT * FROM read_parquet('exports/finviz/*/*.parquet', hive_partitioning = true) WHERE ticker = 'ACAD'
+# Usage: python parquetExport.py [export_dir] [--full]    (--full is needed after VACUUM)
+
+import sys
+import time
+import utils.migrations as mg
+import utils.parquetExport as pe
+
+DB = 'prospectleap.db'
+
+
+def main():
+    # Make sure the watermark table exists
+    mg.migrate(DB)
+
+    arguments = [argument for argument in sys.argv[1:] if not argument.startswith('--')]
+    export_dir = arguments[0] if arguments else pe.EXPORT_DIR
+
+    start_time = time.time()
+
+    exported = pe.export_all(DB, export_dir=export_dir, full='--full' in sys.argv)
+
+    duration = time.time() - start_time
+
+    for table_name, rows in exported.items():
+        print(f"{table_name}: {rows} rows exported")
+    print(f"Export to {export_dir} completed in {duration:.2f} seconds")
+
+
+
+if __name__ == "__main__":
+    main()
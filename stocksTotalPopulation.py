@@ -9,39 +9,84 @@
 # Market Cap
 # Price
 # Float
+#
+# Screener pages are fetched concurrently within a request budget and diffed straight into 'companyDetails';
+# only new and changed rows are written and tickers missing from two finished crawls in a row are marked delisted.
+# Every stored page is checkpointed in 'screenerPage', so an interrupted crawl resumes with the pages it is missing.
+# Usage: python stocksTotalPopulation.py [--restart]
 
-import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-import pandas as pd
-from datetime import datetime, timedelta
+import sys
 import time
 import re
+from typing import TYPE_CHECKING, Dict, List, Tuple, Union
+import utils.utils as ut
+import utils.migrations as mg
+from utils.concurrentCrawl import crawl
+from utils.htmlParser import parse_screener_page
+from utils.httpClient import fetch
+import utils.rateControl as rc
+import utils.finvizSingleTickerNews as fst
+import utils.metrics as metrics
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+DB = 'prospectleap.db'
+
+# Finviz screener filters: stocks only, price under $20, sorted by ticker. The order must not change with prices:
+# pages are fetched concurrently and a crawl may resume days later, so a price-sorted company could move to a page
+# that was already fetched and never be seen
+SCREENER_QUERY = "v=111&f=ind_stocksonly,sh_price_u20&ft=4&o=ticker&ar=180"
+
+# Number of companies per screener page
+PAGE_SIZE = 20
+
+# Crawl settings: starting and highest Finviz request rate, adapted in between to Finviz's responses by utils.rateControl,
+# and maximum number of pages in flight
+REQUESTS_PER_SECOND = 0.5
+MAX_REQUESTS_PER_SECOND = 5
+MAX_IN_FLIGHT = 4
+
+# Number of crawled pages written per database transaction
+COMMIT_BATCH_SIZE = 10
+
+
+def main():
+
+    # Make sure the checkpoint tables exist
+    mg.migrate(DB)
+
+    # Actual time start
+    start_time = time.time()
+
+    summary = crawl_stock_population(DB, restart='--restart' in sys.argv[1:])
+
+    # Duration
+    duration = time.time() - start_time
+
+    print(metrics.registry.summary())
+    metrics.write_metrics_file()
+
+    print(f"\ncompanyDetails refreshed in {duration:.2f} seconds: {summary['new']} new, {summary['changed']} changed, "
+          f"{summary['unchanged']} unchanged, {summary['delisted']} delisted")
+    if summary['missing_pages']:
+        print(f"{summary['missing_pages']} pages failed, run again to resume the crawl")
+
+
+
+# Get raw html from Finviz; pages are always revalidated, an unchanged page costs a 304 instead of a download.
+# Unchanged pages are still parsed, the crawl needs every ticker of every page to find delisted ones.
+# Error pages would parse as empty pages and be checkpointed, so they raise
+def fetch_finviz_html(url: str) -> bytes:
+    return fetch(url, source='screener', store=fst.snapshots, use_cache=False)['content']
+
+# Extract last page number
+def extract_last_page_number(html_content: 'BeautifulSoup') -> Union[int, None]:
 
-# Finviz Start Page
-finviz_start_page = "https://finviz.com/screener.ashx?v=111&f=ind_stocksonly,sh_price_u20&ft=4&o=-price&ar=180"
-
-# Get html content from Finviz
-def scrape_finviz_html_content(url): 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
-    
-    response = requests.get(url, headers=headers)
-    soup = BeautifulSoup(response.content, 'html.parser')
-        
-    return soup
-
-# Extract last page number 
-def extract_last_page_number(html_content):
-    
     # Find all 'a' tags with class 'screener-pages'
     page_links = html_content.find_all('a', class_='screener-pages')
     page_links = [link for link in page_links if 'is-next' not in link.get('class', [])]
- 
+
     # Extract the text from the last 'a' tag
     if page_links:
         last_page_text = page_links[-1].text
@@ -51,118 +96,210 @@ def extract_last_page_number(html_content):
         if match:
             return int(match.group())
 
-# Get html content from Finviz 
-html_for_last_page = scrape_finviz_html_content(finviz_start_page)
-
-# Last page number
-last_page = extract_last_page_number(html_for_last_page)
-
-# Counter list for Finviz subsequent pages
-def finviz_pages(last_page_number):
-    pages_list = []
-    count = 1
-    for page in range(0,last_page_number-1):
-        count += 20
-        pages_list.append(count)
-
-    return pages_list
-
-finviz_pages_list = finviz_pages(last_page)
-
-# List of Finviz URLs for subsequent pages
-def finviz_web_url_list(first_page, pages_list, last_page_number):
-    url_list = [first_page]
-    for i in range(last_page_number-1):
-        counter = pages_list[i]
-        url = f"https://finviz.com/screener.ashx?v=111&f=ind_stocksonly,sh_price_u20&ft=4&o=-price&r={counter}&ar=180" 
-        url_list.append(url)
-    return url_list
-
-finviz_url_list = finviz_web_url_list(finviz_start_page, finviz_pages_list, last_page)
-
-
-# Parse Finviz html content to list of dictionaries [{date:value, title:value, link:value}]
-def companies_summary_list_of_dictionaries(finviz_html_content):
-    
-    news_table = finviz_html_content.find('table', class_='styled-table-new')
-    
-    companies = []
-    
-    if news_table:
-        rows = news_table.find_all('tr', class_='styled-row')
-        
-        # Extract data from each row
-        for row in rows:
-            cells = row.find_all('td')
-
-            # Extract the required information
-            company_data = {
-                'No.': cells[0].text.strip(),
-                'Ticker': cells[1].text.strip(),
-                'Company': cells[2].text.strip(),
-                'Sector': cells[3].text.strip(),
-                'Industry': cells[4].text.strip(),
-                'Country': cells[5].text.strip(),
-                'Market Cap': cells[6].text.strip(),
-                'Price': cells[8].text.strip(),
-                'Float': '0'
-            }
-            
-            companies.append(company_data)
-    
-    return companies
-
-# Compile list of data per 1 page
-def list_of_summaries_per_page():
-    per_page_list = []
-    
-    for i in range(len(finviz_url_list)):
-        # Get html content from Finviz
-        html_cont = scrape_finviz_html_content(finviz_url_list[i])
-
-        # Parse html into list of dictionaries
-        summary = companies_summary_list_of_dictionaries(html_cont)
-
-        # Append to per_page_list
-        per_page_list.append(summary)
-        
-        # Wait for the page to load
-        time.sleep(3)
-                    
-    return per_page_list
-
-# Combine per_page_lists
-def combine_per_page_list(pp_list):
-    combined_list = []
-    
-    for i in range(len(pp_list)):
-        combined_list += pp_list[i]
-
-    return combined_list
-
-# Run all functions to compile stock population
-def compile_stock_population():
-    per_page_list = list_of_summaries_per_page()
-    final_combined_list = combine_per_page_list(per_page_list)
-
-    return final_combined_list
-
-# Create pandas DataFrame
-def stock_population_dataframe(stock_population):    
-    return pd.DataFrame(stock_population)
-
-# Compile total stock population
-population =  compile_stock_population()
-
-# TEST: Initiate parsed DataFrame
-stocks_df = stock_population_dataframe(population)
-
-# Drop duplicates
-stocks_df = stocks_df.drop_duplicates(subset=['Ticker'], keep='first')
-
-# Correct counts in No.
-stocks_df['No.'] = range(1, len(stocks_df)+1)
-
-# TEST: Export to CSV
-stocks_df.to_csv(f"Stocks_population.csv", index=False)
+# First row of every screener page
+def finviz_page_rows(last_page_number: int) -> List[int]:
+    return [1 + PAGE_SIZE * page for page in range(last_page_number)]
+
+# URL of the screener page starting at a row, on the site of utils.finvizSingleTickerNews.FINVIZ_BASE_URL
+def finviz_page_url(row: int) -> str:
+    if row == 1:
+        return f"{fst.FINVIZ_BASE_URL}/screener.ashx?{SCREENER_QUERY}"
+
+    return f"{fst.FINVIZ_BASE_URL}/screener.ashx?{SCREENER_QUERY}&r={row}"
+
+# Fetch and parse one screener page
+def screener_page(row: int) -> Dict[str, Union[int, List[Dict[str, str]]]]:
+    """
+    Gets the companies of the screener page starting at a row.
+
+    Args:
+        row: First row of the page (1, 21, 41...)
+
+    Returns:
+        Dictionary: {'row':int, 'companies':[{'No.':'str', 'Ticker':'str', 'Company':'str', ...}...]}
+    """
+    html = fetch_finviz_html(finviz_page_url(row))
+
+    with metrics.timer('parse', source='screener'):
+        companies = parse_screener_page(html)
+
+    # Every page up to the last one lists companies; an empty page is a blocked or changed page
+    if not companies:
+        raise ValueError(f"No companies found on screener page starting at row {row}")
+
+    return {'row': row, 'companies': companies}
+
+# Fetch and parse the first screener page, which also links to the last page
+def first_screener_page() -> Dict[str, Union[int, List[Dict[str, str]]]]:
+    """
+    Gets the companies of the first screener page and the number of screener pages.
+
+    Returns:
+        Dictionary: {'row':1, 'companies':[{'No.':'str', 'Ticker':'str', ...}...], 'last_page':int}
+    """
+    from bs4 import BeautifulSoup
+
+    html = fetch_finviz_html(finviz_page_url(1))
+
+    with metrics.timer('parse', source='screener'):
+        companies = parse_screener_page(html)
+        last_page = extract_last_page_number(BeautifulSoup(html, 'html.parser')) or 1
+
+    return {'row': 1, 'companies': companies, 'last_page': last_page}
+
+# Start a new crawl or resume the unfinished one
+def start_crawl(db_path: str, restart: bool = False) -> Tuple[int, Dict[str, int]]:
+    """
+    Returns the id of the unfinished crawl, or registers a new crawl when there is none (or restart is set).
+    A new crawl reads the number of screener pages from the first page and stores that page right away,
+    so the crawl does not download it again.
+
+    Args:
+        db_path: Path to the database
+        restart: Abandon an unfinished crawl and start over (default=False)
+
+    Returns:
+        Tuple: (crawl id, companies of the first page per outcome, see utils.screener_commit_pages)
+    """
+    counts = {'new': 0, 'changed': 0, 'unchanged': 0}
+    con = ut.get_connection(db_path).con
+
+    if not restart:
+        row = con.execute("""
+            SELECT crawlId
+            FROM screenerCrawl
+            WHERE finishedAt IS NULL
+            ORDER BY crawlId DESC
+            LIMIT 1
+        """).fetchone()
+        if row:
+            return row[0], counts
+
+    page = first_screener_page()
+
+    with con:
+        # Forget the checkpoints of an abandoned crawl
+        con.execute("DELETE FROM screenerPage WHERE crawlId IN (SELECT crawlId FROM screenerCrawl WHERE finishedAt IS NULL)")
+        con.execute("DELETE FROM screenerCrawl WHERE finishedAt IS NULL")
+        crawl_id = con.execute("""
+            INSERT INTO screenerCrawl (startedAt, lastPage)
+            VALUES (?, ?)
+        """, (time.time(), page['last_page'])).lastrowid
+
+    # An empty first page is a blocked or changed page; it stays pending and is fetched by the crawl
+    if page['companies']:
+        counts = ut.screener_commit_pages(db_path=db_path, crawl_id=crawl_id, pages=[page])
+
+    return crawl_id, counts
+
+# Read the number of screener pages again and extend the crawl to pages listed since it started
+def extend_last_page(db_path: str, crawl_id: int) -> bool:
+    """
+    Reads the number of screener pages from the first page and raises the last page of the crawl if it grew,
+    so companies listed while the crawl ran are seen before it finishes.
+
+    Args:
+        db_path: Path to the database
+        crawl_id: Id of the crawl in 'screenerCrawl'
+
+    Returns:
+        True when the crawl has new pages to fetch
+    """
+    last_page = first_screener_page()['last_page']
+
+    con = ut.get_connection(db_path).con
+    with con:
+        extended = con.execute("UPDATE screenerCrawl SET lastPage = ? WHERE crawlId = ? AND lastPage < ?",
+                               (last_page, crawl_id, last_page)).rowcount
+
+    return extended > 0
+
+# Rows of the pages of a crawl not stored yet
+def pending_page_rows(db_path: str, crawl_id: int) -> List[int]:
+    con = ut.get_connection(db_path).con
+
+    last_page = con.execute("SELECT lastPage FROM screenerCrawl WHERE crawlId = ?", (crawl_id,)).fetchone()[0]
+    done = {row for (row,) in con.execute("SELECT pageRow FROM screenerPage WHERE crawlId = ?", (crawl_id,))}
+
+    return [row for row in finviz_page_rows(last_page) if row not in done]
+
+# Crawl the screener into 'companyDetails'
+def crawl_stock_population(db_path: str,
+                           restart: bool = False,
+                           requests_per_second: float = REQUESTS_PER_SECOND,
+                           max_in_flight: int = MAX_IN_FLIGHT,
+                           max_requests_per_second: float = MAX_REQUESTS_PER_SECOND
+                           ) -> Dict[str, int]:
+    """
+    Crawls every screener page missing from the current crawl and diffs the companies into 'companyDetails'.
+    Once all pages are stored, the page count is read again and pages added since the crawl started are crawled too.
+    Then the crawl is finished: tickers neither it nor the previous finished crawl saw are marked delisted
+    and new tickers are added to 'trackerFinviz'.
+
+    Args:
+        db_path: Path to the database
+        restart: Abandon an unfinished crawl and start over (default=False)
+        requests_per_second: Starting Finviz request rate (default=REQUESTS_PER_SECOND)
+        max_in_flight: Maximum number of pages fetched at the same time (default=MAX_IN_FLIGHT)
+        max_requests_per_second: Highest Finviz request rate (default=MAX_REQUESTS_PER_SECOND)
+
+    Returns:
+        Dictionary: {'new':int, 'changed':int, 'unchanged':int, 'delisted':int, 'tracked':int, 'missing_pages':int}
+    """
+    # Finviz requests are paced by the adaptive controller of its host
+    rc.configure_host(fst.FINVIZ_BASE_URL, initial_rate=requests_per_second, max_rate=max_requests_per_second)
+
+    crawl_id, first_page_counts = start_crawl(db_path, restart=restart)
+
+    pending_pages = []
+    summary = {'new': 0, 'changed': 0, 'unchanged': 0, 'delisted': 0, 'tracked': 0, 'missing_pages': 0, **first_page_counts}
+
+    # Write pending pages in one transaction
+    def commit_pending() -> None:
+        counts = ut.screener_commit_pages(db_path=db_path, crawl_id=crawl_id, pages=pending_pages)
+        for outcome, count in counts.items():
+            summary[outcome] += count
+        pending_pages.clear()
+
+    # Queue every parsed page; failed pages stay pending for the next run
+    def on_result(row: int, page: Union[Dict, None], error: Exception) -> None:
+        if error:
+            print(f"Error processing page at row {row}: {str(error)}")
+            return
+
+        pending_pages.append(page)
+        if len(pending_pages) >= COMMIT_BATCH_SIZE:
+            commit_pending()
+
+    while True:
+        rows = pending_page_rows(db_path, crawl_id)
+        print(f"Crawl {crawl_id}: {len(rows)} screener pages to fetch")
+
+        crawl(items=rows,
+              worker=screener_page,
+              requests_per_second=None,
+              max_in_flight=max_in_flight,
+              on_result=on_result)
+
+        # Write the last partial batch
+        commit_pending()
+
+        summary['missing_pages'] = len(pending_page_rows(db_path, crawl_id))
+
+        # The page count was read when the crawl started; listings added since then can add pages past it
+        if summary['missing_pages'] or not extend_last_page(db_path, crawl_id):
+            break
+
+    # Tickers are only known to be gone once every page was seen
+    if not summary['missing_pages']:
+        summary['delisted'] = ut.screener_finish_crawl(db_path, crawl_id)
+
+        # Track new tickers in 'trackerFinviz'
+        summary['tracked'] = ut.tracker_add_new_tickers(db_path)
+
+    return summary
+
+
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Union
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from .rateControl import controller_for
+
+# Default pool settings
+POOL_SIZE = 2
+MAX_PAGES_PER_DRIVER = 100
+PAGE_LOAD_TIMEOUT = 30
+
+# Elements whose presence means the article is rendered: publication time or article body
+READY_SELECTOR = 'time, article, [data-testid="article-body"]'
+READY_TIMEOUT = 10
+
+# File keeping the chromedriver path resolved by webdriver_manager across processes, and how long it is trusted
+CHROMEDRIVER_CACHE = os.path.join(os.path.expanduser('~'), '.cache', 'prospectleap', 'chromedriver-path')
+CHROMEDRIVER_CACHE_TTL = 7 * 24 * 60 * 60
+
+# chromedriver path, resolved once per process
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+# chromedriver path from the cache file, if it is recent and still points to an executable
+def _cached_driver_path() -> Union[str, None]:
+    try:
+        if time.time() - os.path.getmtime(CHROMEDRIVER_CACHE) > CHROMEDRIVER_CACHE_TTL:
+            return None
+        with open(CHROMEDRIVER_CACHE, 'r', encoding='utf-8') as f:
+            path = f.read().strip()
+    except OSError:
+        return None
+
+    return path if os.path.isfile(path) and os.access(path, os.X_OK) else None
+
+# Resolve chromedriver with webdriver_manager, which checks the installed Chrome online, and cache the result
+def _install_driver_path() -> str:
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    path = ChromeDriverManager().install()
+
+    # The cache only saves time; failing to write it is not an error
+    try:
+        os.makedirs(os.path.dirname(CHROMEDRIVER_CACHE), exist_ok=True)
+        with open(f"{CHROMEDRIVER_CACHE}.{os.getpid()}.tmp", 'w', encoding='utf-8') as f:
+            f.write(path)
+        os.replace(f"{CHROMEDRIVER_CACHE}.{os.getpid()}.tmp", CHROMEDRIVER_CACHE)
+    except OSError:
+        pass
+
+    return path
+
+# Resolve the chromedriver path once
+def chromedriver_path(refresh: bool = False) -> str:
+    """
+    Returns the path to chromedriver: PROSPECTLEAP_CHROMEDRIVER if set, otherwise the path cached in CHROMEDRIVER_CACHE
+    by an earlier process, otherwise the path webdriver_manager resolves (downloading the driver if needed).
+
+    Args:
+        refresh: Ignore the cached path and resolve it again, e.g. after a Chrome update (default=False)
+
+    Returns:
+        Path to the chromedriver executable
+    """
+    global _driver_path
+
+    with _driver_path_lock:
+        if refresh:
+            _driver_path = None
+        if _driver_path is None:
+            _driver_path = (os.environ.get('PROSPECTLEAP_CHROMEDRIVER')
+                            or (None if refresh else _cached_driver_path())
+                            or _install_driver_path())
+
+    return _driver_path
+
+# Bounded pool of long-lived headless Chrome drivers
+class ChromePool:
+    """
+    Keeps up to size headless Chrome drivers alive and lends them to threads one at a time.
+    A driver is recycled (quit and replaced) after max_pages_per_driver pages or when it crashes.
+
+    Args:
+        size: Maximum number of drivers alive at the same time (default=POOL_SIZE)
+        max_pages_per_driver: Pages loaded by a driver before it is recycled (default=MAX_PAGES_PER_DRIVER)
+        page_load_timeout: Seconds before a page load is aborted (default=PAGE_LOAD_TIMEOUT)
+    """
+
+    def __init__(self,
+                 size: int = POOL_SIZE,
+                 max_pages_per_driver: int = MAX_PAGES_PER_DRIVER,
+                 page_load_timeout: float = PAGE_LOAD_TIMEOUT
+                 ) -> None:
+        self.size = size
+        self.max_pages_per_driver = max_pages_per_driver
+        self.page_load_timeout = page_load_timeout
+
+        # Idle drivers as [driver, pages_loaded]; None marks a slot without a started driver
+        self._idle = queue.LifoQueue()
+        for _ in range(size):
+            self._idle.put(None)
+
+    # Start a new headless Chrome
+    def _new_driver(self) -> webdriver.Chrome:
+        # Set up Chrome options
+        chrome_options = Options()
+        chrome_options.add_argument("--headless")  # Run in headless mode (no GUI)
+        chrome_options.add_argument("--disable-gpu")
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-dev-shm-usage")
+
+        # Set up the Chrome driver; a cached driver that no longer matches Chrome is resolved again
+        try:
+            driver = webdriver.Chrome(service=Service(chromedriver_path()), options=chrome_options)
+        except WebDriverException:
+            if os.environ.get('PROSPECTLEAP_CHROMEDRIVER'):
+                raise
+            driver = webdriver.Chrome(service=Service(chromedriver_path(refresh=True)), options=chrome_options)
+        driver.set_page_load_timeout(self.page_load_timeout)
+
+        return driver
+
+    # Quit a driver, ignoring errors of an already crashed browser
+    def _quit(self, driver: webdriver.Chrome) -> None:
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    @contextmanager
+    def driver(self):
+        """
+        Lends a driver to the calling thread, starting one if needed. Blocks while all drivers are in use.
+
+        Returns:
+            Context manager yielding a selenium Chrome driver
+        """
+        entry = self._idle.get()
+
+        try:
+            if entry is None:
+                entry = [self._new_driver(), 0]
+
+            yield entry[0]
+
+            entry[1] += 1
+            if entry[1] >= self.max_pages_per_driver:
+                self._quit(entry[0])
+                entry = None
+
+        except WebDriverException:
+            # Crashed or hung browser, replace it on next use
+            if entry is not None:
+                self._quit(entry[0])
+            entry = None
+            raise
+
+        finally:
+            self._idle.put(entry)
+
+    def page_source(self, url: str, ready_selector: str = READY_SELECTOR, ready_timeout: float = READY_TIMEOUT) -> str:
+        """
+        Loads a page and returns its html once the ready element is present (or after ready_timeout).
+        A page that crashes the browser is retried once on a fresh driver.
+        Every load is paced by the adaptive rate controller of the host (see rateControl), like httpClient.fetch;
+        Selenium does not expose the HTTP status, so a load counts as successful unless the browser fails.
+
+        Args:
+            url: URL of the page
+            ready_selector: CSS selector of an element that marks the page as rendered (default=READY_SELECTOR)
+            ready_timeout: Maximum seconds to wait for the ready element (default=READY_TIMEOUT)
+
+        Returns:
+            Page source
+        """
+        controller = controller_for(url)
+
+        for attempt in range(2):
+            # Wait for the host before taking a driver, so a paced host does not hold browsers other pages could use
+            controller.acquire()
+
+            try:
+                with self.driver() as driver:
+                    # Navigate to the URL; the controller learns from the time the page took to load
+                    start = time.perf_counter()
+                    try:
+                        driver.get(url)
+                    except WebDriverException:
+                        controller.record(None, time.perf_counter() - start)
+                        raise
+                    controller.record(200, time.perf_counter() - start)
+
+                    # Wait for the article to render instead of a fixed sleep
+                    try:
+                        WebDriverWait(driver, ready_timeout).until(
+                            EC.presence_of_element_located((By.CSS_SELECTOR, ready_selector)))
+                    except TimeoutException:
+                        pass
+
+                    return driver.page_source
+
+            except WebDriverException:
+                if attempt == 1:
+                    raise
+
+    def close(self) -> None:
+        """
+        Quits all idle drivers.
+
+        Returns:
+            None
+        """
+        # Take every slot before putting any back: the queue is LIFO, so a slot put back would be taken again
+        entries = [self._idle.get() for _ in range(self.size)]
+
+        for entry in entries:
+            if entry is not None:
+                self._quit(entry[0])
+
+        for _ in entries:
+            self._idle.put(None)
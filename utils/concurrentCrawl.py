@@ -0,0 +1,101 @@
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import zip_longest
+from typing import Any, Callable, Dict, List, Optional
+from .rateControl import RateLimiter
+
+# Reorder items round-robin by key so that no key occupies the whole pool
+def interleave_by_key(items: List[Any], key: Callable[[Any], Any]) -> List[Any]:
+    """
+    Interleaves items so that consecutive items have different keys whenever possible.
+
+    Args:
+        items: Items to reorder
+        key: Function returning the key of an item (e.g. the domain of a link)
+
+    Returns:
+        Reordered list of items
+    """
+    groups = defaultdict(list)
+    for item in items:
+        groups[key(item)].append(item)
+
+    sentinel = object()
+    return [item for round_items in zip_longest(*groups.values(), fillvalue=sentinel) for item in round_items if item is not sentinel]
+
+# Run worker over items with a bounded number of requests in flight and a global rate budget
+def crawl(items: List[Any],
+          worker: Callable[[Any], Any],
+          requests_per_second: Optional[float],
+          max_in_flight: int,
+          on_result: Optional[Callable[[Any, Any, Optional[Exception]], None]] = None,
+          key: Optional[Callable[[Any], Any]] = None,
+          max_in_flight_per_key: Optional[int] = None
+          ) -> Dict[Any, Any]:
+    """
+    Processes items concurrently on a thread pool while respecting a shared requests-per-second budget.
+    Requests are also paced per host by the adaptive controllers of rateControl inside httpClient.fetch;
+    without a global budget, they alone set the pace.
+
+    Args:
+        items: Items to be processed (e.g. tickers)
+        worker: Function called once per item; it is expected to issue one request
+        requests_per_second: Global requests-per-second budget shared by all threads, None for no global budget
+        max_in_flight: Maximum number of items processed at the same time
+        on_result: Optional callback called from the calling thread as each item finishes: on_result(item, result, error)
+        key: Optional function grouping items (e.g. by domain); items are interleaved by key
+        max_in_flight_per_key: Maximum number of items of the same key processed at the same time (requires key)
+
+    Returns:
+        Dictionary {item: result}; items whose worker raised are mapped to None
+    """
+    # Input validation
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight must be at least 1")
+    if max_in_flight_per_key is not None and key is None:
+        raise ValueError("max_in_flight_per_key requires key")
+
+    limiter = RateLimiter(requests_per_second=requests_per_second) if requests_per_second else None
+
+    # One semaphore per key, created on first use
+    key_slots = {}
+    key_slots_lock = threading.Lock()
+
+    def slot(item: Any) -> threading.Semaphore:
+        with key_slots_lock:
+            item_key = key(item)
+            if item_key not in key_slots:
+                key_slots[item_key] = threading.Semaphore(max_in_flight_per_key)
+            return key_slots[item_key]
+
+    # Wait for a free slot of the key and the rate budget before handing the item to the worker
+    def rate_limited_worker(item: Any) -> Any:
+        if max_in_flight_per_key is None:
+            if limiter:
+                limiter.acquire()
+            return worker(item)
+
+        with slot(item):
+            if limiter:
+                limiter.acquire()
+            return worker(item)
+
+    if key is not None:
+        items = interleave_by_key(items, key)
+
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        futures = {executor.submit(rate_limited_worker, item): item for item in items}
+
+        for future in as_completed(futures):
+            item = futures[future]
+            error = future.exception()
+            result = None if error else future.result()
+            results[item] = result
+
+            if on_result:
+                on_result(item, result, error)
+
+    return results
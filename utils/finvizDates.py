@@ -0,0 +1,118 @@
+import re
+import time
+from typing import Dict, List, Union
+
+# Finviz prints headline times in US/Eastern
+FINVIZ_TIMEZONE = 'America/New_York'
+
+# Format of the day part of a date cell, e.g. 'Oct-29-24'
+FINVIZ_DAY_FORMAT = '%b-%d-%y'
+
+# Date cell: optional day ('Oct-29-24', 'Today' or 'Yesterday') followed by the time ('09:00AM')
+_DATE_CELL = r'^(?:(?P<day>[A-Za-z]{3}-\d{2}-\d{2}|Today|Yesterday)\s+)?(?P<time>\d{1,2}:\d{2}\s*[AP]M)$'
+
+# Day of a 'Today'/'Yesterday' cell whose reference time is unknown; stops the carry-forward without guessing
+_UNKNOWN_DAY = 'unknown'
+
+# Convert Finviz date cells to UTC epoch seconds
+def published_at(dates: List[str],
+                 tickers: Union[List[str], None] = None,
+                 now: Union[float, None] = None
+                 ) -> List[Union[int, None]]:
+    """
+    Converts Finviz date cells to UTC epoch seconds, vectorized over whole pages.
+    Finviz prints the day only on the first headline of each day; the following cells hold a bare time,
+    so the day is carried forward within each ticker's page in the order the cells are given.
+
+    Args:
+        dates: Date cells as scraped, e.g. 'Oct-29-24 09:00AM', '08:15AM' or 'Today 10:30AM'
+        tickers: Ticker of every cell; cells of different tickers never share a day (default=all cells are one page)
+        now: Epoch seconds at which the page was fetched, used for 'Today' and 'Yesterday' (default=None, those days are unknown)
+
+    Returns:
+        Epoch seconds per cell, None where the cell cannot be parsed or its day is unknown
+    """
+    if not dates:
+        return []
+
+    # Imported here, pandas would otherwise load with every module that touches the database
+    import numpy as np
+    import pandas as pd
+
+    parts = pd.Series(dates, dtype=object).fillna('').str.strip().str.extract(_DATE_CELL)
+
+    # Resolve relative days against the fetch time in Finviz's time zone
+    if now is None:
+        today = yesterday = _UNKNOWN_DAY
+    else:
+        fetched = pd.Timestamp(now, unit='s', tz='UTC').tz_convert(FINVIZ_TIMEZONE)
+        today = fetched.strftime(FINVIZ_DAY_FORMAT)
+        yesterday = (fetched - pd.Timedelta(days=1)).strftime(FINVIZ_DAY_FORMAT)
+    day = parts['day'].replace({'Today': today, 'Yesterday': yesterday})
+
+    # Carry the last printed day forward to bare times, page by page
+    if tickers is None:
+        day = day.ffill()
+    else:
+        day = day.groupby(pd.Series(tickers, dtype=object).fillna('').values).ffill()
+    day = day.replace(_UNKNOWN_DAY, np.nan)
+
+    local = pd.to_datetime(day + ' ' + parts['time'].str.replace(r'\s+', '', regex=True),
+                           format=f'{FINVIZ_DAY_FORMAT} %I:%M%p', errors='coerce')
+
+    # Times repeated by the end of daylight saving time are read as daylight time
+    utc = local.dt.tz_localize(FINVIZ_TIMEZONE,
+                               ambiguous=np.ones(len(local), dtype=bool),
+                               nonexistent='shift_forward').dt.tz_convert('UTC')
+
+    seconds = (utc - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+
+    return [None if pd.isna(value) else int(value) for value in seconds]
+
+# Add 'published_at' to scraped headlines
+def add_published_at(news: List[Dict[str, str]], now: Union[float, None] = None) -> List[Dict[str, str]]:
+    """
+    Sets 'published_at' on every headline from its date cell, carrying days forward per ticker in list order.
+
+    Args:
+        news: Headlines as scraped: [{'ticker':'str','date':'str', 'title':'str', 'link':'str'}...]
+        now: Epoch seconds at which the pages were fetched (default=current time)
+
+    Returns:
+        The same list, each headline with 'published_at' (epoch seconds or None)
+    """
+    timestamps = published_at([item['date'] for item in news],
+                              tickers=[item['ticker'] for item in news],
+                              now=time.time() if now is None else now)
+
+    for item, timestamp in zip(news, timestamps):
+        item['published_at'] = timestamp
+
+    return news
+
+# Convert a date filter to UTC epoch seconds
+def to_epoch(value: Union[str, float, int, None], end_of_day: bool = False) -> Union[int, None]:
+    """
+    Converts an ISO date or datetime (naive values are UTC) or epoch seconds to epoch seconds.
+
+    Args:
+        value: ISO date ('2024-10-29'), ISO datetime ('2024-10-29 13:00', '2024-10-29T09:00-04:00') or epoch seconds
+        end_of_day: Map a bare date to its last second instead of its first, for inclusive upper bounds (default=False)
+
+    Returns:
+        Epoch seconds or None when value is None
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+
+    import pandas as pd
+
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize('UTC')
+    if end_of_day and re.fullmatch(r'\d{4}-\d{2}-\d{2}', value.strip()):
+        timestamp += pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+
+    return int(timestamp.timestamp())
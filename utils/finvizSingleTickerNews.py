@@ -1,32 +1,75 @@
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-from typing import List, Dict, Union
-from .utils import finviz_table_populate, update_dbvalue
+import os
+from typing import TYPE_CHECKING, List, Dict, Union
+from .utils import finviz_commit_batch, update_dbvalue
+from .snapshotCache import SnapshotStore
+from .httpClient import fetch
+from .htmlParser import parse_quote_page
+from .finvizDates import add_published_at
+from . import metrics
+
+# BeautifulSoup is only needed by the reference parser, see htmlParser
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+# Finviz site root, overridable with the PROSPECTLEAP_FINVIZ_URL environment variable (e.g. the local stand-in of finvizStandIn.py)
+FINVIZ_BASE_URL = os.environ.get('PROSPECTLEAP_FINVIZ_URL', 'https://finviz.com').rstrip('/')
+
+# Raw Finviz quote pages are kept on disk so re-parses and reruns do not hit Finviz again
+snapshots = SnapshotStore()
+
+# URL of the Finviz quote page of a ticker
+def finviz_quote_url(ticker: str) -> str:
+    return f"{FINVIZ_BASE_URL}/quote.ashx?t={ticker}&p=d"
+
+# Get the Finviz quote page of a ticker, served from the snapshot store while it is fresh and revalidated after that
+def fetch_finviz_page(ticker: str, use_cache: bool = True) -> Dict[str, Union[bytes, int, bool, float]]:
+    """
+    Gets the Finviz quote page of a ticker. A rate limit or server error page would parse as a page without news,
+    so 4xx and 5xx responses raise requests.HTTPError.
+
+    Args:
+        ticker: Ticker of the company for which web content is obtained from Finviz
+        use_cache: Whether a fresh snapshot on disk may be used instead of downloading the page (default=True)
+
+    Returns:
+        Dictionary: {'content':bytes, 'status':int, 'not_modified':bool, 'from_snapshot':bool, 'fetched_at':float}, see httpClient.fetch
+    """
+    return fetch(finviz_quote_url(ticker), source='finviz', store=snapshots, use_cache=use_cache)
+
+# Get raw html from Finviz
+def fetch_finviz_html(ticker: str, use_cache: bool = True) -> bytes:
+    """
+    Gets raw html of the Finviz quote page of a ticker.
+
+    Args:
+        ticker: Ticker of the company for which web content is obtained from Finviz
+        use_cache: Whether a fresh snapshot on disk may be used instead of downloading the page (default=True)
+
+    Returns:
+        Raw html content
+    """
+    return fetch_finviz_page(ticker, use_cache=use_cache)['content']
 
 # Get html content from Finviz
-def scrape_finviz_html_content(ticker: str) -> BeautifulSoup:
+def scrape_finviz_html_content(ticker: str, use_cache: bool = True) -> 'BeautifulSoup':
     """
     Gets html content from finviz and returns in raw html code.
 
     Args:
         ticker: Ticker of the company for which web content is obtained from Finviz
+        use_cache: Whether a fresh snapshot on disk may be used instead of downloading the page (default=True)
 
     Returns:
         Web content as a BeautifulSoup object
     """
-    url = f"https://finviz.com/quote.ashx?t={ticker}&p=d" 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
-    
-    response = requests.get(url, headers=headers)
-    soup = BeautifulSoup(response.content, 'html.parser')
-        
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(fetch_finviz_html(ticker, use_cache=use_cache), 'html.parser')
+
     return soup
 
 # Parse Finviz html content to list of dictionaries [{date:value, title:value, link:value}]
-def news_data(finviz_html_content: BeautifulSoup, tckr: str) -> List[Dict]:
+def news_data(finviz_html_content: 'BeautifulSoup', tckr: str) -> List[Dict]:
     """
     Gets list of news title and their links from Finviz.
 
@@ -65,7 +108,7 @@ def news_data(finviz_html_content: BeautifulSoup, tckr: str) -> List[Dict]:
     return news_data
 
 # Extract Shares Float
-def extract_shares_float(finviz_html_content: BeautifulSoup) -> Union[str, None]:
+def extract_shares_float(finviz_html_content: 'BeautifulSoup') -> Union[str, None]:
     """
     Returns shares float.
 
@@ -91,34 +134,62 @@ def extract_shares_float(finviz_html_content: BeautifulSoup) -> Union[str, None]
     return None
 
 # function that returns news details and number of shares float for a single ticker
-def finviz_ticker_details(ticker: str) -> Dict[str, Union[List[Dict[str, str]], 'str']]:
+def finviz_ticker_details(ticker: str,
+                          use_cache: bool = True,
+                          backend: Union[str, None] = None
+                          ) -> Dict[str, Union[List[Dict[str, str]], 'str', bool]]:
     """
     Gets news details (ticker, date, title, link) and number of shares float for a single ticker from Finviz
 
     Args:
         ticker: Ticker to be processed
+        use_cache: Whether a fresh snapshot on disk may be used instead of downloading the page (default=True)
+        backend: Html parser backend, see utils.htmlParser (default=htmlParser.PARSER_BACKEND)
 
     Returns:
-        Dictionary: {'news_details':[{'ticker':'str','date':'str', 'title':'str', 'link':'str'}...], 'shares_float':'str'}
+        Dictionary: {'news_details':[{'ticker':'str','date':'str', 'title':'str', 'link':'str', 'published_at':int or None}...], 'shares_float':'str',
+                     'not_modified':bool}
     """
     # Get html content
-    soup = scrape_finviz_html_content(ticker)
-    
-    # Get news details
-    news_details = news_data(soup, ticker)
-    
-    # Get shares float
-    shares_float = extract_shares_float(soup)
+    page = fetch_finviz_page(ticker, use_cache=use_cache)
+
+    # Get news details and shares float; 'Today' on a snapshot means the day it was fetched.
+    # A page the server reported unchanged is parsed as well: a stored snapshot does not mean its headlines
+    # reached this database (the commit may have failed, or the snapshot was fetched for another database)
+    with metrics.timer('parse', source='finviz'):
+        result = parse_quote_page(page['content'], ticker, backend=backend)
+    add_published_at(result['news_details'], now=page['fetched_at'])
 
-    # Build result
-    result = {'news_details':news_details, 'shares_float':shares_float}
+    return {**result, 'not_modified': page['not_modified']}
 
-    return result
+# Fetch and parse one ticker without touching the database
+def finviz_ticker_result(ticker: str, use_cache: bool = True) -> Dict[str, Union[str, List[Dict[str, str]], None]]:
+    """
+    Gets news details and shares float for a single ticker and records whether it succeeded, ready for finviz_commit_batch
+
+    Args:
+        ticker: Ticker to be processed
+        use_cache: Whether a fresh snapshot on disk may be used instead of downloading the page (default=True)
+
+    Returns:
+        Dictionary: {'ticker':'str', 'news_details':[...], 'shares_float':'str', 'not_modified':bool, 'status':'completed' or 'error'}
+    """
+    try:
+        # Fetch and parse the quote page once
+        ticker_details = finviz_ticker_details(ticker, use_cache=use_cache)
+        status = 'completed'
+    except Exception as e:
+        print(f"Error processing {ticker}: {str(e)}")
+        ticker_details = {'news_details': [], 'shares_float': None, 'not_modified': False}
+        status = 'error'
+
+    return {'ticker': ticker, **ticker_details, 'status': status}
 
 # Process one ticker and populate table 'finviz', update float in table 'companyDetails', and update 'trackerFinviz' table to status 'complete'
 def process_finviz_single_ticker(db: str, ticker: str) -> bool:
     """
-    Process single ticker and populates 'finviz' table, updates float in 'companyDetails' table from Finviz, and changes status to 'complete' or 'error' in 'trackerFinviz' table
+    Process single ticker and populates 'finviz' table, updates float in 'companyDetails' table from Finviz, and changes status to 'complete' or 'error' in 'trackerFinviz' table.
+    All three tables are updated in one transaction.
 
     Args:
         db: Path to the database
@@ -127,38 +198,12 @@ def process_finviz_single_ticker(db: str, ticker: str) -> bool:
     Returns:
         Boolean: If all tables successfully updated it returns True, otherwise false
     """
-    finviz_news_details = finviz_ticker_details(ticker)['news_details']
-
-    finviz_shares_float = finviz_ticker_details(ticker)['shares_float']
-
-    # Set flag
-    flag = True
+    result = finviz_ticker_result(ticker)
 
     try:
-        finviz_table_populate(db_path=db, data=finviz_news_details)
+        finviz_commit_batch(db_path=db, results=[result])
     except Exception as e:
-        flag = False
-
-    try:
-        update_dbvalue(
-            db_path=db,
-            table_name='companyDetails',
-            search_column='ticker',
-            update_column='float',
-            search_value=ticker,
-            value=finviz_shares_float)
-    except Exception as e:
-        flag = False
-
-    if flag == True:
-        update_dbvalue(
-            db_path=db,
-            table_name='trackerFinviz',
-            search_column='ticker',
-            update_column='finvizStatus',
-            search_value=ticker,
-            value='completed')
-    else:
+        # Nothing was written, record the failure on its own
         update_dbvalue(
             db_path=db,
             table_name='trackerFinviz',
@@ -166,5 +211,6 @@ def process_finviz_single_ticker(db: str, ticker: str) -> bool:
             update_column='finvizStatus',
             search_value=ticker,
             value='error')
+        return False
 
-    return flag
+    return result['status'] == 'completed'
@@ -0,0 +1,236 @@
+import os
+from typing import Dict, List, Union
+
+# lxml is optional; without it every page is parsed by the BeautifulSoup reference backend
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+# Parser backends: 'bs4' (BeautifulSoup with html.parser, reference) and 'lxml' (fast)
+BACKENDS = ['bs4', 'lxml']
+
+# Default backend, overridable with the PROSPECTLEAP_HTML_PARSER environment variable
+PARSER_BACKEND = os.environ.get('PROSPECTLEAP_HTML_PARSER', 'lxml' if lxml is not None else 'bs4')
+
+# Encoding of Finviz pages. Raw pages are decoded with it before either backend sees them: left to themselves,
+# BeautifulSoup guesses with UnicodeDammit and libxml2 from <meta> only, so a page without a meta charset decodes differently
+PAGE_ENCODING = 'utf-8'
+
+# Resolve the backend to use for a call
+def resolve_backend(backend: Union[str, None] = None) -> str:
+    """
+    Returns the parser backend to use.
+
+    Args:
+        backend: Requested backend or None for PARSER_BACKEND
+
+    Returns:
+        Name of an available backend
+    """
+    backend = backend or PARSER_BACKEND
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown parser backend '{backend}'. Available backends are: {BACKENDS}")
+    if backend == 'lxml' and lxml is None:
+        raise ImportError("Parser backend 'lxml' requires the lxml package")
+
+    return backend
+
+# XPath predicate matching an element whose class list contains class_name (same rule as BeautifulSoup's class_)
+def _has_class(class_name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+# Decode a raw page; undecodable bytes become U+FFFD for both backends alike
+def _decode(html: Union[bytes, str], encoding: str) -> str:
+    return html.decode(encoding, errors='replace') if isinstance(html, bytes) else html
+
+# Parse decoded html into an lxml tree, None for an empty document
+def _lxml_tree(html: str):
+    if not html or not html.strip():
+        return None
+    return lxml.html.fromstring(html)
+
+# Equivalent of BeautifulSoup's Tag.string: the only string of an element, descending through single-child elements
+def _lxml_single_string(element) -> Union[str, None]:
+    while True:
+        children = list(element)
+        if not children:
+            return element.text
+        if len(children) == 1 and not element.text and not children[0].tail:
+            element = children[0]
+            continue
+        return None
+
+# lxml version of finvizSingleTickerNews.news_data
+def _lxml_news_data(tree, tckr: str) -> List[Dict]:
+    news_data = []
+
+    if tree is None:
+        return news_data
+
+    news_tables = tree.xpath(f"//table[{_has_class('fullview-news-outer')}]")
+
+    if news_tables:
+        rows = news_tables[0].xpath(f".//tr[{_has_class('cursor-pointer')}]")
+        for row in rows:
+            date_cells = row.xpath(".//td[@align='right']")
+            news_cells = row.xpath(".//td[@align='left']")
+
+            if date_cells and news_cells:
+                date = date_cells[0].text_content().strip()
+
+                news_links = news_cells[0].xpath(f".//a[{_has_class('tab-link-news')}]")
+                if news_links:
+                    title = news_links[0].text_content().strip()
+                    link = news_links[0].attrib['href']
+
+                    news_data.append({
+                        'ticker': tckr,
+                        'date': date,
+                        'title': title,
+                        'link': link
+                    })
+    return news_data
+
+# lxml version of finvizSingleTickerNews.extract_shares_float
+def _lxml_shares_float(tree) -> Union[str, None]:
+    if tree is None:
+        return None
+
+    for label in tree.xpath(f"//td[{_has_class('snapshot-td2')}]"):
+        if _lxml_single_string(label) != 'Shs Float':
+            continue
+
+        # Get the next td element which contains the value
+        values = label.xpath("(descendant::td | following::td)[1]")
+        if values:
+            # Extract the text within the <b> tag
+            bold = values[0].xpath(".//b")
+            if bold:
+                return bold[0].text_content().strip()
+        return None
+
+    return None
+
+# lxml version of companies_summary_list_of_dictionaries
+def _lxml_companies_summary(tree) -> List[Dict]:
+    companies = []
+
+    if tree is None:
+        return companies
+
+    news_tables = tree.xpath(f"//table[{_has_class('styled-table-new')}]")
+
+    if news_tables:
+        rows = news_tables[0].xpath(f".//tr[{_has_class('styled-row')}]")
+
+        # Extract data from each row
+        for row in rows:
+            cells = [cell.text_content().strip() for cell in row.xpath(".//td")]
+
+            # Extract the required information
+            companies.append({
+                'No.': cells[0],
+                'Ticker': cells[1],
+                'Company': cells[2],
+                'Sector': cells[3],
+                'Industry': cells[4],
+                'Country': cells[5],
+                'Market Cap': cells[6],
+                'Price': cells[8],
+                'Float': '0'
+            })
+
+    return companies
+
+# Parse Finviz screener html content to list of dictionaries (BeautifulSoup reference backend)
+def companies_summary_list_of_dictionaries(finviz_html_content) -> List[Dict]:
+    """
+    Gets the companies listed on one Finviz screener page.
+
+    Args:
+        finviz_html_content: Web content as a BeautifulSoup object
+
+    Returns:
+        List of companies as dictionaries: [{'No.':'str', 'Ticker':'str', 'Company':'str', 'Sector':'str', 'Industry':'str', 'Country':'str', 'Market Cap':'str', 'Price':'str', 'Float':'0'}...]
+    """
+    news_table = finviz_html_content.find('table', class_='styled-table-new')
+
+    companies = []
+
+    if news_table:
+        rows = news_table.find_all('tr', class_='styled-row')
+
+        # Extract data from each row
+        for row in rows:
+            cells = row.find_all('td')
+
+            # Extract the required information
+            company_data = {
+                'No.': cells[0].text.strip(),
+                'Ticker': cells[1].text.strip(),
+                'Company': cells[2].text.strip(),
+                'Sector': cells[3].text.strip(),
+                'Industry': cells[4].text.strip(),
+                'Country': cells[5].text.strip(),
+                'Market Cap': cells[6].text.strip(),
+                'Price': cells[8].text.strip(),
+                'Float': '0'
+            }
+
+            companies.append(company_data)
+
+    return companies
+
+# Parse a Finviz quote page
+def parse_quote_page(html: bytes,
+                     ticker: str,
+                     backend: Union[str, None] = None,
+                     encoding: str = PAGE_ENCODING
+                     ) -> Dict[str, Union[List[Dict[str, str]], str, None]]:
+    """
+    Parses news details and shares float from raw html of a Finviz quote page.
+
+    Args:
+        html: Raw html content
+        ticker: Ticker of the company
+        backend: Parser backend (default=PARSER_BACKEND)
+        encoding: Encoding of the raw html (default=PAGE_ENCODING)
+
+    Returns:
+        Dictionary: {'news_details':[{'ticker':'str','date':'str', 'title':'str', 'link':'str'}...], 'shares_float':'str'}
+    """
+    html = _decode(html, encoding)
+
+    if resolve_backend(backend) == 'lxml':
+        tree = _lxml_tree(html)
+        return {'news_details': _lxml_news_data(tree, ticker), 'shares_float': _lxml_shares_float(tree)}
+
+    from bs4 import BeautifulSoup
+    from .finvizSingleTickerNews import news_data, extract_shares_float
+
+    soup = BeautifulSoup(html, 'html.parser')
+    return {'news_details': news_data(soup, ticker), 'shares_float': extract_shares_float(soup)}
+
+# Parse a Finviz screener page
+def parse_screener_page(html: bytes, backend: Union[str, None] = None, encoding: str = PAGE_ENCODING) -> List[Dict[str, str]]:
+    """
+    Parses the companies listed on a Finviz screener page from raw html.
+
+    Args:
+        html: Raw html content
+        backend: Parser backend (default=PARSER_BACKEND)
+        encoding: Encoding of the raw html (default=PAGE_ENCODING)
+
+    Returns:
+        List of companies as dictionaries, see companies_summary_list_of_dictionaries
+    """
+    html = _decode(html, encoding)
+
+    if resolve_backend(backend) == 'lxml':
+        return _lxml_companies_summary(_lxml_tree(html))
+
+    from bs4 import BeautifulSoup
+
+    return companies_summary_list_of_dictionaries(BeautifulSoup(html, 'html.parser'))
@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Union
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from .snapshotCache import SnapshotStore
+from .rateControl import THROTTLE_STATUSES, controller_for, parse_retry_after
+from . import metrics
+
+# Browser User-Agent sent with every request
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+# Seconds to wait for a connection and between bytes of the response
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 30
+
+# Times a throttled request (429, 503) is sent again before its error is raised; the adaptive controller
+# cuts the rate and holds the retry back until Retry-After has passed
+THROTTLE_RETRIES = 3
+
+# Keep-alive connections kept open per host; should cover the max_in_flight of the crawls
+POOL_SIZE = 32
+
+# Hosts with a session kept open; the news crawl reaches many article hosts, the least recently used are closed
+MAX_SESSIONS = 16
+
+# One session per host (scheme and netloc), so every host has its own connection pool; most recently used last
+_sessions: 'OrderedDict[str, requests.Session]' = OrderedDict()
+_sessions_lock = threading.Lock()
+
+# Session of the host of a URL, created on first use
+def session_for(url: str) -> requests.Session:
+    """
+    Returns the shared session of the host of a URL; its connections are kept alive and reused by every thread.
+    Responses are compressed: requests asks for gzip and deflate, plus brotli when the brotli package is installed.
+    At most MAX_SESSIONS hosts keep a session, the least recently used one is closed to make room.
+
+    Args:
+        url: URL to be requested
+
+    Returns:
+        requests.Session
+    """
+    parts = urlsplit(url)
+    host = f"{parts.scheme}://{parts.netloc}"
+
+    with _sessions_lock:
+        if host in _sessions:
+            _sessions.move_to_end(host)
+            return _sessions[host]
+
+        # Requests still running on a closed session finish; their connections are discarded afterwards
+        while len(_sessions) >= MAX_SESSIONS:
+            _, oldest = _sessions.popitem(last=False)
+            oldest.close()
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        session.mount(host, adapter)
+        session.headers['User-Agent'] = USER_AGENT
+        _sessions[host] = session
+
+        return session
+
+# Close every pooled connection
+def close_sessions() -> None:
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+# Conditional request headers from the validators stored with a snapshot
+def _validator_headers(ref: Optional[Dict]) -> Dict[str, str]:
+    headers = {}
+    if ref and ref.get('etag'):
+        headers['If-None-Match'] = ref['etag']
+    if ref and ref.get('last_modified'):
+        headers['If-Modified-Since'] = ref['last_modified']
+    return headers
+
+# Download a page through the pooled session of its host, revalidating the stored snapshot if there is one
+def fetch(url: str,
+          source: str,
+          store: Optional[SnapshotStore] = None,
+          use_cache: bool = True,
+          raise_for_status: bool = True,
+          timeout: Union[float, tuple] = (CONNECT_TIMEOUT, READ_TIMEOUT)
+          ) -> Dict[str, Union[bytes, int, bool, float]]:
+    """
+    Gets a page over a kept-alive connection with compression and timeouts, paced by the adaptive rate controller
+    of its host (see rateControl), which learns from the status, latency and Retry-After of every response.
+    Throttled requests are retried up to THROTTLE_RETRIES times, once the controller lets them through again.
+    With a snapshot store, a fresh snapshot is returned without a request when use_cache is set; otherwise the stored
+    ETag and Last-Modified are sent and a 304 returns the stored body without downloading it again.
+
+    Args:
+        url: URL of the page
+        source: Label of the metrics, e.g. 'finviz'
+        store: Snapshot store holding the bodies and validators of the URL (default=None, nothing stored)
+        use_cache: Whether a fresh snapshot may be used without a request (default=True)
+        raise_for_status: Raise requests.HTTPError on 4xx and 5xx responses (default=True)
+        timeout: Seconds for connecting and reading, see requests (default=(CONNECT_TIMEOUT, READ_TIMEOUT))
+
+    Returns:
+        Dictionary: {'content':bytes, 'status':int, 'not_modified':bool, 'from_snapshot':bool, 'fetched_at':float}
+        not_modified is True when the server answered 304 and content is the stored body
+    """
+    ref = store.get_ref(url) if store is not None else None
+
+    if store is not None and use_cache:
+        content = store.get(url)
+        if content is not None:
+            metrics.inc('snapshot_hits_total', source=source)
+            return {'content': content, 'status': 200, 'not_modified': False, 'from_snapshot': True,
+                    'fetched_at': ref['fetched_at'] if ref else time.time()}
+
+    controller = controller_for(url)
+
+    for attempt in range(THROTTLE_RETRIES + 1):
+        # Waits out the pacing of the host and any Retry-After of an earlier response
+        controller.acquire()
+
+        start = time.perf_counter()
+        try:
+            with metrics.timer('fetch', source=source):
+                response = session_for(url).get(url, headers=_validator_headers(ref), timeout=timeout)
+        except requests.RequestException:
+            controller.record(None, time.perf_counter() - start)
+            raise
+        # Time to the headers: the body download depends on the page size, not on the load of the host
+        controller.record(response.status_code, response.elapsed.total_seconds(), parse_retry_after(response.headers.get('Retry-After')))
+
+        metrics.inc('http_responses_total', source=source, status=str(response.status_code))
+        # Bytes on the wire, before decompression
+        metrics.inc('bytes_downloaded_total', response.raw.tell() if response.content else 0, source=source)
+
+        # Throttling is part of finding the rate of a host, not a failure of the page
+        if response.status_code not in THROTTLE_STATUSES or attempt == THROTTLE_RETRIES:
+            break
+        metrics.inc('throttle_retries_total', source=source)
+
+    if response.status_code == 304 and store is not None:
+        content = store.get(url, max_age=float('inf'))
+
+        # The body was evicted since it was validated; download it in full
+        if content is None:
+            store.forget(url)
+            return fetch(url, source, store=store, use_cache=False, raise_for_status=raise_for_status, timeout=timeout)
+
+        store.touch(url)
+        return {'content': content, 'status': 304, 'not_modified': True, 'from_snapshot': True, 'fetched_at': time.time()}
+
+    if raise_for_status:
+        response.raise_for_status()
+
+    # Only successful responses are worth replaying
+    if store is not None and response.status_code == 200:
+        store.put(url, response.content, etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified'))
+
+    return {'content': response.content, 'status': response.status_code, 'not_modified': False, 'from_snapshot': False,
+            'fetched_at': time.time()}
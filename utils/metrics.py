@@ -0,0 +1,340 @@
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Tuple, Union
+
+# Upper bounds in seconds of the stage latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Window in seconds over which throughput is measured
+THROUGHPUT_WINDOW = 60
+
+# Completions needed before the measured throughput is trusted
+THROUGHPUT_MIN_SAMPLES = 5
+
+# Prefix of every exported metric name
+METRIC_PREFIX = 'prospectleap_'
+
+# Sorted (name, value) label pairs, used as part of a series key
+Labels = Tuple[Tuple[str, str], ...]
+
+# Cumulative histogram of observed values
+class Histogram:
+    """
+    Counts observations per bucket, plus their number and sum.
+
+    Args:
+        buckets: Sorted upper bounds of the buckets (default=LATENCY_BUCKETS)
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimates a quantile as the upper bound of the bucket it falls in.
+
+        Args:
+            q: Quantile between 0 and 1
+
+        Returns:
+            Estimated value (inf when it falls above the last bucket, 0 without observations)
+        """
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+
+        return float('inf')
+
+# Counters and histograms of one process, safe to update from any thread
+class Registry:
+    """
+    Holds the metrics of a process: counters (e.g. errors, bytes downloaded) and histograms (e.g. stage latency).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """
+        Adds value to a counter.
+
+        Args:
+            name: Counter name, e.g. 'bytes_downloaded_total'
+            value: Amount to add (default=1)
+            **labels: Labels of the series, e.g. source='finviz'
+
+        Returns:
+            None
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """
+        Records one value in a histogram.
+
+        Args:
+            name: Histogram name, e.g. 'stage_seconds'
+            value: Observed value
+            **labels: Labels of the series, e.g. stage='fetch'
+
+        Returns:
+            None
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = Histogram()
+            self._histograms[key].observe(value)
+
+    @contextmanager
+    def timer(self, stage: str, **labels: str):
+        """
+        Times a block as one run of a stage in 'stage_seconds' and counts it in 'stage_errors_total' when it raises.
+
+        Args:
+            stage: Stage name: 'fetch', 'parse' or 'db_write'
+            **labels: Additional labels, e.g. source='finviz'
+
+        Returns:
+            Context manager
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc('stage_errors_total', stage=stage, **labels)
+            raise
+        finally:
+            self.observe('stage_seconds', time.perf_counter() - start, stage=stage, **labels)
+
+    def timed(self, stage: str, **labels: str) -> Callable:
+        """
+        Decorator timing every call of a function with timer.
+
+        Args:
+            stage: Stage name
+            **labels: Additional labels
+
+        Returns:
+            Decorator
+        """
+        def decorator(function: Callable) -> Callable:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage, **labels):
+                    return function(*args, **kwargs)
+            return wrapper
+
+        return decorator
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns all metrics as plain data.
+
+        Returns:
+            Dictionary: {'timestamp':float, 'counters':[{'name', 'labels', 'value'}...],
+                         'histograms':[{'name', 'labels', 'count', 'sum', 'buckets':{'le': count}, 'p50', 'p95'}...]}
+        """
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = []
+            for (name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                cumulative = 0
+                buckets = {}
+                for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                    cumulative += count
+                    buckets['+Inf' if bound == float('inf') else str(bound)] = cumulative
+                histograms.append({'name': name, 'labels': dict(labels), 'count': histogram.count, 'sum': histogram.sum,
+                                   'buckets': buckets, 'p50': histogram.quantile(0.5), 'p95': histogram.quantile(0.95)})
+
+        return {'timestamp': time.time(), 'counters': counters, 'histograms': histograms}
+
+    def to_prometheus(self) -> str:
+        """
+        Renders all metrics in the Prometheus text exposition format (e.g. for the node_exporter textfile collector).
+
+        Returns:
+            Metrics as text
+        """
+        snapshot = self.snapshot()
+        lines = []
+
+        def label_text(labels: Dict[str, str], extra: Union[Dict[str, str], None] = None) -> str:
+            pairs = {**labels, **(extra or {})}
+            if not pairs:
+                return ''
+            return '{' + ','.join(f'{key}="{value}"' for key, value in pairs.items()) + '}'
+
+        typed = set()
+        for counter in snapshot['counters']:
+            name = METRIC_PREFIX + counter['name']
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{label_text(counter['labels'])} {counter['value']}")
+
+        for histogram in snapshot['histograms']:
+            name = METRIC_PREFIX + histogram['name']
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            for bound, count in histogram['buckets'].items():
+                lines.append(f"{name}_bucket{label_text(histogram['labels'], {'le': bound})} {count}")
+            lines.append(f"{name}_sum{label_text(histogram['labels'])} {histogram['sum']}")
+            lines.append(f"{name}_count{label_text(histogram['labels'])} {histogram['count']}")
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str) -> None:
+        """
+        Writes all metrics to a file, as JSON when the path ends with .json and as Prometheus text otherwise.
+        The file is replaced atomically, so collectors never read a partial file.
+
+        Args:
+            path: Output file, e.g. 'metrics.prom' or 'metrics.json'
+
+        Returns:
+            None
+        """
+        if path.endswith('.json'):
+            content = json.dumps(self.snapshot(), indent=2)
+        else:
+            content = self.to_prometheus()
+
+        with open(path + '.tmp', 'w') as f:
+            f.write(content)
+        os.replace(path + '.tmp', path)
+
+    def summary(self) -> str:
+        """
+        Short per-stage report for the end of a run.
+
+        Returns:
+            One line per stage with count, mean, p50 and p95 latency and errors
+        """
+        snapshot = self.snapshot()
+        errors = {tuple(sorted(counter['labels'].items())): counter['value']
+                  for counter in snapshot['counters'] if counter['name'] == 'stage_errors_total'}
+
+        lines = []
+        for histogram in snapshot['histograms']:
+            if histogram['name'] != 'stage_seconds' or not histogram['count']:
+                continue
+            labels = ', '.join(f'{key}={value}' for key, value in histogram['labels'].items())
+            mean = histogram['sum'] / histogram['count']
+            error_count = errors.get(tuple(sorted(histogram['labels'].items())), 0)
+            lines.append(f"{labels}: {histogram['count']} runs, mean {mean:.3f}s, p50 <= {histogram['p50']}s, "
+                         f"p95 <= {histogram['p95']}s, {error_count:.0f} errors")
+
+        for counter in snapshot['counters']:
+            if counter['name'] == 'bytes_downloaded_total':
+                labels = ', '.join(f'{key}={value}' for key, value in counter['labels'].items())
+                lines.append(f"downloaded ({labels}): {counter['value'] / 1e6:.1f} MB")
+
+        return '\n'.join(lines)
+
+# Process-wide registry used by the scrapers and the database helpers
+registry = Registry()
+
+# Module-level shortcuts to the process-wide registry
+inc = registry.inc
+observe = registry.observe
+timer = registry.timer
+timed = registry.timed
+
+# Write the process-wide metrics to the file named by PROSPECTLEAP_METRICS_FILE, if set
+def write_metrics_file() -> None:
+    path = os.environ.get('PROSPECTLEAP_METRICS_FILE')
+    if path:
+        registry.write(path)
+
+# Items completed per second over a sliding window
+class Throughput:
+    """
+    Measures the completion rate of a crawl and turns it into a time remaining.
+
+    Args:
+        window: Seconds of history the rate is measured over (default=THROUGHPUT_WINDOW)
+        min_samples: Completions needed before the measured rate is used (default=THROUGHPUT_MIN_SAMPLES)
+    """
+
+    def __init__(self, window: float = THROUGHPUT_WINDOW, min_samples: int = THROUGHPUT_MIN_SAMPLES) -> None:
+        self.window = window
+        self.min_samples = min_samples
+        self.started = time.monotonic()
+        self._completions = deque()
+
+    # Forget completions older than the window
+    def _prune(self, now: float) -> None:
+        while self._completions and now - self._completions[0] > self.window:
+            self._completions.popleft()
+
+    def tick(self, count: int = 1) -> None:
+        now = time.monotonic()
+        self._completions.extend([now] * count)
+        self._prune(now)
+
+    def rate(self) -> Union[float, None]:
+        """
+        Returns completions per second over the window, or None until min_samples completions were seen.
+
+        Returns:
+            Items per second or None
+        """
+        now = time.monotonic()
+        self._prune(now)
+
+        if len(self._completions) < self.min_samples:
+            return None
+
+        # Until the window is full, measure from the start of the crawl
+        elapsed = min(now - self.started, self.window)
+
+        return len(self._completions) / elapsed if elapsed > 0 else None
+
+    def eta(self, remaining: int, fallback_rate: Union[float, None] = None) -> Union[float, None]:
+        """
+        Estimates the seconds needed for the remaining items at the measured rate.
+
+        Args:
+            remaining: Number of items left
+            fallback_rate: Items per second used until the rate is measured (default=None)
+
+        Returns:
+            Seconds remaining or None when no rate is known
+        """
+        rate = self.rate() or fallback_rate
+        if not rate:
+            return None
+
+        return remaining / rate
@@ -0,0 +1,366 @@
+import sqlite3
+from typing import Callable, List, Tuple, Union
+from .utils import get_connection, reset_schema_cache
+
+# Migration 1: base tables (previously created by the dbXInit scripts)
+BASE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS companyDetails (
+        id INTEGER,
+        ticker TEXT PRIMARY KEY,
+        company TEXT,
+        sector TEXT,
+        industry TEXT,
+        country TEXT,
+        market_cap TEXT,
+        price NUMERIC,
+        float NUMERIC
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS finviz (
+        ticker TEXT,
+        date TEXT,
+        title TEXT,
+        link TEXT,
+        isInNewsDetails TEXT,
+        FOREIGN KEY (ticker) REFERENCES companyDetails(ticker)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS newsDetails (
+        link TEXT,
+        ticker TEXT,
+        date TEXT,
+        title TEXT,
+        fullText TEXT,
+        FOREIGN KEY (ticker) REFERENCES companyDetails(ticker)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS trackerFinviz (
+        ticker TEXT NOT NULL,
+        finvizStatus TEXT NOT NULL,
+        FOREIGN KEY (ticker) REFERENCES companyDetails(ticker)
+    )
+    """,
+]
+
+# Migration 2: (ticker, link) natural key on finviz, removing duplicates stored before it existed
+FINVIZ_UNIQUE_KEY = [
+    """
+    DELETE FROM finviz
+    WHERE rowid NOT IN (
+        SELECT MIN(rowid)
+        FROM finviz
+        GROUP BY ticker, link
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_finviz_ticker_link ON finviz (ticker, link)",
+]
+
+# Migration 3: lookup indexes (finviz lookups by ticker use the leading column of ux_finviz_ticker_link)
+LOOKUP_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_finviz_link ON finviz (link)",
+    "CREATE INDEX IF NOT EXISTS ix_newsDetails_link ON newsDetails (link)",
+    "CREATE INDEX IF NOT EXISTS ix_newsDetails_ticker_date ON newsDetails (ticker, date)",
+    "CREATE INDEX IF NOT EXISTS ix_trackerFinviz_ticker ON trackerFinviz (ticker)",
+    "CREATE INDEX IF NOT EXISTS ix_trackerFinviz_finvizStatus ON trackerFinviz (finvizStatus)",
+]
+
+# Migration 4: lease columns so several workers can claim TODO tickers without double work
+TRACKER_LEASES = [
+    "ALTER TABLE trackerFinviz ADD COLUMN leaseOwner TEXT",
+    "ALTER TABLE trackerFinviz ADD COLUMN leaseExpiry REAL",
+]
+
+# Migration 5: per-ticker poll schedule of the refresh daemon
+POLL_SCHEDULE = [
+    """
+    CREATE TABLE IF NOT EXISTS pollSchedule (
+        ticker TEXT PRIMARY KEY,
+        lastPolled REAL,
+        nextPoll REAL NOT NULL,
+        headlineRate REAL NOT NULL DEFAULT 0,
+        FOREIGN KEY (ticker) REFERENCES companyDetails(ticker)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_pollSchedule_nextPoll ON pollSchedule (nextPoll)",
+]
+
+# Migration 6: one newsDetails row per (link, ticker) and a partial index on headlines not fetched yet
+NEWS_DETAILS_QUEUE = [
+    """
+    DELETE FROM newsDetails
+    WHERE rowid NOT IN (
+        SELECT MIN(rowid)
+        FROM newsDetails
+        GROUP BY link, ticker
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_newsDetails_link_ticker ON newsDetails (link, ticker)",
+    "DROP INDEX IF EXISTS ix_newsDetails_link",
+    "CREATE INDEX IF NOT EXISTS ix_finviz_pending ON finviz (link) WHERE isInNewsDetails IS NULL",
+]
+
+# Migration 7: zstd dictionaries for compressed newsDetails.fullText (see utils.textCompression)
+COMPRESSION_DICTIONARY = [
+    """
+    CREATE TABLE IF NOT EXISTS compressionDictionary (
+        id INTEGER PRIMARY KEY,
+        createdAt REAL NOT NULL,
+        dictionary BLOB NOT NULL
+    )
+    """,
+]
+
+# Migration 8: FTS5 search over finviz.title, newsDetails.title and newsDetails.fullText, kept in sync by triggers
+# newsDetailsFts is contentless (fullText may be compressed, see utils.textCompression), so its triggers need
+# pl_decompress(); it is registered on every connection opened by utils.get_connection. Migration 14 drops them
+FULL_TEXT_SEARCH = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS finvizFts USING fts5(title, content='finviz', content_rowid='rowid')",
+    """
+    CREATE TRIGGER IF NOT EXISTS finviz_fts_insert AFTER INSERT ON finviz BEGIN
+        INSERT INTO finvizFts (rowid, title) VALUES (new.rowid, new.title);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS finviz_fts_delete AFTER DELETE ON finviz BEGIN
+        INSERT INTO finvizFts (finvizFts, rowid, title) VALUES ('delete', old.rowid, old.title);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS finviz_fts_update AFTER UPDATE OF title ON finviz BEGIN
+        INSERT INTO finvizFts (finvizFts, rowid, title) VALUES ('delete', old.rowid, old.title);
+        INSERT INTO finvizFts (rowid, title) VALUES (new.rowid, new.title);
+    END
+    """,
+    "INSERT INTO finvizFts (finvizFts) VALUES ('rebuild')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS newsDetailsFts USING fts5(title, fullText, content='')",
+    """
+    CREATE TRIGGER IF NOT EXISTS newsDetails_fts_insert AFTER INSERT ON newsDetails BEGIN
+        INSERT INTO newsDetailsFts (rowid, title, fullText) VALUES (new.rowid, new.title, pl_decompress(new.fullText));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS newsDetails_fts_delete AFTER DELETE ON newsDetails BEGIN
+        INSERT INTO newsDetailsFts (newsDetailsFts, rowid, title, fullText) VALUES ('delete', old.rowid, old.title, pl_decompress(old.fullText));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS newsDetails_fts_update AFTER UPDATE OF title, fullText ON newsDetails
+    WHEN old.title IS NOT new.title OR pl_decompress(old.fullText) IS NOT pl_decompress(new.fullText) BEGIN
+        INSERT INTO newsDetailsFts (newsDetailsFts, rowid, title, fullText) VALUES ('delete', old.rowid, old.title, pl_decompress(old.fullText));
+        INSERT INTO newsDetailsFts (rowid, title, fullText) VALUES (new.rowid, new.title, pl_decompress(new.fullText));
+    END
+    """,
+    "INSERT INTO newsDetailsFts (rowid, title, fullText) SELECT rowid, title, pl_decompress(fullText) FROM newsDetails",
+]
+
+# Migration 9: one canonical newsDetails row per article, ticker links and near-duplicate fingerprints
+def _canonical_articles(con: sqlite3.Connection) -> None:
+    from .nearDuplicate import add_fingerprint, minhash
+
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS articleTickers (
+            canonicalLink TEXT NOT NULL,
+            ticker TEXT NOT NULL,
+            link TEXT NOT NULL,
+            PRIMARY KEY (canonicalLink, ticker, link)
+        ) WITHOUT ROWID
+    """)
+    con.execute("CREATE INDEX IF NOT EXISTS ix_articleTickers_ticker ON articleTickers (ticker, canonicalLink)")
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS articleFingerprint (
+            link TEXT PRIMARY KEY,
+            canonicalLink TEXT NOT NULL,
+            minhash BLOB NOT NULL
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS articleLsh (
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            link TEXT NOT NULL
+        )
+    """)
+    con.execute("CREATE INDEX IF NOT EXISTS ix_articleLsh_band_bucket ON articleLsh (band, bucket)")
+
+    # Keep the tickers of existing per-ticker copies, then keep one row per article
+    con.execute("""
+        INSERT INTO articleTickers (canonicalLink, ticker, link)
+        SELECT link, ticker, link
+        FROM newsDetails
+        WHERE ticker IS NOT NULL
+        ON CONFLICT DO NOTHING
+    """)
+    con.execute("""
+        DELETE FROM newsDetails
+        WHERE rowid NOT IN (
+            SELECT MIN(rowid)
+            FROM newsDetails
+            GROUP BY link
+        )
+    """)
+    con.execute("DROP INDEX IF EXISTS ux_newsDetails_link_ticker")
+    con.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_newsDetails_link ON newsDetails (link)")
+
+    # Fingerprint existing articles so new copies are matched against them
+    cursor = con.execute("SELECT link, pl_decompress(fullText) FROM newsDetails WHERE fullText IS NOT NULL")
+    while True:
+        rows = cursor.fetchmany(1000)
+        if not rows:
+            break
+        for link, text in rows:
+            add_fingerprint(con, link, link, minhash(text))
+
+# Migration 10: UTC publication time of headlines, parsed from the Finviz date cell
+def _finviz_published_at(con: sqlite3.Connection) -> None:
+    from .finvizDates import published_at
+
+    con.execute("ALTER TABLE finviz ADD COLUMN publishedAt INTEGER")
+    con.execute("CREATE INDEX IF NOT EXISTS ix_finviz_publishedAt ON finviz (publishedAt)")
+    con.execute("CREATE INDEX IF NOT EXISTS ix_finviz_ticker_publishedAt ON finviz (ticker, publishedAt)")
+
+    # Rows of a ticker were inserted in page order, so rowid order carries days forward correctly.
+    # The fetch time of old rows is unknown, so 'Today' and 'Yesterday' cells stay NULL
+    rows = con.execute("SELECT rowid, ticker, date FROM finviz ORDER BY ticker, rowid").fetchall()
+    if not rows:
+        return
+
+    rowids, tickers, dates = zip(*rows)
+    timestamps = published_at(list(dates), tickers=list(tickers))
+
+    con.executemany("UPDATE finviz SET publishedAt = ? WHERE rowid = ?",
+                    [(timestamp, rowid) for timestamp, rowid in zip(timestamps, rowids) if timestamp is not None])
+
+# Migration 11: screener crawls and the pages each one has stored, so an interrupted crawl resumes where it stopped
+SCREENER_CHECKPOINT = [
+    """
+    CREATE TABLE IF NOT EXISTS screenerCrawl (
+        crawlId INTEGER PRIMARY KEY,
+        startedAt REAL NOT NULL,
+        finishedAt REAL,
+        lastPage INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS screenerPage (
+        crawlId INTEGER NOT NULL,
+        pageRow INTEGER NOT NULL,
+        companies INTEGER NOT NULL,
+        fetchedAt REAL NOT NULL,
+        PRIMARY KEY (crawlId, pageRow),
+        FOREIGN KEY (crawlId) REFERENCES screenerCrawl(crawlId)
+    ) WITHOUT ROWID
+    """,
+]
+
+# Migration 12: delisted flag on companyDetails and the tickers seen by a screener crawl, for diff-based refreshes
+COMPANY_DETAILS_DELISTED = [
+    "ALTER TABLE companyDetails ADD COLUMN delisted INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE companyDetails ADD COLUMN delistedAt REAL",
+    """
+    CREATE TABLE IF NOT EXISTS screenerTicker (
+        crawlId INTEGER NOT NULL,
+        ticker TEXT NOT NULL,
+        PRIMARY KEY (crawlId, ticker),
+        FOREIGN KEY (crawlId) REFERENCES screenerCrawl(crawlId)
+    ) WITHOUT ROWID
+    """,
+]
+
+# Migration 13: last exported rowid per table of the incremental Parquet export (see utils.parquetExport)
+EXPORT_WATERMARK = [
+    """
+    CREATE TABLE IF NOT EXISTS exportWatermark (
+        tableName TEXT PRIMARY KEY,
+        lastRowid INTEGER NOT NULL,
+        exportedAt REAL NOT NULL
+    )
+    """,
+]
+
+# Migration 14: newsDetailsFts is kept in sync by utils.news_details_commit_batch instead of triggers. The triggers called
+# pl_decompress(), so any connection not opened by utils.get_connection (sqlite3 shell, DB browsers, backup scripts)
+# failed on every write to newsDetails
+NEWS_DETAILS_FTS_WITHOUT_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS newsDetails_fts_insert",
+    "DROP TRIGGER IF EXISTS newsDetails_fts_delete",
+    "DROP TRIGGER IF EXISTS newsDetails_fts_update",
+]
+
+# Ordered list of migrations: (version, description, SQL statements or function taking a sqlite3 connection)
+MIGRATIONS: List[Tuple[int, str, Union[List[str], Callable[[sqlite3.Connection], None]]]] = [
+    (1, "Create base tables", BASE_TABLES),
+    (2, "Unique (ticker, link) key on finviz", FINVIZ_UNIQUE_KEY),
+    (3, "Lookup indexes on finviz, newsDetails and trackerFinviz", LOOKUP_INDEXES),
+    (4, "Lease columns on trackerFinviz", TRACKER_LEASES),
+    (5, "Poll schedule of the refresh daemon", POLL_SCHEDULE),
+    (6, "Unique (link, ticker) key on newsDetails and pending headlines index", NEWS_DETAILS_QUEUE),
+    (7, "Compression dictionaries for newsDetails.fullText", COMPRESSION_DICTIONARY),
+    (8, "FTS5 search index over headlines and articles", FULL_TEXT_SEARCH),
+    (9, "Canonical articles, article tickers and near-duplicate fingerprints", _canonical_articles),
+    (10, "Publication time of finviz headlines", _finviz_published_at),
+    (11, "Screener crawl checkpoints", SCREENER_CHECKPOINT),
+    (12, "Delisted flag on companyDetails", COMPANY_DETAILS_DELISTED),
+    (13, "Parquet export watermarks", EXPORT_WATERMARK),
+    (14, "newsDetailsFts without triggers", NEWS_DETAILS_FTS_WITHOUT_TRIGGERS),
+]
+
+# Get the schema version of a database
+def schema_version(db_path: str) -> int:
+    """
+    Returns the schema version recorded in the database.
+
+    Args:
+        db_path: Path to the database
+
+    Returns:
+        Version of the last applied migration (0 for a database never migrated)
+    """
+    con = get_connection(db_path).con
+
+    return con.execute("PRAGMA user_version").fetchone()[0]
+
+# Upgrade a database in place to the latest (or a given) schema version
+def migrate(db_path: str, target_version: Union[int, None] = None) -> List[int]:
+    """
+    Applies every migration newer than the database schema version, each in its own transaction.
+
+    Args:
+        db_path: Path to the database
+        target_version: Last version to apply (default=latest)
+
+    Returns:
+        List of applied versions
+    """
+    con = get_connection(db_path).con
+    current_version = schema_version(db_path)
+    applied = []
+
+    for version, description, steps in MIGRATIONS:
+        if version <= current_version or (target_version is not None and version > target_version):
+            continue
+
+        # Finish any implicit transaction and take the write lock up front
+        if con.in_transaction:
+            con.commit()
+        con.execute('BEGIN IMMEDIATE')
+
+        # Commit on success, roll back the whole migration on error
+        with con:
+            if callable(steps):
+                steps(con)
+            else:
+                for statement in steps:
+                    con.execute(statement)
+            con.execute(f"PRAGMA user_version = {version}")
+
+        print(f"Applied migration {version}: {description}")
+        applied.append(version)
+
+    # Columns may have changed
+    reset_schema_cache()
+
+    return applied
@@ -0,0 +1,163 @@
+import functools
+import hashlib
+import re
+import sqlite3
+import zlib
+from typing import TYPE_CHECKING, List, Tuple, Union
+
+# numpy is imported on first use, so importing the database helpers stays fast
+if TYPE_CHECKING:
+    import numpy as np
+
+# MinHash settings: NUM_PERMUTATIONS = BANDS * ROWS_PER_BAND
+# Bodies with a Jaccard similarity around (1 / BANDS) ** (1 / ROWS_PER_BAND) ≈ 0.71 or more share an LSH bucket
+NUM_PERMUTATIONS = 128
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+
+# Estimated Jaccard similarity from which two bodies are considered the same article
+SIMILARITY_THRESHOLD = 0.8
+
+# Number of consecutive words per shingle
+SHINGLE_SIZE = 5
+
+# Fixed hash permutations h(x) = (a * x + b) mod p, identical in every process so signatures can be stored
+_PRIME = (1 << 31) - 1
+
+# Coefficients a and b of the permutations, drawn once per process
+@functools.lru_cache(maxsize=None)
+def _permutations() -> Tuple['np.ndarray', 'np.ndarray']:
+    import numpy as np
+
+    random = np.random.RandomState(20241029)
+    a = random.randint(1, _PRIME, size=NUM_PERMUTATIONS, dtype=np.uint64)
+    b = random.randint(0, _PRIME, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+    return a, b
+
+# MinHash signature of a text
+def minhash(text: str) -> Union['np.ndarray', None]:
+    """
+    Computes the MinHash signature of a text from its word shingles.
+    Punctuation and whitespace are ignored, so raw and cleaned text of the same article give the same signature.
+
+    Args:
+        text: Article text
+
+    Returns:
+        Signature as an array of NUM_PERMUTATIONS uint32 values, or None for text too short to fingerprint
+    """
+    import numpy as np
+
+    words = re.findall(r'\w+', text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return None
+
+    shingles = {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+
+    # One row per permutation, minimum over all shingles
+    a, b = _permutations()
+    permuted = (a[:, None] * hashes[None, :] + b[:, None]) % _PRIME
+
+    return permuted.min(axis=1).astype(np.uint32)
+
+# Estimated Jaccard similarity of two signatures
+def similarity(signature: 'np.ndarray', other: 'np.ndarray') -> float:
+    """
+    Estimates the Jaccard similarity of two texts from their signatures.
+
+    Args:
+        signature: MinHash signature
+        other: MinHash signature
+
+    Returns:
+        Similarity between 0 and 1
+    """
+    return float((signature == other).mean())
+
+# LSH buckets of a signature, one per band
+def lsh_buckets(signature: 'np.ndarray') -> List[tuple]:
+    """
+    Splits a signature into BANDS bands and hashes each band into a bucket.
+
+    Args:
+        signature: MinHash signature
+
+    Returns:
+        List of (band, bucket) tuples
+    """
+    buckets = []
+    for band in range(BANDS):
+        band_bytes = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()
+        bucket = int.from_bytes(hashlib.blake2b(band_bytes, digest_size=8).digest(), 'little', signed=True)
+        buckets.append((band, bucket))
+
+    return buckets
+
+# Find the canonical article a signature duplicates
+def find_canonical(con: sqlite3.Connection, signature: Union['np.ndarray', None]) -> Union[str, None]:
+    """
+    Looks up canonical articles sharing an LSH bucket with the signature and returns the most similar one above SIMILARITY_THRESHOLD.
+
+    Args:
+        con: sqlite3 connection to the database
+        signature: MinHash signature of the new article (None never matches)
+
+    Returns:
+        Link of the canonical article or None if the article is new
+    """
+    if signature is None:
+        return None
+
+    buckets = lsh_buckets(signature)
+    placeholders = ', '.join('(?, ?)' for _ in buckets)
+
+    candidates = con.execute(f"""
+        SELECT DISTINCT fp.link, fp.minhash
+        FROM articleLsh lsh
+        JOIN articleFingerprint fp ON fp.link = lsh.link
+        WHERE (lsh.band, lsh.bucket) IN (VALUES {placeholders})
+    """, [value for bucket in buckets for value in bucket]).fetchall()
+
+    import numpy as np
+
+    best_link = None
+    best_similarity = SIMILARITY_THRESHOLD
+    for link, stored in candidates:
+        candidate_similarity = similarity(signature, np.frombuffer(stored, dtype=np.uint32))
+        if candidate_similarity >= best_similarity:
+            best_link = link
+            best_similarity = candidate_similarity
+
+    return best_link
+
+# Record the fingerprint of an article
+def add_fingerprint(con: sqlite3.Connection, link: str, canonical_link: str, signature: Union['np.ndarray', None]) -> None:
+    """
+    Stores the signature of an article; canonical articles are also added to the LSH index.
+    Must run inside the caller's transaction.
+
+    Args:
+        con: sqlite3 connection to the database
+        link: Link of the article
+        canonical_link: Link of the canonical article (link itself for a new article)
+        signature: MinHash signature (None stores nothing)
+
+    Returns:
+        None
+    """
+    if signature is None:
+        return
+
+    con.execute("""
+        INSERT INTO articleFingerprint (link, canonicalLink, minhash)
+        VALUES (?, ?, ?)
+        ON CONFLICT (link) DO NOTHING
+    """, (link, canonical_link, signature.tobytes()))
+
+    if link == canonical_link:
+        con.executemany("""
+            INSERT INTO articleLsh (band, bucket, link)
+            VALUES (?, ?, ?)
+        """, [(band, bucket, link) for band, bucket in lsh_buckets(signature)])
@@ -1,14 +1,14 @@
-import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-import pandas as pd
-from datetime import datetime, timedelta
-import time
+import atexit
+import threading
+from .nearDuplicate import find_canonical, minhash
+from .utils import get_connection
+from .httpClient import fetch
+from . import metrics
 import re
 
+# bs4, pandas and selenium (through chromePool) are imported by the functions that use them,
+# so importing this module does not load a browser stack that most runs never touch
+
 # Clean the the text from whitespaces, newlines and etc.
 def clean_text(text):
     # Remove extra whitespace, including newlines and carriage returns
@@ -23,35 +23,42 @@ def is_to_be_scraped_by_selenium(url, domains=["finance.yahoo.com"]):
 
 # Get html content from 3d party news provider - with simple BeautifulSoup
 def scrape_tp_news_html_content(url):
-    response = requests.get(url)
-    soup = BeautifulSoup(response.content, 'html.parser')
+    # Articles are fetched once per link, so they are not kept for revalidation
+    page = fetch(url, source='news', raise_for_status=False)
+
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(page['content'], 'html.parser')
 
     return soup
 
-# Get html content from 3d party news provider - modified with Selenium
-def scrape_tp_news_html_content_selenium(url):
-   # Set up Chrome options
-   chrome_options = Options()
-   chrome_options.add_argument("--headless")  # Run in headless mode (no GUI)
+# Shared pool of headless Chrome drivers, created on first use and reused across URLs
+_chrome_pool = None
+_chrome_pool_lock = threading.Lock()
 
-   # Set up the Chrome driver
-   service = Service(ChromeDriverManager().install())
-   driver = webdriver.Chrome(service=service, options=chrome_options)
+# Get the shared Chrome pool, creating it and its exit hook on first use
+def chrome_pool():
+    global _chrome_pool
 
-   try:
-       # Navigate to the URL
-       driver.get(url)
-       
-       # Wait for the page to load
-       time.sleep(5)
+    with _chrome_pool_lock:
+        if _chrome_pool is None:
+            from .chromePool import ChromePool
+            _chrome_pool = ChromePool()
+            atexit.register(_chrome_pool.close)
 
-       # Get the page source and parse it with BeautifulSoup
-       soup = BeautifulSoup(driver.page_source, 'html.parser')
-       return soup
+    return _chrome_pool
 
-   finally:
-       # Always close the driver
-       driver.quit()
+# Get html content from 3d party news provider - modified with Selenium
+def scrape_tp_news_html_content_selenium(url):
+    # Load the page on a pooled driver and wait for the article to render
+    with metrics.timer('fetch', source='news_selenium'):
+        page_source = chrome_pool().page_source(url)
+
+    metrics.inc('bytes_downloaded_total', len(page_source.encode('utf-8')), source='news_selenium')
+
+    # Parse the page source with BeautifulSoup
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(page_source, 'html.parser')
+    return soup
 
 
 # Parse 3rd party html content to list of dictionaries [{full_text:value, exact_date:value}]
@@ -74,12 +81,55 @@ def tp_news_data(tp_news_html_content):
     
     return results
 
+# Fetch and parse one article; only reads the database to skip cleaning articles already stored under another link
+def news_details_for_link(url, db_path=None):
+    """
+    Gets the full text and exact date of one article and records whether it succeeded, ready for utils.news_details_commit_batch.
+    The body is fingerprinted first; when db_path is given and the body nearly duplicates a stored article,
+    text cleaning is skipped and the article is returned as a duplicate of it.
+
+    Args:
+        url: Link of the article
+        db_path: Path to the database used for the near-duplicate lookup (default=None, no lookup)
+
+    Returns:
+        Dictionary: {'link':'str', 'exact_date':'str', 'full_text':'str', 'minhash':array or None,
+                     'canonical_link':'str' or None, 'status':'completed', 'duplicate' or 'error'}
+    """
+    try:
+        if is_to_be_scraped_by_selenium(url):
+            soup = scrape_tp_news_html_content_selenium(url)
+        else:
+            soup = scrape_tp_news_html_content(url)
+
+        # Fingerprint the raw body
+        with metrics.timer('fingerprint', source='news'):
+            signature = minhash(' '.join([p.text for p in soup.find_all('p')]))
+            canonical_link = find_canonical(get_connection(db_path).con, signature) if db_path else None
+
+        if canonical_link and canonical_link != url:
+            return {'link': url, 'exact_date': '', 'full_text': '', 'minhash': signature,
+                    'canonical_link': canonical_link, 'status': 'duplicate'}
+
+        with metrics.timer('parse', source='news'):
+            news = tp_news_data(soup)
+        status = 'completed'
+    except Exception as e:
+        print(f"Error processing {url}: {str(e)}")
+        news = {'exact_date': '', 'full_text': ''}
+        signature = None
+        status = 'error'
+
+    return {'link': url, **news, 'minhash': signature, 'canonical_link': None, 'status': status}
+
 # Append 3rd party news to Global News List 
 def append_tp_news(gl_news_list, news):
     gl_news_list.append(news)
 
 # Create pandas DataFrame from Global News List
-def tp_news_dataframe(gl_news_list):    
+def tp_news_dataframe(gl_news_list):
+    import pandas as pd
+
     return pd.DataFrame(gl_news_list)
 
 
@@ -0,0 +1,214 @@
+import os
+import shutil
+import sqlite3
+import time
+from typing import Dict, List, Union
+from .utils import get_connection
+
+# pyarrow is optional; it is only needed to export
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as pds
+except ImportError:
+    pa = None
+    pds = None
+
+# Default root directory of the exported datasets, one subdirectory per table
+EXPORT_DIR = 'exports'
+
+# Number of rows read from SQLite and written per Parquet file
+EXPORT_BATCH_ROWS = 100000
+
+# Rows per Parquet row group; small enough that the ticker range of a group is selective
+ROW_GROUP_ROWS = 10000
+
+# Append-only tables exported incrementally by rowid, partitioned by UTC publication day (hive style: date=2024-10-29).
+# Rows are sorted by ticker within every file, so row group statistics let readers skip tickers as well.
+# Only columns that never change after insert are exported. The publication time of an article is looked up per row
+# through ix_finviz_link, so a batch reads only the headlines of its own articles
+INCREMENTAL_EXPORTS = {
+    'finviz': """
+        SELECT rowid AS _rowid, ticker, date AS dateCell, publishedAt, title, link,
+               strftime('%Y-%m-%d', publishedAt, 'unixepoch') AS date
+        FROM finviz
+        WHERE rowid > ?
+        ORDER BY rowid
+        LIMIT ?
+    """,
+    'newsDetails': """
+        SELECT _rowid, link, ticker, articleDate, title, fullText, publishedAt,
+               strftime('%Y-%m-%d', publishedAt, 'unixepoch') AS date
+        FROM (
+            SELECT n.rowid AS _rowid, n.link, n.ticker, n.date AS articleDate, n.title, pl_decompress(n.fullText) AS fullText,
+                   (SELECT MIN(f.publishedAt) FROM finviz f WHERE f.link = n.link) AS publishedAt
+            FROM newsDetails n
+            WHERE n.rowid > ?
+            ORDER BY n.rowid
+            LIMIT ?
+        )
+    """,
+}
+
+# Column types of the incremental exports, fixed so that every file of a dataset has the same schema
+INCREMENTAL_SCHEMAS = {
+    'finviz': {'_rowid': 'int64', 'ticker': 'string', 'dateCell': 'string', 'publishedAt': 'int64',
+               'title': 'string', 'link': 'string', 'date': 'string'},
+    'newsDetails': {'_rowid': 'int64', 'link': 'string', 'ticker': 'string', 'articleDate': 'string', 'title': 'string',
+                    'fullText': 'string', 'publishedAt': 'int64', 'date': 'string'},
+}
+
+# Small tables updated in place, rewritten as a whole on every export
+SNAPSHOT_EXPORTS = {
+    'companyDetails': "SELECT * FROM companyDetails ORDER BY ticker",
+}
+
+# Fail with a clear message when exporting without pyarrow
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("Parquet export requires the pyarrow package")
+
+# Last exported rowid of a table
+def export_watermark(con: sqlite3.Connection, table_name: str) -> int:
+    """
+    Returns the rowid up to which a table was exported.
+
+    Args:
+        con: sqlite3 connection to the database
+        table_name: Name of the exported table
+
+    Returns:
+        Last exported rowid (0 when the table was never exported)
+    """
+    row = con.execute("SELECT lastRowid FROM exportWatermark WHERE tableName = ?", (table_name,)).fetchone()
+
+    return row[0] if row else 0
+
+# Record the last exported rowid of a table
+def _set_watermark(con: sqlite3.Connection, table_name: str, last_rowid: int) -> None:
+    with con:
+        con.execute("""
+            INSERT INTO exportWatermark (tableName, lastRowid, exportedAt)
+            VALUES (?, ?, ?)
+            ON CONFLICT (tableName) DO UPDATE SET lastRowid = excluded.lastRowid, exportedAt = excluded.exportedAt
+        """, (table_name, last_rowid, time.time()))
+
+# Append the rows of a table added since its watermark
+def export_incremental(db_path: str,
+                       table_name: str,
+                       export_dir: str = EXPORT_DIR,
+                       batch_rows: int = EXPORT_BATCH_ROWS
+                       ) -> int:
+    """
+    Appends rows inserted since the last export of a table to its Parquet dataset, partitioned by publication day.
+    Every batch is written before the watermark moves; file names derive from the batch's first rowid, so a batch
+    repeated after a crash overwrites its own files instead of duplicating rows.
+
+    Args:
+        db_path: Path to the database
+        table_name: Table to export, one of INCREMENTAL_EXPORTS
+        export_dir: Root directory of the datasets (default=EXPORT_DIR)
+        batch_rows: Number of rows per batch (default=EXPORT_BATCH_ROWS)
+
+    Returns:
+        Number of rows exported
+    """
+    _require_pyarrow()
+
+    con = get_connection(db_path).con
+    query = INCREMENTAL_EXPORTS[table_name]
+    schema = pa.schema([(name, pa.type_for_alias(type_name)) for name, type_name in INCREMENTAL_SCHEMAS[table_name].items()])
+    last_rowid = export_watermark(con, table_name)
+    exported = 0
+
+    while True:
+        rows = con.execute(query, (last_rowid, batch_rows)).fetchall()
+        if not rows:
+            break
+
+        table = pa.Table.from_pylist([dict(zip(schema.names, row)) for row in rows], schema=schema)
+        first_rowid = table.column('_rowid')[0].as_py()
+        last_rowid = table.column('_rowid')[-1].as_py()
+        table = table.drop_columns(['_rowid']).sort_by([('ticker', 'ascending')])
+
+        pds.write_dataset(table,
+                          os.path.join(export_dir, table_name),
+                          format='parquet',
+                          partitioning=['date'],
+                          partitioning_flavor='hive',
+                          basename_template=f'part-{first_rowid:012d}-{{i}}.parquet',
+                          max_rows_per_group=ROW_GROUP_ROWS,
+                          existing_data_behavior='overwrite_or_ignore')
+
+        _set_watermark(con, table_name, last_rowid)
+        exported += len(rows)
+
+    return exported
+
+# Rewrite a small table as one Parquet file
+def export_snapshot(db_path: str, table_name: str, export_dir: str = EXPORT_DIR) -> int:
+    """
+    Writes the current content of a table as a single Parquet file, replacing the previous export.
+
+    Args:
+        db_path: Path to the database
+        table_name: Table to export, one of SNAPSHOT_EXPORTS
+        export_dir: Root directory of the datasets (default=EXPORT_DIR)
+
+    Returns:
+        Number of rows exported
+    """
+    _require_pyarrow()
+    import pyarrow.parquet as pq
+
+    con = get_connection(db_path).con
+    cursor = con.execute(SNAPSHOT_EXPORTS[table_name])
+    columns = [description[0] for description in cursor.description]
+    table = pa.Table.from_pylist([dict(zip(columns, row)) for row in cursor.fetchall()])
+
+    # Write next to the old file and swap, so readers never see a partial file
+    table_dir = os.path.join(export_dir, table_name)
+    os.makedirs(table_dir, exist_ok=True)
+    path = os.path.join(table_dir, f'{table_name}.parquet')
+    pq.write_table(table, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+    return table.num_rows
+
+# Export every table
+def export_all(db_path: str,
+               export_dir: str = EXPORT_DIR,
+               full: bool = False,
+               tables: Union[List[str], None] = None
+               ) -> Dict[str, int]:
+    """
+    Exports the analytics tables to Parquet: finviz and newsDetails incrementally, companyDetails as a snapshot.
+    A full export drops the datasets and watermarks first; it is needed after VACUUM, which may renumber rowids.
+
+    Args:
+        db_path: Path to the database
+        export_dir: Root directory of the datasets (default=EXPORT_DIR)
+        full: Re-export every row instead of appending new rows (default=False)
+        tables: Tables to export (default=all)
+
+    Returns:
+        Number of rows exported per table: {'table': int}
+    """
+    _require_pyarrow()
+
+    con = get_connection(db_path).con
+    tables = tables or list(INCREMENTAL_EXPORTS) + list(SNAPSHOT_EXPORTS)
+    exported = {}
+
+    for table_name in tables:
+        if table_name in INCREMENTAL_EXPORTS:
+            if full:
+                shutil.rmtree(os.path.join(export_dir, table_name), ignore_errors=True)
+                with con:
+                    con.execute("DELETE FROM exportWatermark WHERE tableName = ?", (table_name,))
+            exported[table_name] = export_incremental(db_path, table_name, export_dir=export_dir)
+        elif table_name in SNAPSHOT_EXPORTS:
+            exported[table_name] = export_snapshot(db_path, table_name, export_dir=export_dir)
+        else:
+            raise ValueError(f"Unknown export table: {table_name}")
+
+    return exported
@@ -0,0 +1,283 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+from . import metrics
+
+# Default request rates of a host, in requests per second: where the adaptive controller starts and its bounds
+INITIAL_RATE = 1.0
+MIN_RATE = 0.05
+MAX_RATE = 10.0
+
+# AIMD steps: the rate grows by ADDITIVE_INCREASE requests/s per second of successful responses
+# and is multiplied by MULTIPLICATIVE_DECREASE on throttling
+ADDITIVE_INCREASE = 0.1
+MULTIPLICATIVE_DECREASE = 0.5
+
+# Responses that mean the host is throttling us; timeouts and connection errors count as well
+THROTTLE_STATUSES = (429, 503)
+
+# Smoothed latency above LATENCY_FACTOR times its baseline, and at least LATENCY_MIN_RISE seconds above it, means the host is overloaded
+LATENCY_FACTOR = 2.0
+LATENCY_MIN_RISE = 0.05
+LATENCY_SMOOTHING = 0.2
+
+# Share of the gap to the smoothed latency the baseline moves per response when latency rises, so it follows a slower host
+BASELINE_DRIFT = 0.01
+
+# Minimum seconds between two decreases, so the responses of requests already in flight do not cut the rate again
+DECREASE_COOLDOWN = 1.0
+
+# Longest Retry-After honoured, in seconds
+MAX_RETRY_AFTER = 600
+
+# Token bucket that spreads requests evenly over time across all worker threads
+class RateLimiter:
+    """
+    Global requests-per-second budget shared by every thread of a crawl.
+
+    Args:
+        requests_per_second: Sustained number of requests allowed per second
+        burst: Number of requests that may be issued back to back after an idle period (default=1)
+    """
+
+    def __init__(self, requests_per_second: float, burst: int = 1) -> None:
+        # Input validation
+        if requests_per_second <= 0:
+            raise ValueError("requests_per_second must be greater than 0")
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Blocks the calling thread until a request may be issued.
+
+        Returns:
+            None
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                elapsed = now - self._last_refill
+                self._tokens = min(self.burst, self._tokens + elapsed * self.requests_per_second)
+                self._last_refill = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait = (1 - self._tokens) / self.requests_per_second
+
+            time.sleep(wait)
+
+
+# Estimated duration of a crawl at a given request rate
+def estimated_crawl_time(number_of_requests: int, requests_per_second: float) -> float:
+    """
+    Estimates how long a crawl takes when it runs at the configured request rate.
+
+    Args:
+        number_of_requests: Number of pages to be requested
+        requests_per_second: Configured requests-per-second budget
+
+    Returns:
+        Estimated duration in seconds
+    """
+    if requests_per_second <= 0:
+        raise ValueError("requests_per_second must be greater than 0")
+
+    return number_of_requests / requests_per_second
+
+
+# Seconds to wait from a Retry-After header
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parses a Retry-After header, given either as seconds or as an HTTP date.
+
+    Args:
+        value: Header value or None
+
+    Returns:
+        Seconds to wait (at most MAX_RETRY_AFTER) or None when the header is missing or invalid
+    """
+    if not value:
+        return None
+
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+# Additive-increase/multiplicative-decrease request pacing of one host
+class AdaptiveRateController:
+    """
+    Paces the requests to one host at a rate that adapts to its responses: the rate grows additively while responses
+    are fast and successful, and is cut multiplicatively on 429, 503, timeouts or rising latency.
+    A Retry-After header pauses every request to the host until it has passed.
+
+    Args:
+        initial_rate: Requests per second to start with (default=INITIAL_RATE)
+        min_rate: Lowest rate the controller cuts down to (default=MIN_RATE)
+        max_rate: Highest rate the controller grows to (default=MAX_RATE)
+    """
+
+    def __init__(self,
+                 initial_rate: float = INITIAL_RATE,
+                 min_rate: float = MIN_RATE,
+                 max_rate: float = MAX_RATE
+                 ) -> None:
+        # Input validation
+        if not 0 < min_rate <= max_rate:
+            raise ValueError("rates must satisfy 0 < min_rate <= max_rate")
+
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate = min(max(initial_rate, min_rate), max_rate)
+        self._next_slot = time.monotonic()
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._latency = None
+        self._baseline = None
+        self._lock = threading.Lock()
+
+    def set_bounds(self, min_rate: Optional[float] = None, max_rate: Optional[float] = None) -> None:
+        with self._lock:
+            self.min_rate = self.min_rate if min_rate is None else min_rate
+            self.max_rate = self.max_rate if max_rate is None else max_rate
+            self.rate = min(max(self.rate, self.min_rate), self.max_rate)
+
+    def acquire(self) -> None:
+        """
+        Blocks the calling thread until its request may be issued: requests are spaced 1 / rate seconds apart
+        and held back while a Retry-After is pending.
+
+        Returns:
+            None
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                slot = max(now, self._next_slot, self._blocked_until)
+                self._next_slot = slot + 1 / self.rate
+
+            time.sleep(slot - now)
+
+            # A Retry-After received while waiting pushes the request back
+            if time.monotonic() >= self._blocked_until:
+                return
+
+    def record(self, status: Optional[int], latency: float, retry_after: Optional[float] = None) -> None:
+        """
+        Adapts the rate to the outcome of one request.
+
+        Args:
+            status: HTTP status of the response, None when the request failed without one (timeout, connection error)
+            latency: Seconds until the response headers arrived, so small 304s and full downloads are comparable
+            retry_after: Seconds the host asked us to wait, see parse_retry_after (default=None)
+
+        Returns:
+            None
+        """
+        with self._lock:
+            now = time.monotonic()
+
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+                self._next_slot = max(self._next_slot, self._blocked_until)
+
+            if status is None or status in THROTTLE_STATUSES:
+                self._decrease(now, 'error' if status is None else str(status))
+                return
+
+            self._latency = latency if self._latency is None else (1 - LATENCY_SMOOTHING) * self._latency + LATENCY_SMOOTHING * latency
+            if self._baseline is None or self._latency < self._baseline:
+                self._baseline = self._latency
+            else:
+                self._baseline += (self._latency - self._baseline) * BASELINE_DRIFT
+
+            if self._latency > max(self._baseline * LATENCY_FACTOR, self._baseline + LATENCY_MIN_RISE):
+                self._decrease(now, 'latency')
+                return
+
+            # Other errors say nothing about the load of the host
+            if status < 400:
+                self.rate = min(self.max_rate, self.rate + ADDITIVE_INCREASE / self.rate)
+
+    # Cut the rate, at most once per cooldown
+    def _decrease(self, now: float, reason: str) -> None:
+        if now - self._last_decrease < max(DECREASE_COOLDOWN, self._latency or 0.0):
+            return
+
+        self._last_decrease = now
+        self.rate = max(self.min_rate, self.rate * MULTIPLICATIVE_DECREASE)
+        metrics.inc('rate_decreases_total', reason=reason)
+
+# One controller per host, shared by every fetcher of the process
+_controllers: Dict[str, AdaptiveRateController] = {}
+_controllers_lock = threading.Lock()
+
+# Host of a URL, the key of its controller
+def _host(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+# Controller of the host of a URL, created with the default rates on first use
+def controller_for(url: str) -> AdaptiveRateController:
+    """
+    Returns the rate controller of the host of a URL.
+
+    Args:
+        url: URL to be requested
+
+    Returns:
+        AdaptiveRateController shared by all requests to the host
+    """
+    host = _host(url)
+
+    with _controllers_lock:
+        if host not in _controllers:
+            _controllers[host] = AdaptiveRateController()
+
+        return _controllers[host]
+
+# Set the rates of a host before crawling it
+def configure_host(url: str,
+                   initial_rate: Optional[float] = None,
+                   min_rate: Optional[float] = None,
+                   max_rate: Optional[float] = None
+                   ) -> AdaptiveRateController:
+    """
+    Sets the rates of the host of a URL. A controller that is already pacing the host keeps the rate it has
+    learned and only gets the new bounds.
+
+    Args:
+        url: Any URL of the host, e.g. its root
+        initial_rate: Requests per second to start with (default=INITIAL_RATE)
+        min_rate: Lowest rate (default=MIN_RATE)
+        max_rate: Highest rate (default=MAX_RATE)
+
+    Returns:
+        AdaptiveRateController of the host
+    """
+    host = _host(url)
+
+    with _controllers_lock:
+        if host in _controllers:
+            _controllers[host].set_bounds(min_rate=min_rate, max_rate=max_rate)
+        else:
+            _controllers[host] = AdaptiveRateController(initial_rate=INITIAL_RATE if initial_rate is None else initial_rate,
+                                                        min_rate=MIN_RATE if min_rate is None else min_rate,
+                                                        max_rate=MAX_RATE if max_rate is None else max_rate)
+
+        return _controllers[host]
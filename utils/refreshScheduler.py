@@ -0,0 +1,158 @@
+import time
+from typing import Dict, List, Union
+from .utils import get_connection
+
+# Bounds of the interval between two polls of the same ticker
+MIN_POLL_INTERVAL = 15 * 60
+MAX_POLL_INTERVAL = 24 * 60 * 60
+
+# Number of new headlines a poll is expected to find; busier tickers are polled more often
+TARGET_NEW_PER_POLL = 1.0
+
+# Weight of the latest observation in the smoothed headline rate
+RATE_SMOOTHING = 0.3
+
+# Period over which the headlines already stored in 'finviz' are assumed to have arrived when seeding
+SEED_WINDOW = 30 * 24 * 60 * 60
+
+# Interval until the next poll for a headline rate
+def poll_interval(headline_rate: float) -> float:
+    """
+    Returns the time until the next poll of a ticker so that it finds about TARGET_NEW_PER_POLL new headlines.
+
+    Args:
+        headline_rate: Smoothed number of new headlines per second
+
+    Returns:
+        Interval in seconds, between MIN_POLL_INTERVAL and MAX_POLL_INTERVAL
+    """
+    if headline_rate <= 0:
+        return MAX_POLL_INTERVAL
+
+    return min(MAX_POLL_INTERVAL, max(MIN_POLL_INTERVAL, TARGET_NEW_PER_POLL / headline_rate))
+
+# Add tickers that are not scheduled yet, with a headline rate derived from 'finviz'
+def seed_schedule(db_path: str) -> int:
+    """
+    Adds every listed ticker of 'companyDetails' missing from 'pollSchedule'.
+    Its starting headline rate is the number of headlines already stored in 'finviz' over SEED_WINDOW.
+
+    Args:
+        db_path: Path to the database
+
+    Returns:
+        Number of tickers added
+    """
+    con = get_connection(db_path).con
+    now = time.time()
+
+    rows = con.execute("""
+        SELECT c.ticker, COUNT(f.link)
+        FROM companyDetails c
+        LEFT JOIN finviz f ON f.ticker = c.ticker AND f.publishedAt >= ?
+        WHERE c.ticker IS NOT NULL
+          AND c.delisted = 0
+          AND c.ticker NOT IN (SELECT ticker FROM pollSchedule)
+        GROUP BY c.ticker
+    """, (now - SEED_WINDOW,)).fetchall()
+
+    # New tickers are due right away; the more headlines, the earlier
+    schedule = [(ticker, None, now - headlines, headlines / SEED_WINDOW) for ticker, headlines in rows]
+
+    with con:
+        con.executemany("""
+            INSERT INTO pollSchedule (ticker, lastPolled, nextPoll, headlineRate)
+            VALUES (?, ?, ?, ?)
+        """, schedule)
+
+    return len(schedule)
+
+# Tickers due for a poll, most overdue first
+def due_tickers(db_path: str, count: int) -> List[str]:
+    """
+    Returns up to count tickers whose next poll time has passed.
+
+    Args:
+        db_path: Path to the database
+        count: Maximum number of tickers
+
+    Returns:
+        List of tickers
+    """
+    con = get_connection(db_path).con
+
+    rows = con.execute("""
+        SELECT ticker
+        FROM pollSchedule
+        WHERE nextPoll <= ?
+        ORDER BY nextPoll
+        LIMIT ?
+    """, (time.time(), count)).fetchall()
+
+    return [row[0] for row in rows]
+
+# Time until the next ticker is due
+def seconds_until_next_poll(db_path: str) -> float:
+    """
+    Returns the number of seconds until the earliest scheduled poll.
+
+    Args:
+        db_path: Path to the database
+
+    Returns:
+        Seconds (0 if a ticker is already due, MAX_POLL_INTERVAL if nothing is scheduled)
+    """
+    con = get_connection(db_path).con
+
+    next_poll = con.execute("SELECT MIN(nextPoll) FROM pollSchedule").fetchone()[0]
+    if next_poll is None:
+        return MAX_POLL_INTERVAL
+
+    return max(0.0, next_poll - time.time())
+
+# Update headline rates and next poll times after a round of polls
+def record_polls(db_path: str, new_headlines: Dict[str, int], failed: Union[List[str], None] = None) -> None:
+    """
+    Updates the smoothed headline rate of polled tickers from the number of new headlines found and schedules their next poll.
+    Failed tickers keep their rate and are retried after MIN_POLL_INTERVAL.
+
+    Args:
+        db_path: Path to the database
+        new_headlines: Number of new headlines per successfully polled ticker: {'ticker': int}
+        failed: Tickers whose poll failed (default=None)
+
+    Returns:
+        None
+    """
+    con = get_connection(db_path).con
+    now = time.time()
+
+    updates = []
+    if new_headlines:
+        placeholders = ', '.join('?' * len(new_headlines))
+        rows = con.execute(f"""
+            SELECT ticker, lastPolled, headlineRate
+            FROM pollSchedule
+            WHERE ticker IN ({placeholders})
+        """, tuple(new_headlines)).fetchall()
+
+        for ticker, last_polled, headline_rate in rows:
+            # First poll: the page holds the backlog of recent headlines
+            if last_polled is None:
+                rate = max(headline_rate, new_headlines[ticker] / SEED_WINDOW)
+            else:
+                observed_rate = new_headlines[ticker] / max(now - last_polled, 1.0)
+                rate = RATE_SMOOTHING * observed_rate + (1 - RATE_SMOOTHING) * headline_rate
+            updates.append((now, now + poll_interval(rate), rate, ticker))
+
+    with con:
+        con.executemany("""
+            UPDATE pollSchedule
+            SET lastPolled = ?, nextPoll = ?, headlineRate = ?
+            WHERE ticker = ?
+        """, updates)
+        con.executemany("""
+            UPDATE pollSchedule
+            SET nextPoll = ?
+            WHERE ticker = ?
+        """, [(now + MIN_POLL_INTERVAL, ticker) for ticker in failed or []])
@@ -0,0 +1,244 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Union
+
+# Default location and limits of the raw HTML snapshot store
+SNAPSHOT_DIR = 'snapshots'
+SNAPSHOT_TTL = 24 * 60 * 60
+SNAPSHOT_MAX_BYTES = 2 * 1024 ** 3
+
+# Compressed, content-addressed store of raw HTTP responses
+class SnapshotStore:
+    """
+    On-disk store of raw page content keyed by URL.
+
+    Page bodies are gzip-compressed and saved once per content hash under 'objects/', while
+    'refs/' maps every URL to the hash of its latest body and the time it was fetched.
+    Identical pages fetched from different URLs therefore share one blob on disk.
+
+    Args:
+        root: Directory of the store
+        ttl: Number of seconds a snapshot is considered fresh (default=SNAPSHOT_TTL)
+        max_bytes: Maximum size of all compressed blobs before the least recently used are evicted (default=SNAPSHOT_MAX_BYTES)
+    """
+
+    def __init__(self,
+                 root: str = SNAPSHOT_DIR,
+                 ttl: float = SNAPSHOT_TTL,
+                 max_bytes: int = SNAPSHOT_MAX_BYTES
+                 ) -> None:
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    # Path to the ref file of a URL
+    def _ref_path(self, url: str) -> str:
+        url_hash = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.root, 'refs', url_hash[:2], f"{url_hash}.json")
+
+    # Path to the compressed blob of a content hash
+    def _object_path(self, content_hash: str) -> str:
+        return os.path.join(self.root, 'objects', content_hash[:2], f"{content_hash}.gz")
+
+    # Write file atomically so a crash never leaves a half-written snapshot
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get_ref(self, url: str) -> Optional[Dict[str, Union[str, float]]]:
+        """
+        Returns the ref of a URL.
+
+        Args:
+            url: URL of the page
+
+        Returns:
+            Dictionary {'url':'str', 'hash':'str', 'fetched_at':float, 'etag':'str' or None, 'last_modified':'str' or None}
+            or None if the URL was never stored
+        """
+        try:
+            with open(self._ref_path(url), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def refs(self):
+        """
+        Iterates over the refs of all stored URLs.
+
+        Returns:
+            Generator of dictionaries {'url':'str', 'hash':'str', 'fetched_at':float, 'etag':'str' or None, 'last_modified':'str' or None}
+        """
+        refs_dir = os.path.join(self.root, 'refs')
+        for dirpath, _, filenames in os.walk(refs_dir):
+            for filename in filenames:
+                try:
+                    with open(os.path.join(dirpath, filename), 'r', encoding='utf-8') as f:
+                        yield json.load(f)
+                except (OSError, json.JSONDecodeError):
+                    continue
+
+    def get(self, url: str, max_age: Optional[float] = None) -> Optional[bytes]:
+        """
+        Returns the stored body of a URL if it is fresh enough.
+
+        Args:
+            url: URL of the page
+            max_age: Maximum age in seconds; defaults to the store TTL, use float('inf') to accept any age
+
+        Returns:
+            Raw page content or None if there is no fresh snapshot
+        """
+        max_age = self.ttl if max_age is None else max_age
+
+        ref = self.get_ref(url)
+        if ref is None or time.time() - ref['fetched_at'] > max_age:
+            return None
+
+        object_path = self._object_path(ref['hash'])
+        try:
+            with open(object_path, 'rb') as f:
+                content = gzip.decompress(f.read())
+        except (FileNotFoundError, OSError, EOFError):
+            return None
+
+        # Mark blob as recently used for eviction
+        os.utime(object_path)
+
+        return content
+
+    def put(self, url: str, content: bytes, etag: Optional[str] = None, last_modified: Optional[str] = None) -> str:
+        """
+        Stores the body of a URL, with the validators used to revalidate it.
+
+        Args:
+            url: URL of the page
+            content: Raw page content
+            etag: ETag header of the response (default=None)
+            last_modified: Last-Modified header of the response (default=None)
+
+        Returns:
+            Content hash of the stored body
+        """
+        content_hash = hashlib.sha256(content).hexdigest()
+        object_path = self._object_path(content_hash)
+
+        with self._lock:
+            if os.path.exists(object_path):
+                os.utime(object_path)
+            else:
+                compressed = gzip.compress(content)
+                self._write_atomic(object_path, compressed)
+                if self._total_bytes is not None:
+                    self._total_bytes += len(compressed)
+
+            ref = {'url': url, 'hash': content_hash, 'fetched_at': time.time(), 'etag': etag, 'last_modified': last_modified}
+            self._write_atomic(self._ref_path(url), json.dumps(ref).encode('utf-8'))
+
+            if self._size() > self.max_bytes:
+                self._evict()
+
+        return content_hash
+
+    def touch(self, url: str) -> None:
+        """
+        Marks the snapshot of a URL as fetched now, after the server confirmed it is unchanged (HTTP 304).
+
+        Args:
+            url: URL of the page
+
+        Returns:
+            None
+        """
+        with self._lock:
+            ref = self.get_ref(url)
+            if ref is not None:
+                ref['fetched_at'] = time.time()
+                self._write_atomic(self._ref_path(url), json.dumps(ref).encode('utf-8'))
+
+    def forget(self, url: str) -> None:
+        """
+        Removes the ref of a URL, so it is downloaded in full next time; its blob is left to purge_expired.
+
+        Args:
+            url: URL of the page
+
+        Returns:
+            None
+        """
+        with self._lock:
+            try:
+                os.remove(self._ref_path(url))
+            except FileNotFoundError:
+                pass
+
+    # Total size of all blobs, scanned once and then tracked in memory
+    def _size(self) -> int:
+        if self._total_bytes is None:
+            self._total_bytes = sum(os.path.getsize(path) for path, _ in self._objects())
+        return self._total_bytes
+
+    # All blobs with their last access time
+    def _objects(self):
+        objects_dir = os.path.join(self.root, 'objects')
+        for dirpath, _, filenames in os.walk(objects_dir):
+            for filename in filenames:
+                if filename.endswith('.gz'):
+                    path = os.path.join(dirpath, filename)
+                    yield path, os.path.getmtime(path)
+
+    # Remove least recently used blobs until the store is back under 90% of its size bound
+    def _evict(self) -> None:
+        target = self.max_bytes * 0.9
+        for path, _ in sorted(self._objects(), key=lambda item: item[1]):
+            if self._total_bytes <= target:
+                break
+            size = os.path.getsize(path)
+            os.remove(path)
+            self._total_bytes -= size
+
+    def purge_expired(self) -> int:
+        """
+        Removes refs older than the TTL and blobs no longer referenced by any ref.
+
+        Returns:
+            Number of files removed
+        """
+        removed = 0
+        referenced = set()
+        now = time.time()
+
+        with self._lock:
+            refs_dir = os.path.join(self.root, 'refs')
+            for dirpath, _, filenames in os.walk(refs_dir):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        with open(path, 'r', encoding='utf-8') as f:
+                            ref = json.load(f)
+                    except (OSError, json.JSONDecodeError):
+                        ref = None
+
+                    if ref is None or now - ref['fetched_at'] > self.ttl:
+                        os.remove(path)
+                        removed += 1
+                    else:
+                        referenced.add(ref['hash'])
+
+            for path, _ in list(self._objects()):
+                if os.path.basename(path)[:-len('.gz')] not in referenced:
+                    os.remove(path)
+                    removed += 1
+
+            self._total_bytes = None
+
+        return removed
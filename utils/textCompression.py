@@ -0,0 +1,182 @@
+import sqlite3
+import threading
+import time
+from typing import Union
+
+# zstandard is optional; it is only needed once a database stores compressed text
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Compression settings
+COMPRESSION_LEVEL = 9
+DICTIONARY_SIZE = 112 * 1024
+DICTIONARY_SAMPLES = 20000
+
+# Dictionaries per (database file, dictionary id) and latest dictionary id per database file
+_dictionaries = {}
+_latest_dictionary_ids = {}
+
+# zstandard compressors and decompressors are not thread safe, keep one set per thread
+_local = threading.local()
+
+# Fail with a clear message when compressed text is used without zstandard
+def _require_zstandard() -> None:
+    if zstandard is None:
+        raise ImportError("Compressed newsDetails.fullText requires the zstandard package")
+
+# Database file of a connection, used as cache key
+def _database_file(con: sqlite3.Connection) -> str:
+    return con.execute("PRAGMA database_list").fetchone()[2]
+
+# Load a dictionary by id
+def _dictionary(con: sqlite3.Connection, dictionary_id: int):
+    key = (_database_file(con), dictionary_id)
+
+    if key not in _dictionaries:
+        row = con.execute("SELECT dictionary FROM compressionDictionary WHERE id = ?", (dictionary_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"Compression dictionary {dictionary_id} not found in database")
+        _dictionaries[key] = zstandard.ZstdCompressionDict(row[0])
+
+    return _dictionaries[key]
+
+# Get the id of the dictionary new text is compressed with
+def latest_dictionary_id(con: sqlite3.Connection) -> Union[int, None]:
+    """
+    Returns the id of the newest trained dictionary. Compression is enabled for a database once it has one.
+    Only a found id is cached, so a dictionary trained by another process is picked up by the next call.
+
+    Args:
+        con: sqlite3 connection to the database
+
+    Returns:
+        Dictionary id or None when fullText is stored uncompressed
+    """
+    database_file = _database_file(con)
+
+    if _latest_dictionary_ids.get(database_file) is None:
+        try:
+            row = con.execute("SELECT id FROM compressionDictionary ORDER BY createdAt DESC LIMIT 1").fetchone()
+        except sqlite3.OperationalError:
+            row = None
+        if row:
+            _latest_dictionary_ids[database_file] = row[0]
+
+    return _latest_dictionary_ids.get(database_file)
+
+# Compress text with the latest dictionary of the database
+def compress_text(con: sqlite3.Connection, text: Union[str, None]) -> Union[bytes, str, None]:
+    """
+    Compresses text for storage, or returns it unchanged when the database has no dictionary.
+
+    Args:
+        con: sqlite3 connection to the database
+        text: Text to store
+
+    Returns:
+        zstd frame as bytes (stored as BLOB), or the unchanged text
+    """
+    dictionary_id = latest_dictionary_id(con)
+    if text is None or dictionary_id is None:
+        return text
+
+    _require_zstandard()
+
+    compressors = getattr(_local, 'compressors', None)
+    if compressors is None:
+        compressors = _local.compressors = {}
+
+    key = (_database_file(con), dictionary_id)
+    if key not in compressors:
+        compressors[key] = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL, dict_data=_dictionary(con, dictionary_id))
+
+    return compressors[key].compress(text.encode('utf-8'))
+
+# Decompress a stored value
+def decompress_text(con: sqlite3.Connection, value: Union[bytes, str, None]) -> Union[str, None]:
+    """
+    Returns the text of a stored value; compressed values (BLOBs) are decompressed, text is returned unchanged.
+
+    Args:
+        con: sqlite3 connection to the database
+        value: Stored value
+
+    Returns:
+        Text
+    """
+    if not isinstance(value, bytes):
+        return value
+
+    _require_zstandard()
+
+    dictionary_id = zstandard.get_frame_parameters(value).dict_id
+
+    decompressors = getattr(_local, 'decompressors', None)
+    if decompressors is None:
+        decompressors = _local.decompressors = {}
+
+    key = (_database_file(con), dictionary_id)
+    if key not in decompressors:
+        decompressors[key] = zstandard.ZstdDecompressor(dict_data=_dictionary(con, dictionary_id))
+
+    return decompressors[key].decompress(value).decode('utf-8')
+
+# Make decompression available in SQL as pl_decompress(value)
+def register_functions(con: sqlite3.Connection) -> None:
+    """
+    Registers the SQL function pl_decompress(value) on a connection.
+
+    Args:
+        con: sqlite3 connection to the database
+
+    Returns:
+        None
+    """
+    con.create_function('pl_decompress', 1, lambda value: decompress_text(con, value), deterministic=True)
+
+# Train a dictionary on stored articles
+def train_dictionary(con: sqlite3.Connection,
+                     samples: int = DICTIONARY_SAMPLES,
+                     dictionary_size: int = DICTIONARY_SIZE
+                     ) -> int:
+    """
+    Trains a zstd dictionary on a random sample of stored article texts and makes it the dictionary for new text.
+
+    Args:
+        con: sqlite3 connection to the database
+        samples: Number of articles sampled (default=DICTIONARY_SAMPLES)
+        dictionary_size: Size of the dictionary in bytes (default=DICTIONARY_SIZE)
+
+    Returns:
+        Id of the new dictionary
+    """
+    _require_zstandard()
+
+    rows = con.execute("""
+        SELECT fullText
+        FROM newsDetails
+        WHERE fullText IS NOT NULL AND fullText != ''
+        ORDER BY RANDOM()
+        LIMIT ?
+    """, (samples,)).fetchall()
+
+    texts = [decompress_text(con, row[0]).encode('utf-8') for row in rows]
+    if len(texts) < 100:
+        raise ValueError(f"Not enough articles to train a dictionary: {len(texts)} found, at least 100 needed")
+
+    trained = zstandard.train_dictionary(dictionary_size, texts)
+
+    # The id embedded in the dictionary is written into every frame, so it doubles as the row id
+    dictionary_id = trained.dict_id()
+
+    with con:
+        con.execute("""
+            INSERT INTO compressionDictionary (id, createdAt, dictionary)
+            VALUES (?, ?, ?)
+        """, (dictionary_id, time.time(), trained.as_bytes()))
+
+    _latest_dictionary_ids[_database_file(con)] = dictionary_id
+
+    return dictionary_id
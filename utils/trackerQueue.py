@@ -0,0 +1,133 @@
+import os
+import socket
+import time
+from typing import List
+from .utils import get_connection
+
+# Seconds a claimed ticker stays reserved for its worker before other workers may reclaim it
+LEASE_SECONDS = 600
+
+# Default worker id: host name and process id
+def default_worker_id() -> str:
+    """
+    Returns an id that is unique per worker process across machines sharing the database.
+
+    Returns:
+        Worker id as 'hostname:pid'
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+# Run a write statement in its own immediate transaction
+def _write(db_path: str, query: str, parameters: tuple) -> int:
+    con = get_connection(db_path).con
+
+    # Finish any implicit transaction and take the write lock up front
+    if con.in_transaction:
+        con.commit()
+    con.execute('BEGIN IMMEDIATE')
+
+    with con:
+        return con.execute(query, parameters).rowcount
+
+# Claim TODO tickers that are not leased by another worker
+def claim_tickers(db_path: str, worker_id: str, count: int, lease_seconds: float = LEASE_SECONDS) -> List[str]:
+    """
+    Atomically leases up to count TODO tickers from 'trackerFinviz' to a worker.
+    Tickers whose lease expired (e.g. their worker crashed) are claimed again. Delisted tickers are skipped.
+
+    Args:
+        db_path: Path to the database
+        worker_id: Id of the claiming worker, see default_worker_id
+        count: Maximum number of tickers to claim
+        lease_seconds: Duration of the lease (default=LEASE_SECONDS)
+
+    Returns:
+        List of claimed tickers (empty when no TODO ticker is available)
+    """
+    con = get_connection(db_path).con
+    now = time.time()
+
+    # Finish any implicit transaction and take the write lock up front, so no other worker sees the same rows
+    if con.in_transaction:
+        con.commit()
+    con.execute('BEGIN IMMEDIATE')
+
+    with con:
+        rows = con.execute("""
+            SELECT rowid, ticker
+            FROM trackerFinviz
+            WHERE finvizStatus = 'TODO'
+              AND (leaseExpiry IS NULL OR leaseExpiry < ?)
+              AND ticker NOT IN (SELECT ticker FROM companyDetails WHERE delisted = 1)
+            ORDER BY rowid
+            LIMIT ?
+        """, (now, count)).fetchall()
+
+        con.executemany("""
+            UPDATE trackerFinviz
+            SET leaseOwner = ?, leaseExpiry = ?
+            WHERE rowid = ?
+        """, [(worker_id, now + lease_seconds, rowid) for rowid, _ in rows])
+
+    return [ticker for _, ticker in rows]
+
+# Extend the leases of tickers still being processed
+def renew_leases(db_path: str, worker_id: str, tickers: List[str], lease_seconds: float = LEASE_SECONDS) -> int:
+    """
+    Extends the leases a worker holds on tickers.
+
+    Args:
+        db_path: Path to the database
+        worker_id: Id of the worker holding the leases
+        tickers: Tickers to renew
+        lease_seconds: New duration of the lease from now (default=LEASE_SECONDS)
+
+    Returns:
+        Number of leases renewed (leases already taken over by another worker are not renewed)
+    """
+    placeholders = ', '.join('?' * len(tickers))
+
+    return _write(db_path, f"""
+        UPDATE trackerFinviz
+        SET leaseExpiry = ?
+        WHERE leaseOwner = ? AND ticker IN ({placeholders})
+    """, (time.time() + lease_seconds, worker_id, *tickers))
+
+# Give tickers back to the queue without changing their status
+def release_tickers(db_path: str, worker_id: str, tickers: List[str]) -> int:
+    """
+    Releases the leases a worker holds on tickers so other workers can claim them right away.
+
+    Args:
+        db_path: Path to the database
+        worker_id: Id of the worker holding the leases
+        tickers: Tickers to release
+
+    Returns:
+        Number of leases released
+    """
+    placeholders = ', '.join('?' * len(tickers))
+
+    return _write(db_path, f"""
+        UPDATE trackerFinviz
+        SET leaseOwner = NULL, leaseExpiry = NULL
+        WHERE leaseOwner = ? AND ticker IN ({placeholders})
+    """, (worker_id, *tickers))
+
+# Clear expired leases
+def reclaim_stale_leases(db_path: str) -> int:
+    """
+    Clears leases that expired without their ticker being completed.
+    claim_tickers already ignores expired leases; this keeps the tracker readable after crashed workers.
+
+    Args:
+        db_path: Path to the database
+
+    Returns:
+        Number of leases cleared
+    """
+    return _write(db_path, """
+        UPDATE trackerFinviz
+        SET leaseOwner = NULL, leaseExpiry = NULL
+        WHERE leaseExpiry < ?
+    """, (time.time(),))
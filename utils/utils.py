@@ -1,6 +1,219 @@
-import ibis
-import pandas as pd
-from typing import Dict, List, Union, Any
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Union, Any
+from . import textCompression as tc
+from . import nearDuplicate as nd
+from . import finvizDates as fd
+from . import metrics
+
+# ibis and pandas take most of the import time; they are imported by the functions that use them
+if TYPE_CHECKING:
+    import ibis
+    import pandas as pd
+
+# SQLite pragmas applied once to every new connection
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -65536,
+    'temp_store': 'MEMORY',
+    'busy_timeout': 30000,
+}
+
+# Columns that may hold zstd-compressed text (see utils.textCompression), decompressed transparently on read
+COMPRESSED_COLUMNS = {'newsDetails': ['fullText']}
+
+# Unique column of every table in COMPRESSED_COLUMNS, matching values decompressed by SQLite to rows read by DuckDB
+COMPRESSED_TABLE_KEYS = {'newsDetails': 'link'}
+
+# Backends the read helpers can run on: 'sqlite' (the database itself), 'duckdb' (DuckDB attached to the SQLite file)
+# and 'parquet' (DuckDB over the export of utils.parquetExport). Writes always go through get_connection
+READ_BACKENDS = ['sqlite', 'duckdb', 'parquet']
+
+# Default read backend, overridable with the PROSPECTLEAP_READ_BACKEND environment variable
+READ_BACKEND = os.environ.get('PROSPECTLEAP_READ_BACKEND', 'sqlite')
+
+# Long-lived connections, one per database and thread (sqlite3 connections are not shared across threads)
+_local = threading.local()
+
+# Column names per (database, table), shared by all threads
+_schema_cache = {}
+
+# Function to get the long-lived connection to a database
+def get_connection(db_path: str) -> 'ibis.BaseBackend':
+    """
+    Returns the connection to the database owned by the calling thread, opening it on first use.
+
+    Args:
+        db_path: Path to the database
+
+    Returns:
+        ibis SQLite backend; the underlying sqlite3 connection is available as .con
+    """
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    key = os.path.abspath(db_path)
+    conn = connections.get(key)
+
+    if conn is None:
+        import ibis
+        conn = ibis.sqlite.connect(db_path)
+        for pragma, value in SQLITE_PRAGMAS.items():
+            conn.con.execute(f"PRAGMA {pragma} = {value}")
+        tc.register_functions(conn.con)
+        connections[key] = conn
+
+    return conn
+
+# Resolve the read backend to use for a call
+def resolve_read_backend(backend: Union[str, None] = None) -> str:
+    """
+    Returns the read backend to use.
+
+    Args:
+        backend: Requested backend or None for READ_BACKEND
+
+    Returns:
+        Name of a read backend
+    """
+    backend = backend or READ_BACKEND
+
+    if backend not in READ_BACKENDS:
+        raise ValueError(f"Unknown read backend '{backend}'. Available backends are: {READ_BACKENDS}")
+
+    return backend
+
+# Function to get the long-lived read connection to a database
+def get_read_connection(db_path: str, backend: Union[str, None] = None) -> 'ibis.BaseBackend':
+    """
+    Returns the connection read helpers use, owned by the calling thread and opened on first use.
+    'duckdb' attaches the SQLite file read-through (DuckDB's sqlite extension), so it always sees the latest rows;
+    'parquet' reads the Parquet export, which is only as recent as the last export.
+
+    Args:
+        db_path: Path to the database
+        backend: Read backend (default=READ_BACKEND)
+
+    Returns:
+        ibis backend
+    """
+    backend = resolve_read_backend(backend)
+    if backend == 'sqlite':
+        return get_connection(db_path)
+
+    read_connections = getattr(_local, 'read_connections', None)
+    if read_connections is None:
+        read_connections = _local.read_connections = {}
+
+    key = (backend, os.path.abspath(db_path))
+    conn = read_connections.get(key)
+
+    if conn is None:
+        import ibis
+        conn = ibis.duckdb.connect()
+        if backend == 'duckdb':
+            conn.attach_sqlite(db_path)
+        read_connections[key] = conn
+
+    return conn
+
+# Function to get a table expression on the read backend
+def read_table(db_path: str,
+               table_name: str,
+               backend: Union[str, None] = None,
+               export_dir: Union[str, None] = None
+               ) -> 'ibis.Table':
+    """
+    Returns a lazy ibis table for read-side queries; filters and aggregations run on the backend.
+    On 'parquet' the exported columns apply (e.g. finviz.date is exported as dateCell, date is the publication day).
+    On 'duckdb' the columns of COMPRESSED_COLUMNS are left out: DuckDB's sqlite scanner rejects compressed values
+    in a TEXT column, get_table adds them back decompressed.
+
+    Args:
+        db_path: Path to the database
+        table_name: Name of the table
+        backend: Read backend (default=READ_BACKEND)
+        export_dir: Root directory of the Parquet export for the 'parquet' backend (default=parquetExport.EXPORT_DIR)
+
+    Returns:
+        ibis table expression
+    """
+    backend = resolve_read_backend(backend)
+    conn = get_read_connection(db_path, backend)
+
+    if backend == 'parquet' and table_name not in conn.list_tables():
+        from .parquetExport import EXPORT_DIR
+        table_dir = os.path.join(export_dir or EXPORT_DIR, table_name)
+        if not os.path.isdir(table_dir):
+            raise ValueError(f"Table '{table_name}' has not been exported to {table_dir}")
+        conn.read_parquet(os.path.join(table_dir, '**', '*.parquet'), table_name=table_name, hive_partitioning=True)
+
+    table = conn.table(table_name)
+
+    # The scanner only reads the selected columns, so the compressed ones are never touched
+    if backend == 'duckdb' and table_name in COMPRESSED_COLUMNS:
+        table = table.select([column for column in table.columns if column not in COMPRESSED_COLUMNS[table_name]])
+
+    return table
+
+# Function to close connections opened by the calling thread
+def close_connections() -> None:
+    """
+    Closes all connections opened by the calling thread and forgets them.
+
+    Returns:
+        None
+    """
+    connections = getattr(_local, 'connections', {})
+    for conn in connections.values():
+        conn.con.close()
+    connections.clear()
+
+    read_connections = getattr(_local, 'read_connections', {})
+    for conn in read_connections.values():
+        conn.disconnect()
+    read_connections.clear()
+
+# Function to forget cached table schemas (e.g. after a schema change)
+def reset_schema_cache() -> None:
+    """
+    Clears cached column names so the next call reads the schema from the database again.
+
+    Returns:
+        None
+    """
+    _schema_cache.clear()
+
+# Function to get column names of a table, introspected once per process
+def table_columns(db_path: str, table_name: str) -> List[str]:
+    """
+    Returns the column names of a table.
+
+    Args:
+        db_path: Path to the database
+        table_name: Name of the table
+
+    Returns:
+        List of column names
+
+    Raises:
+        ValueError: If the table does not exist
+    """
+    key = (os.path.abspath(db_path), table_name)
+    columns = _schema_cache.get(key)
+
+    if columns is None:
+        conn = get_connection(db_path)
+        rows = conn.con.execute(f"PRAGMA table_info('{table_name}')").fetchall()
+        if not rows:
+            raise ValueError(f"Table '{table_name}' not found in database")
+        columns = [row[1] for row in rows]
+        _schema_cache[key] = columns
+
+    return columns
 
 # Function to update value in SQL table
 def update_dbvalue(db_path: str, 
@@ -26,15 +239,10 @@ def update_dbvalue(db_path: str,
     """
     try:
         # Connect to database
-        conn = ibis.sqlite.connect(db_path)
+        conn = get_connection(db_path)
 
-        # Check if table exists
-        if table_name not in conn.list_tables():
-            raise ValueError(f"Table '{table_name}' not found in database")
-       
-        # Get table schema to check columns
-        table = conn.table(table_name)
-        available_columns = table.columns
+        # Get table schema to check columns (raises if table does not exist)
+        available_columns = table_columns(db_path, table_name)
 
         # Check if required column exist
         missing_columns = []
@@ -47,11 +255,11 @@ def update_dbvalue(db_path: str,
             raise ValueError(f"Columns {missing_columns} not found in table '{table_name}'. Available columns are: {available_columns}")
 
         # SQL statement to update value
-        conn.raw_sql(f"""
+        conn.con.execute(f"""
             UPDATE {table_name}
-            SET {update_column} = '{value}'
-            WHERE {search_column} = '{search_value}'
-        """)
+            SET {update_column} = ?
+            WHERE {search_column} = ?
+        """, (value, search_value))
 
         conn.con.commit()
 
@@ -84,16 +292,27 @@ def check_dbvalue(
     """
     try:
         # Connect to database
-        conn = ibis.sqlite.connect(db_path)
+        conn = get_connection(db_path)
 
-        # Table expression
-        table = conn.table(table_name)
+        # Validate column names against the cached schema
+        available_columns = table_columns(db_path, table_name)
+        for column in (filter_column, check_column):
+            if column not in available_columns:
+                raise ValueError(f"Column '{column}' not found in table '{table_name}'")
 
-        # Filtering SQL table and transforming to pandas
-        table_filtered = table.filter(table[filter_column] == filter_value).execute()
+        # Filtering SQL table
+        row = conn.con.execute(f"""
+            SELECT {check_column}
+            FROM {table_name}
+            WHERE {filter_column} = ?
+            LIMIT 1
+        """, (filter_value,)).fetchone()
+
+        if row is None:
+            raise ValueError(f"No row with {filter_column} = '{filter_value}' in table '{table_name}'")
 
         # Accessing filter_value
-        filter_value_element = table_filtered[check_column].iloc[0]
+        filter_value_element = row[0]
 
         if filter_value_element == check_value:
             return True
@@ -107,25 +326,50 @@ def check_dbvalue(
 
 # Function to extract table from SQL and parse it to pandas
 def get_table(db_path: str, 
-              table_name: str
-              ) -> pd.DataFrame:
+              table_name: str,
+              backend: Union[str, None] = None
+              ) -> 'pd.DataFrame':
     """
     Extract table from SQLite database and return as pandas DataFrame
 
     Args:
         db_path: Path to the database
         table_name: Name of the table to extract
+        backend: Read backend, see READ_BACKENDS (default=READ_BACKEND)
 
     Returns:
         pd.DataFrame: Table data as pandas DataFrame
     """
     try:
+        backend = resolve_read_backend(backend)
+
+        import pandas as pd
+
+        if backend != 'sqlite':
+            df = read_table(db_path, table_name, backend=backend).execute()
+
+            # DuckDB reads the table without its compressed columns, they are decompressed by SQLite and matched
+            # on the key of the table; the Parquet export is already decompressed
+            if backend == 'duckdb' and table_name in COMPRESSED_COLUMNS:
+                key = COMPRESSED_TABLE_KEYS[table_name]
+                select_list = [f"pl_decompress({column}) AS {column}" for column in COMPRESSED_COLUMNS[table_name]]
+                values = pd.read_sql_query(f"SELECT {key}, {', '.join(select_list)} FROM {table_name} WHERE {key} IS NOT NULL",
+                                           get_connection(db_path).con)
+                df = df.merge(values, on=key, how='left')[table_columns(db_path, table_name)]
+
+            return df
+
         # Connect to database
-        conn = ibis.sqlite.connect(db_path)
-        
+        conn = get_connection(db_path)
+
         # Check if table exists
-        if table_name not in conn.list_tables():
-            raise ValueError(f"Table '{table_name}' not found in database")
+        columns = table_columns(db_path, table_name)
+
+        # Decompress compressed columns in SQL; pl_decompress() returns text unchanged, so this holds whether or not
+        # the database was compressed, also by another process after this one started
+        if table_name in COMPRESSED_COLUMNS:
+            select_list = [f"pl_decompress({column}) AS {column}" if column in COMPRESSED_COLUMNS[table_name] else column for column in columns]
+            return pd.read_sql_query(f"SELECT {', '.join(select_list)} FROM {table_name}", conn.con)
 
         # Get table
         table = conn.table(table_name)
@@ -139,10 +383,10 @@ def get_table(db_path: str,
 
 # Function to filter pandas DataFrame
 def filter_table(
-        df: pd.DataFrame,
+        df: 'pd.DataFrame',
         column_name: str,
         filter_values: Union[List, str, int, float],
-    ) -> pd.DataFrame:
+    ) -> 'pd.DataFrame':
     """
     Filter table from SQL database on specified column and value(s).
 
@@ -169,7 +413,7 @@ def filter_table(
     return filtered_df.copy()
 
 # Function to count total number of rows in table
-def count_total_rows(df: pd.DataFrame) -> int:
+def count_total_rows(df: 'pd.DataFrame') -> int:
     """
     Count total rows in a table.
 
@@ -180,6 +424,8 @@ def count_total_rows(df: pd.DataFrame) -> int:
         Total number of rows in a table
     """
 
+    import pandas as pd
+
     # Input validation
     if not isinstance(df, pd.DataFrame):
         raise ValueError(f"Input must be a pandas DataFrame")
@@ -189,7 +435,7 @@ def count_total_rows(df: pd.DataFrame) -> int:
     return total_rows
 
 # Function that provides short information about the table
-def table_info(df: pd.DataFrame, 
+def table_info(df: 'pd.DataFrame', 
                column_name: str,
                include_percentages: bool = True
                ) -> str:
@@ -205,6 +451,8 @@ def table_info(df: pd.DataFrame,
         Formatted string containing the analysis results
     """
 
+    import pandas as pd
+
     # Input validation
     if not isinstance(df, pd.DataFrame):
         raise ValueError(f"Input must be a pandas DataFrame")
@@ -238,21 +486,559 @@ def table_info(df: pd.DataFrame,
     return "\n".join(output)
 
 
+# Insert of one headline that skips headlines already stored for the ticker
+FINVIZ_INSERT_SQL = """
+    INSERT INTO finviz (ticker, date, title, link, publishedAt)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (ticker, link) DO NOTHING
+"""
+
+# Parameters of FINVIZ_INSERT_SQL for a list of headlines
+def _finviz_rows(data: List[Dict[str, Any]]) -> List[tuple]:
+    # Headlines parsed without a fetch time are dated now, with days carried forward per ticker
+    if any('published_at' not in news for news in data):
+        timestamps = fd.published_at([news['date'] for news in data], tickers=[news['ticker'] for news in data], now=time.time())
+        data = [{**news, 'published_at': news.get('published_at', timestamp)} for news, timestamp in zip(data, timestamps)]
+
+    return [(news['ticker'], news['date'], news['title'], news['link'], news['published_at']) for news in data]
+
 # function to populate SQL table
-def finviz_table_populate(db_path: str, data: List[Dict[str, str]]) -> None:
+def finviz_table_populate(db_path: str, data: List[Dict[str, str]]) -> int:
     """
-    Populates 'finviz' table with data received in the JSON format or list of dictionaries 
+    Populates 'finviz' table with data received in the JSON format or list of dictionaries.
+    Headlines already stored for the same ticker and link are skipped, so re-running a ticker is safe.
 
     Args:
         db_path: Path to the database
         data: Data in the JSON format: [{'ticker':'str','date':'str', 'title':'str', 'link':'str'}...]
 
     Returns:
-        n/a
+        Number of new rows inserted
     """
     # Connect to database
-    conn = ibis.sqlite.connect(db_path)
+    con = get_connection(db_path).con
 
     # Insert data
-    conn.insert(table_name='finviz', obj=data)
+    with con:
+        changes_before = con.total_changes
+        con.executemany(FINVIZ_INSERT_SQL, _finviz_rows(data))
+        new_rows = con.total_changes - changes_before
+
+    return new_rows
+
+# function to write processed tickers to 'finviz', 'companyDetails' and 'trackerFinviz' in one transaction
+@metrics.timed('db_write', table='finviz')
+def finviz_commit_batch(db_path: str, results: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Writes news, shares float and tracker status of one or many processed tickers in a single transaction.
+    Either all tables are updated for every ticker in the batch or none of them is.
+    Headlines already stored for the same ticker and link are skipped.
+
+    Args:
+        db_path: Path to the database
+        results: Processed tickers: [{'ticker':'str', 'news_details':[{'ticker':'str','date':'str', 'title':'str', 'link':'str'}...], 'shares_float':'str',
+                 'status':'completed' or 'error'}...]
+
+    Returns:
+        Number of new headlines per ticker: {'ticker': int}
+    """
+    new_rows = {}
+
+    if not results:
+        return new_rows
+
+    float_rows = []
+    status_rows = []
+
+    for result in results:
+        if result['status'] == 'completed':
+            float_rows.append((result['shares_float'], result['ticker']))
+        status_rows.append((result['status'], result['ticker']))
+
+    # Connect to database
+    con = get_connection(db_path).con
+
+    # Finish any implicit transaction and take the write lock up front
+    if con.in_transaction:
+        con.commit()
+    con.execute('BEGIN IMMEDIATE')
+
+    # Commit on success, roll back everything on error
+    with con:
+        for result in results:
+            if result['status'] != 'completed':
+                continue
+            changes_before = con.total_changes
+            con.executemany(FINVIZ_INSERT_SQL, _finviz_rows(result['news_details']))
+            new_rows[result['ticker']] = con.total_changes - changes_before
+
+        con.executemany("UPDATE companyDetails SET float = ? WHERE ticker = ?", float_rows)
+        con.executemany("UPDATE trackerFinviz SET finvizStatus = ?, leaseOwner = NULL, leaseExpiry = NULL WHERE ticker = ?", status_rows)
+
+    return new_rows
+
+# function to add tickers from 'companyDetails' that are not tracked yet to 'trackerFinviz'
+def tracker_add_new_tickers(db_path: str) -> int:
+    """
+    Adds every listed ticker of 'companyDetails' missing from 'trackerFinviz' with status 'TODO'
+
+    Args:
+        db_path: Path to the database
+
+    Returns:
+        Number of tickers added
+    """
+    # Connect to database
+    con = get_connection(db_path).con
+
+    with con:
+        added = con.execute("""
+            INSERT INTO trackerFinviz (ticker, finvizStatus)
+            SELECT COALESCE(ticker, 'NA'), 'TODO'
+            FROM companyDetails
+            WHERE delisted = 0
+              AND COALESCE(ticker, 'NA') NOT IN (SELECT ticker FROM trackerFinviz)
+        """).rowcount
+
+    return added
+
+# Upsert of one screener row that only writes rows whose screener columns changed or that were delisted.
+# float is filled in from the quote page by the finviz crawl, so it is kept; id is the screener rank and moves with
+# every listing before the ticker, so it is refreshed with other changes but never counts as one
+COMPANY_DETAILS_UPSERT_SQL = """
+    INSERT INTO companyDetails (id, ticker, company, sector, industry, country, market_cap, price, float)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL)
+    ON CONFLICT (ticker) DO UPDATE SET
+        id = excluded.id,
+        company = excluded.company,
+        sector = excluded.sector,
+        industry = excluded.industry,
+        country = excluded.country,
+        market_cap = excluded.market_cap,
+        price = excluded.price,
+        delisted = 0,
+        delistedAt = NULL
+    WHERE companyDetails.company IS NOT excluded.company
+       OR companyDetails.sector IS NOT excluded.sector
+       OR companyDetails.industry IS NOT excluded.industry
+       OR companyDetails.country IS NOT excluded.country
+       OR companyDetails.market_cap IS NOT excluded.market_cap
+       OR companyDetails.price IS NOT excluded.price
+       OR companyDetails.delisted != 0
+"""
+
+# function to write crawled screener pages to 'companyDetails' and checkpoint them in one transaction
+@metrics.timed('db_write', table='companyDetails')
+def screener_commit_pages(db_path: str, crawl_id: int, pages: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Diffs the companies of crawled screener pages against 'companyDetails' and records the pages as done for the crawl,
+    in a single transaction. New tickers are inserted, changed or relisted tickers are updated, unchanged rows are not written.
+
+    Args:
+        db_path: Path to the database
+        crawl_id: Id of the crawl in 'screenerCrawl'
+        pages: Crawled pages: [{'row':int, 'companies':[{'No.':'str', 'Ticker':'str', 'Company':'str', ...}...]}...]
+
+    Returns:
+        Number of companies per outcome: {'new': int, 'changed': int, 'unchanged': int}
+    """
+    counts = {'new': 0, 'changed': 0, 'unchanged': 0}
+
+    if not pages:
+        return counts
+
+    companies = [(int(company['No.']) if company['No.'].isdigit() else None,
+                  company['Ticker'],
+                  company['Company'],
+                  company['Sector'],
+                  company['Industry'],
+                  company['Country'],
+                  company['Market Cap'],
+                  float(company['Price']) if company['Price'] not in ('', '-') else None)
+                 for page in pages for company in page['companies']]
+    tickers = list(dict.fromkeys(company[1] for company in companies))
+
+    now = time.time()
+
+    # Connect to database
+    con = get_connection(db_path).con
+
+    # Finish any implicit transaction and take the write lock up front
+    if con.in_transaction:
+        con.commit()
+    con.execute('BEGIN IMMEDIATE')
+
+    # Commit on success, roll back everything on error
+    with con:
+        placeholders = ', '.join('?' for _ in tickers)
+        existing = {ticker for (ticker,) in con.execute(f"SELECT ticker FROM companyDetails WHERE ticker IN ({placeholders})", tickers)}
+
+        changes_before = con.total_changes
+        con.executemany(COMPANY_DETAILS_UPSERT_SQL, companies)
+        written = con.total_changes - changes_before
+
+        # Tickers seen by the crawl; the rest are marked delisted once the crawl finishes
+        con.executemany("""
+            INSERT INTO screenerTicker (crawlId, ticker)
+            VALUES (?, ?)
+            ON CONFLICT (crawlId, ticker) DO NOTHING
+        """, [(crawl_id, ticker) for ticker in tickers])
+        con.executemany("""
+            INSERT INTO screenerPage (crawlId, pageRow, companies, fetchedAt)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (crawlId, pageRow) DO NOTHING
+        """, [(crawl_id, page['row'], len(page['companies']), now) for page in pages])
+
+    counts['new'] = len(set(tickers) - existing)
+    counts['changed'] = written - counts['new']
+    counts['unchanged'] = len(companies) - written
+
+    return counts
+
+# function to mark tickers the last two finished screener crawls did not see as delisted
+def screener_finish_crawl(db_path: str, crawl_id: int) -> int:
+    """
+    Marks the crawl finished and flags every listed ticker that neither it nor the previous finished crawl saw as delisted,
+    in a single transaction. A ticker can be missed by one crawl when listings shift it to a page that was already
+    fetched; it is only delisted once two crawls in a row missed it. Nothing is delisted by the first finished crawl.
+    Delisted tickers keep their rows, float and headlines; they are skipped by the finviz crawl and the refresh daemon
+    and are relisted when a later crawl sees them again.
+
+    Args:
+        db_path: Path to the database
+        crawl_id: Id of the finished crawl in 'screenerCrawl'
+
+    Returns:
+        Number of tickers marked delisted
+    """
+    now = time.time()
+
+    # Connect to database
+    con = get_connection(db_path).con
+
+    with con:
+        previous_crawl_id = con.execute("""
+            SELECT MAX(crawlId)
+            FROM screenerCrawl
+            WHERE finishedAt IS NOT NULL
+              AND crawlId < ?
+        """, (crawl_id,)).fetchone()[0]
+
+        delisted = con.execute("""
+            UPDATE companyDetails
+            SET delisted = 1, delistedAt = ?
+            WHERE delisted = 0
+              AND ? IS NOT NULL
+              AND ticker NOT IN (SELECT ticker FROM screenerTicker WHERE crawlId = ?)
+              AND ticker NOT IN (SELECT ticker FROM screenerTicker WHERE crawlId = ?)
+        """, (now, previous_crawl_id, crawl_id, previous_crawl_id)).rowcount
+        con.execute("DELETE FROM pollSchedule WHERE ticker IN (SELECT ticker FROM companyDetails WHERE delisted = 1)")
+        con.execute("UPDATE screenerCrawl SET finishedAt = ? WHERE crawlId = ?", (now, crawl_id))
+
+        # The next crawl only compares against this one
+        con.execute("DELETE FROM screenerTicker WHERE crawlId != ?", (crawl_id,))
+
+    return delisted
+
+# function to get links from 'finviz' whose article is not in 'newsDetails' yet
+def news_details_pending_links(db_path: str, count: int) -> List[str]:
+    """
+    Returns links of 'finviz' headlines that were not fetched into 'newsDetails' yet (isInNewsDetails is NULL)
+
+    Args:
+        db_path: Path to the database
+        count: Maximum number of links
+
+    Returns:
+        List of distinct links
+    """
+    # Connect to database
+    con = get_connection(db_path).con
+
+    rows = con.execute("""
+        SELECT DISTINCT link
+        FROM finviz
+        WHERE isInNewsDetails IS NULL
+        LIMIT ?
+    """, (count,)).fetchall()
+
+    return [row[0] for row in rows]
+
+# function to count links from 'finviz' whose article is not in 'newsDetails' yet
+def news_details_pending_count(db_path: str) -> int:
+    """
+    Counts distinct links of 'finviz' headlines that were not fetched into 'newsDetails' yet
+
+    Args:
+        db_path: Path to the database
+
+    Returns:
+        Number of links
+    """
+    # Connect to database
+    con = get_connection(db_path).con
+
+    return con.execute("SELECT COUNT(DISTINCT link) FROM finviz WHERE isInNewsDetails IS NULL").fetchone()[0]
+
+# function to write fetched articles to 'newsDetails' and flag their headlines in 'finviz' in one transaction
+@metrics.timed('db_write', table='newsDetails')
+def news_details_commit_batch(db_path: str, articles: List[Dict[str, Any]]) -> int:
+    """
+    Stores fetched articles and sets 'finviz.isInNewsDetails' of their headlines, all in a single transaction.
+
+    Every article body is stored once: a new article gets one canonical 'newsDetails' row, while an article whose
+    body nearly duplicates a stored one (see utils.nearDuplicate) is only linked to it. 'articleTickers' maps
+    every canonical article to all tickers and links it was published under. New rows are added to 'newsDetailsFts'.
+    isInNewsDetails becomes 'yes' (new article), 'duplicate' (linked to a canonical article) or 'error' (fetch failed).
+
+    Args:
+        db_path: Path to the database
+        articles: Fetched articles: [{'link':'str', 'exact_date':'str', 'full_text':'str', 'minhash':array or None,
+                  'canonical_link':'str' or None, 'status':'completed', 'duplicate' or 'error'}...]
+
+    Returns:
+        Number of 'newsDetails' rows inserted
+    """
+    if not articles:
+        return 0
+
+    # Connect to database
+    con = get_connection(db_path).con
+
+    # Finish any implicit transaction and take the write lock up front
+    if con.in_transaction:
+        con.commit()
+    con.execute('BEGIN IMMEDIATE')
+
+    inserted = 0
+    flags = []
+
+    # Commit on success, roll back everything on error
+    with con:
+        for article in articles:
+            link = article['link']
+
+            if article['status'] == 'error':
+                flags.append(('error', link))
+                continue
+
+            # Articles fetched concurrently may duplicate each other, check again against everything stored so far
+            canonical_link = article.get('canonical_link') or nd.find_canonical(con, article.get('minhash')) or link
+
+            if canonical_link == link:
+                changes_before = con.total_changes
+                con.execute("""
+                    INSERT INTO newsDetails (link, ticker, date, title, fullText)
+                    SELECT link, ticker, COALESCE(NULLIF(?, ''), date), title, ?
+                    FROM finviz
+                    WHERE link = ?
+                    ORDER BY rowid
+                    LIMIT 1
+                    ON CONFLICT (link) DO NOTHING
+                """, (article['exact_date'], tc.compress_text(con, article['full_text']), link))
+                new_rows = con.total_changes - changes_before
+                inserted += new_rows
+                flags.append(('yes', link))
+
+                # Indexed here rather than by a trigger, which would need pl_decompress() on every connection writing newsDetails
+                if new_rows:
+                    con.execute("""
+                        INSERT INTO newsDetailsFts (rowid, title, fullText)
+                        SELECT rowid, title, ?
+                        FROM newsDetails
+                        WHERE link = ?
+                    """, (article['full_text'], link))
+            else:
+                flags.append(('duplicate', link))
+
+            nd.add_fingerprint(con, link, canonical_link, article.get('minhash'))
+
+            con.execute("""
+                INSERT INTO articleTickers (canonicalLink, ticker, link)
+                SELECT ?, ticker, link
+                FROM finviz
+                WHERE link = ?
+                ON CONFLICT DO NOTHING
+            """, (canonical_link, link))
+
+        con.executemany("""
+            UPDATE finviz
+            SET isInNewsDetails = ?
+            WHERE link = ?
+        """, flags)
+
+    return inserted
+
+# Build the ticker filter of a search query
+def _ticker_filter(column: str, tickers: Union[List[str], str, None]) -> tuple:
+    if tickers is None:
+        return "", ()
+
+    # Convert single value to list for consistent processing
+    if not isinstance(tickers, list):
+        tickers = [tickers]
+
+    return f" AND {column} IN ({', '.join('?' * len(tickers))})", tuple(tickers)
+
+# Function to search headlines in 'finviz'
+def search_headlines(db_path: str,
+                     query: str,
+                     tickers: Union[List[str], str, None] = None,
+                     date_from: Union[str, int, None] = None,
+                     date_to: Union[str, int, None] = None,
+                     limit: int = 50
+                     ) -> 'pd.DataFrame':
+    """
+    Full-text search over 'finviz' headlines, best matches first.
+
+    Args:
+        db_path: Path to the database
+        query: FTS5 query, e.g. 'merger', 'fda AND approval', '"phase 3"' or 'acqui*'
+        tickers: Single ticker or list of tickers to search in (default=all)
+        date_from: Earliest publication time, ISO date or datetime (naive values are UTC) or epoch seconds (default=None)
+        date_to: Latest publication time, same formats; a bare date includes the whole day (default=None)
+        limit: Maximum number of hits (default=50)
+
+    Returns:
+        pd.DataFrame with columns ticker, date, publishedAt, title, link, score (lower score is a better match)
+    """
+    import pandas as pd
+
+    # Connect to database
+    conn = get_connection(db_path)
+
+    ticker_clause, ticker_parameters = _ticker_filter('f.ticker', tickers)
+
+    # Headlines whose date could not be parsed have no publishedAt and never match a date range
+    date_clause = ""
+    date_parameters = ()
+    if date_from is not None:
+        date_clause += " AND f.publishedAt >= ?"
+        date_parameters += (fd.to_epoch(date_from),)
+    if date_to is not None:
+        date_clause += " AND f.publishedAt <= ?"
+        date_parameters += (fd.to_epoch(date_to, end_of_day=True),)
+
+    return pd.read_sql_query(f"""
+        SELECT f.ticker, f.date, f.publishedAt, f.title, f.link, finvizFts.rank AS score
+        FROM finvizFts
+        JOIN finviz f ON f.rowid = finvizFts.rowid
+        WHERE finvizFts MATCH ?{ticker_clause}{date_clause}
+        ORDER BY finvizFts.rank
+        LIMIT ?
+    """, conn.con, params=(query, *ticker_parameters, *date_parameters, limit))
+
+# Function to search articles in 'newsDetails'
+def search_articles(db_path: str,
+                    query: str,
+                    tickers: Union[List[str], str, None] = None,
+                    date_from: Union[str, int, None] = None,
+                    date_to: Union[str, int, None] = None,
+                    limit: int = 50
+                    ) -> 'pd.DataFrame':
+    """
+    Full-text search over 'newsDetails' titles and article bodies, best matches first.
+
+    Args:
+        db_path: Path to the database
+        query: FTS5 query; prefix a column to restrict it, e.g. 'title: merger' or 'fullText: "going concern"'
+        tickers: Single ticker or list of tickers to search in (default=all)
+        date_from: Earliest publication time, ISO date or datetime (naive values are UTC) or epoch seconds (default=None)
+        date_to: Latest publication time, same formats; a bare date includes the whole day (default=None)
+        limit: Maximum number of hits (default=50)
+
+    Returns:
+        pd.DataFrame with columns link, ticker, date, publishedAt, title, score (lower score is a better match); ticker is
+        the first ticker that published the article, see 'articleTickers' for all of them
+    """
+    import pandas as pd
+
+    # Connect to database
+    conn = get_connection(db_path)
+
+    # An article matches a ticker if it was published under that ticker by any of its links
+    ticker_clause, ticker_parameters = _ticker_filter('at.ticker', tickers)
+    if ticker_clause:
+        ticker_clause = f" AND n.link IN (SELECT at.canonicalLink FROM articleTickers at WHERE 1 = 1{ticker_clause})"
+
+    # newsDetails.date falls back to the raw Finviz cell when the article has no exact time, so the range is checked
+    # against the publication time of its headline (looked up through ix_finviz_link); articles without one never match
+    published_at = "(SELECT MIN(f.publishedAt) FROM finviz f WHERE f.link = n.link)"
+    date_clause = ""
+    date_parameters = ()
+    if date_from is not None:
+        date_clause += f" AND {published_at} >= ?"
+        date_parameters += (fd.to_epoch(date_from),)
+    if date_to is not None:
+        date_clause += f" AND {published_at} <= ?"
+        date_parameters += (fd.to_epoch(date_to, end_of_day=True),)
+
+    return pd.read_sql_query(f"""
+        SELECT n.link, n.ticker, n.date, {published_at} AS publishedAt, n.title, newsDetailsFts.rank AS score
+        FROM newsDetailsFts
+        JOIN newsDetails n ON n.rowid = newsDetailsFts.rowid
+        WHERE newsDetailsFts MATCH ?{ticker_clause}{date_clause}
+        ORDER BY newsDetailsFts.rank
+        LIMIT ?
+    """, conn.con, params=(query, *ticker_parameters, *date_parameters, limit))
+
+# Function to rebuild the full-text search index
+def search_index_rebuild(db_path: str) -> None:
+    """
+    Rebuilds 'finvizFts' and 'newsDetailsFts' from their tables.
+    Needed after VACUUM, which may renumber the rowids the index points to, and after 'newsDetails' rows were
+    changed or deleted outside news_details_commit_batch, which is the only writer that keeps 'newsDetailsFts' in sync.
+
+    Args:
+        db_path: Path to the database
+
+    Returns:
+        None
+    """
+    # Connect to database
+    con = get_connection(db_path).con
+
+    with con:
+        con.execute("INSERT INTO finvizFts (finvizFts) VALUES ('rebuild')")
+        con.execute("INSERT INTO newsDetailsFts (newsDetailsFts) VALUES ('delete-all')")
+        con.execute("INSERT INTO newsDetailsFts (rowid, title, fullText) SELECT rowid, title, pl_decompress(fullText) FROM newsDetails")
+
+# Function to count headlines per sector and day
+def headline_counts_by_sector(db_path: str,
+                              date_from: Union[str, int, None] = None,
+                              date_to: Union[str, int, None] = None,
+                              backend: Union[str, None] = None
+                              ) -> 'pd.DataFrame':
+    """
+    Counts 'finviz' headlines per sector of 'companyDetails' and UTC publication day.
+    Runs as one aggregate query on the read backend; 'duckdb' and 'parquet' scan in parallel.
+
+    Args:
+        db_path: Path to the database
+        date_from: Earliest publication time, ISO date or datetime (naive values are UTC) or epoch seconds (default=None)
+        date_to: Latest publication time, same formats; a bare date includes the whole day (default=None)
+        backend: Read backend, see READ_BACKENDS (default=READ_BACKEND)
+
+    Returns:
+        pd.DataFrame with columns sector, day, headlines ordered by day and sector
+    """
+    finviz = read_table(db_path, 'finviz', backend=backend)
+    companies = read_table(db_path, 'companyDetails', backend=backend)
+
+    finviz = finviz.filter(finviz.publishedAt.notnull())
+    if date_from is not None:
+        finviz = finviz.filter(finviz.publishedAt >= fd.to_epoch(date_from))
+    if date_to is not None:
+        finviz = finviz.filter(finviz.publishedAt <= fd.to_epoch(date_to, end_of_day=True))
+
+    # Days since the epoch; integer arithmetic compiles on every backend (ibis has no SQLite rule for epoch to timestamp)
+    finviz = finviz.select('ticker', day=finviz.publishedAt // 86400)
+    joined = finviz.join(companies.select('ticker', 'sector'), 'ticker')
+
+    counts = joined.group_by(['sector', 'day']).aggregate(headlines=joined.count())
+    df = counts.order_by(['day', 'sector']).execute()
+
+    import pandas as pd
+    df['day'] = pd.to_datetime(df['day'] * 86400, unit='s').dt.date
 
+    return df